@@ -0,0 +1,434 @@
+# benchmark.py
+
+# Reproducible benchmarks against a real multi-process cluster.
+#
+# LocalCluster starts one or more NameNodes and any number of DataNodes as separate
+# processes on free localhost ports, each in its own temporary directory, and removes
+# everything again afterwards. With several NameNodes the namespace is federated: the
+# top-level directories are spread over them by hash (see federation.py). The
+# workloads below drive that cluster through DFSClient the way applications do. Data
+# and access patterns come from a seeded generator, so two runs with the same options
+# do the same work.
+#
+# A run prints (or writes with --output) one JSON document with the options, the
+# environment, each workload's throughput and latency percentiles, and the memory of
+# every process. Passing an earlier result with --baseline also prints how each figure
+# changed, so a performance change can be checked against the run before it.
+#
+#   python benchmark.py --data-nodes 3 --output baseline.json
+#   python benchmark.py --data-nodes 3 --baseline baseline.json
+#   python benchmark.py --name-nodes 4 --clients 4 --workloads metadata_storm
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from client import DFSClient
+from common import DEFAULT_BLOCK_SIZE
+from federation import MountTable
+from metrics import HistogramSeries
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+STARTUP_TIMEOUT = 30  # Seconds to wait for the cluster to come up
+
+LARGE_FILE = '/bench/large'
+SMALL_FILE_DIRECTORY = '/bench/small'
+STORM_DIRECTORIES = 64  # Top-level directories the metadata storm spreads over, and so over NameNodes
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def process_memory(pid):
+    # Current and peak resident set size in bytes, from /proc on Linux; None elsewhere
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            fields = dict(line.split(':', 1) for line in status if ':' in line)
+        return {'rss': int(fields['VmRSS'].split()[0]) * 1024,
+                'peak_rss': int(fields['VmHWM'].split()[0]) * 1024}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class LocalCluster:
+    def __init__(self, data_nodes, block_cache_size=None, keep=False, name_nodes=1):
+        self.data_node_count = data_nodes
+        self.name_node_count = name_nodes
+        self.block_cache_size = block_cache_size
+        self.keep = keep  # Leave the directory and logs behind for inspection
+        self.directory = None
+        self.mount_table = None
+        self.processes = {}
+
+    def spawn(self, name, script, *args):
+        # Each process runs in its own directory, which also collects its log files
+        directory = os.path.join(self.directory, name)
+        os.makedirs(directory)
+        output = open(os.path.join(directory, 'output.txt'), 'wb')
+        self.processes[name] = subprocess.Popen([sys.executable, os.path.join(PACKAGE_DIRECTORY, script),
+                                                 *map(str, args)],
+                                                cwd=directory, stdout=output, stderr=subprocess.STDOUT)
+        output.close()
+        return directory
+
+    def start(self):
+        self.directory = tempfile.mkdtemp(prefix='yadfs-benchmark-')
+        name_nodes = [('localhost', free_port()) for _ in range(self.name_node_count)]
+        self.mount_table = MountTable({'/': name_nodes})
+        for namespace_id, (_, port) in enumerate(name_nodes):
+            self.spawn(f"namenode{namespace_id}", 'name_node.py', '--port', port, '--metrics-port', 0,
+                       '--namespace-id', namespace_id)
+        self.wait_for(self.name_nodes_listening, "the NameNodes to listen")
+
+        for data_node_id in range(self.data_node_count):
+            args = ['--id', data_node_id, '--data-directory', 'blocks']
+            for address, port in name_nodes:
+                args += ['--name-node', f"{address}:{port}"]
+            if self.block_cache_size is not None:
+                args += ['--cache-size', self.block_cache_size]
+            self.spawn(f"datanode{data_node_id}", 'data_node.py', *args)
+        self.wait_for(self.data_nodes_active, f"{self.data_node_count} DataNodes to register everywhere")
+        return self
+
+    def wait_for(self, condition, description):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while not condition():
+            for name, process in self.processes.items():
+                if process.poll() is not None:
+                    raise RuntimeError(f"{name} exited with status {process.returncode}, "
+                                       f"see {self.directory}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Timed out waiting for {description}")
+            time.sleep(0.1)
+
+    def name_nodes_listening(self):
+        try:
+            for name_node in self.mount_table.name_nodes():
+                socket.create_connection(name_node, timeout=1).close()
+            return True
+        except OSError:
+            return False
+
+    def data_nodes_active(self):
+        # Every DataNode must have registered with every NameNode
+        statuses = self.client().broadcast({'action': 'status'}).values()
+        return all(sum(info['status'] == 'active' for info in status['data_nodes'].values())
+                   >= self.data_node_count for status in statuses)
+
+    def client(self):
+        return DFSClient(*self.mount_table.resolve('/'), mount_table=self.mount_table)
+
+    def memory(self):
+        return {name: process_memory(process.pid) for name, process in self.processes.items()}
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self.directory and not self.keep:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def check(response):
+    # DFSClient reports failures as "Error..." strings; a benchmark must not count them as work done
+    if isinstance(response, str) and response.startswith('Error'):
+        raise RuntimeError(response)
+    return response
+
+
+def timed(latencies, function, *args):
+    started = time.perf_counter()
+    result = check(function(*args))
+    latencies.observe(time.perf_counter() - started)
+    return result
+
+
+def latency_summary(latencies):
+    summary = latencies.snapshot()
+    return {key: summary[key] for key in ('count', 'mean', 'p50', 'p99', 'max')}
+
+
+def run_concurrently(concurrency, tasks):
+    # Run the callables in 'tasks' on 'concurrency' threads, returns the elapsed seconds
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(task) for task in tasks]:
+            future.result()
+    return time.perf_counter() - started
+
+
+def large_file_data(options):
+    return random.Random(options.seed).randbytes(options.file_size)
+
+
+def sequential_write(client, options):
+    data = large_file_data(options)
+    started = time.perf_counter()
+    check(client.upload_file(iter([data]), LARGE_FILE, options.block_size))
+    elapsed = time.perf_counter() - started
+    return {'bytes': len(data), 'seconds': elapsed, 'throughput_mb_s': len(data) / elapsed / 1e6}
+
+
+def ensure_large_file(client, options):
+    if isinstance(client.get_block_locations(LARGE_FILE, use_cache=False), str):
+        sequential_write(client, options)
+
+
+def sequential_read(client, options):
+    ensure_large_file(client, options)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        check(client.download_file(LARGE_FILE, os.path.join(directory, 'large')))
+        elapsed = time.perf_counter() - started
+    results['download'] = {'bytes': options.file_size, 'seconds': elapsed,
+                           'throughput_mb_s': options.file_size / elapsed / 1e6}
+
+    # Streaming through the file object, as an application reading in chunks would
+    started = time.perf_counter()
+    size = 0
+    with client.open(LARGE_FILE) as dfs_file:
+        while True:
+            chunk = dfs_file.read(1024 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+    elapsed = time.perf_counter() - started
+    results['stream'] = {'bytes': size, 'seconds': elapsed, 'throughput_mb_s': size / elapsed / 1e6}
+    return results
+
+
+def random_reads(client, options):
+    # Uncached DFS read latency: every read is one ranged request that the DataNode
+    # serves from disk (bypassing its block cache), with no client readahead. Offsets
+    # are aligned to the read size, so with a block size that is a multiple of it each
+    # read is exactly one request. The client only keeps the last two read-size pieces,
+    # so repeats are rare over a large file. The DataNodes' page cache is not bypassed.
+    ensure_large_file(client, options)
+    generator = random.Random(options.seed)
+    latencies = HistogramSeries(1e-6)
+    pieces = max(1, options.file_size // options.read_size)
+    started = time.perf_counter()
+    with client.open(LARGE_FILE, segment_size=options.read_size, readahead=0, block_cache=False) as dfs_file:
+        for _ in range(options.random_reads):
+            offset = generator.randrange(pieces) * options.read_size
+            read_started = time.perf_counter()
+            dfs_file.seek(offset)
+            dfs_file.read(options.read_size)
+            latencies.observe(time.perf_counter() - read_started)
+    elapsed = time.perf_counter() - started
+    return {'reads': options.random_reads, 'read_size': options.read_size, 'seconds': elapsed,
+            'ops_per_second': options.random_reads / elapsed,
+            'latency_seconds': latency_summary(latencies)}
+
+
+def small_files(client, options):
+    data = random.Random(options.seed).randbytes(options.small_file_size)
+    create_latencies = HistogramSeries(1e-6)
+    elapsed = run_concurrently(options.concurrency, [
+        lambda index=index: timed(create_latencies, client.upload_file, iter([data]),
+                                  f"{SMALL_FILE_DIRECTORY}/file_{index:06d}")
+        for index in range(options.small_files)
+    ])
+
+    # Straight to the NameNode, the client cache would answer every listing after the first
+    list_latencies = HistogramSeries(1e-6)
+    listing = {'action': 'list_directory_contents', 'dfs_path': SMALL_FILE_DIRECTORY}
+    for _ in range(options.listings):
+        timed(list_latencies, client.send_request, listing)
+    return {
+        'files': options.small_files,
+        'file_size': options.small_file_size,
+        'seconds': elapsed,
+        'creates_per_second': options.small_files / elapsed,
+        'create_latency_seconds': latency_summary(create_latencies),
+        'list_latency_seconds': latency_summary(list_latencies),
+    }
+
+
+def storm_requests(options):
+    # Read-only metadata requests, one batch for each client thread. The first batches
+    # take one request more when --metadata-ops does not divide evenly.
+    generator = random.Random(options.seed)
+    threads = options.clients * options.concurrency
+    batches = []
+    for thread in range(threads):
+        batch = []
+        for _ in range(options.metadata_ops // threads + (thread < options.metadata_ops % threads)):
+            directory = f"/storm{generator.randrange(STORM_DIRECTORIES)}"
+            request_data = generator.choice([
+                {'action': 'get_block_locations', 'dfs_path': f"{directory}/file"},
+                {'action': 'list_directory_contents', 'dfs_path': directory},
+                {'action': 'get_storage_policy', 'dfs_path': f"{directory}/file"},
+                {'action': 'traverse_directory', 'dfs_path': directory},
+            ])
+            batch.append(request_data)
+        batches.append(batch)
+    return batches
+
+
+def storm_client(mount_table, batches):
+    # One client process: a DFSClient with a thread per batch. Returns the latency
+    # histogram as plain data, and when the work started and ended.
+    client = DFSClient(*MountTable.parse(mount_table).resolve('/'), mount_table=mount_table)
+    latencies = HistogramSeries(1e-6)
+
+    def run_batch(batch):
+        for request_data in batch:
+            # Straight to the NameNode, bypassing the client cache
+            timed(latencies, client.send_request, request_data)
+
+    started = time.time()
+    run_concurrently(len(batches), [lambda batch=batch: run_batch(batch) for batch in batches])
+    return latencies.counts, latencies.count, latencies.sum, latencies.max, started, time.time()
+
+
+def metadata_storm(client, options):
+    # Many concurrent read-only metadata requests over STORM_DIRECTORIES directories,
+    # from 'clients' processes so the client side is not limited to one core either
+    check(client.upload_packed([(b'storm', f"/storm{index}/file") for index in range(STORM_DIRECTORIES)]))
+    batches = storm_requests(options)
+    per_client = [batches[index::options.clients] for index in range(options.clients)]
+    if options.clients == 1:
+        results = [storm_client(str(client.mount_table), per_client[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=options.clients) as executor:
+            mount_tables = [str(client.mount_table)] * options.clients
+            results = list(executor.map(storm_client, mount_tables, per_client))
+
+    latencies = HistogramSeries(1e-6)
+    for counts, count, total, maximum, _, _ in results:
+        for index, bucket_count in counts.items():
+            latencies.counts[index] = latencies.counts.get(index, 0) + bucket_count
+        latencies.count += count
+        latencies.sum += total
+        latencies.max = max(latencies.max, maximum)
+    elapsed = max(result[5] for result in results) - min(result[4] for result in results)
+    return {'operations': latencies.count, 'clients': options.clients, 'concurrency': options.concurrency,
+            'seconds': elapsed, 'ops_per_second': latencies.count / elapsed,
+            'latency_seconds': latency_summary(latencies)}
+
+
+WORKLOADS = {
+    'sequential_write': sequential_write,
+    'sequential_read': sequential_read,
+    'random_reads': random_reads,
+    'small_files': small_files,
+    'metadata_storm': metadata_storm,
+}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=PACKAGE_DIRECTORY, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def run_benchmark(options):
+    workloads = options.workloads or list(WORKLOADS)
+    results = {}
+    with LocalCluster(options.data_nodes, options.block_cache_size, options.keep,
+                      options.name_nodes) as cluster:
+        client = cluster.client()
+        for name in workloads:
+            results[name] = WORKLOADS[name](client, options)
+        memory = cluster.memory()
+    # ru_maxrss is in kilobytes on Linux
+    memory['client'] = {'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+    return {
+        'options': {key: value for key, value in vars(options).items()
+                    if key not in ('output', 'baseline', 'keep')},
+        'environment': environment(),
+        'results': results,
+        'memory': memory,
+    }
+
+
+def flatten(value, prefix=''):
+    # {'a': {'b': 1}} -> {'a.b': 1}, numbers only
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+
+
+def compare(result, baseline):
+    # One line per figure present in both runs, with the relative change
+    lines = []
+    current, previous = flatten(result['results']), flatten(baseline['results'])
+    current.update(flatten(result['memory'], 'memory'))
+    previous.update(flatten(baseline['memory'], 'memory'))
+    for key in sorted(current.keys() & previous.keys()):
+        old, new = previous[key], current[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        lines.append(f"{key}: {old:.6g} -> {new:.6g} ({change})")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark a local multi-process YADFS cluster")
+    parser.add_argument('--data-nodes', type=int, default=3)
+    parser.add_argument('--name-nodes', type=int, default=1, help="More than one federates the namespace")
+    parser.add_argument('--workloads', nargs='*', choices=list(WORKLOADS), help="Default: all of them")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--file-size', type=int, default=64 * 1024 * 1024, help="Bytes in the large file")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE // 4)
+    parser.add_argument('--random-reads', type=int, default=500)
+    parser.add_argument('--read-size', type=int, default=64 * 1024)
+    parser.add_argument('--small-files', type=int, default=500)
+    parser.add_argument('--small-file-size', type=int, default=4096)
+    parser.add_argument('--listings', type=int, default=50)
+    parser.add_argument('--metadata-ops', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=8, help="Threads per client process")
+    parser.add_argument('--clients', type=int, default=1, help="Client processes for the metadata storm")
+    parser.add_argument('--block-cache-size', type=int, default=None, help="Bytes per DataNode block cache")
+    parser.add_argument('--output', help="Write the JSON result here instead of printing it")
+    parser.add_argument('--baseline', help="Earlier JSON result to compare against")
+    parser.add_argument('--keep', action='store_true', help="Keep the cluster directory and logs")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    options = parse_args()
+    result = run_benchmark(options)
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(result, output, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
+    if options.baseline:
+        with open(options.baseline) as baseline:
+            print(compare(result, json.load(baseline)), file=sys.stderr)
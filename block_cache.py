@@ -0,0 +1,112 @@
+# block_cache.py
+
+# In-memory cache of hot blocks for a DataNode.
+#
+# Eviction follows the 2Q idea: a block read once is only remembered by id in a small
+# FIFO of recently seen ids, and its data is not cached. A block read again while its
+# id is still in that FIFO is loaded into the main cache, which is LRU and bounded in
+# bytes. A large scan therefore passes through the FIFO without pushing repeatedly
+# read blocks out, and one-off reads keep using sendfile instead of copying into memory.
+#
+# Blocks can also be pinned on request of the NameNode. Pinned blocks count against
+# the same memory budget but are never evicted.
+import threading
+from collections import OrderedDict
+
+
+class CachedBlock:
+    __slots__ = ('data', 'chunk_size', 'checksums', 'pinned')
+
+    def __init__(self, data, chunk_size, checksums, pinned=False):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.checksums = checksums
+        self.pinned = pinned
+
+
+class BlockCache:
+    def __init__(self, capacity, ghost_entries):
+        self.capacity = capacity  # Bytes of block data held at most
+        self.ghost_entries = ghost_entries
+        self.lock = threading.Lock()
+        self.blocks = OrderedDict()  # block id -> CachedBlock, least recently used first
+        self.seen_once = OrderedDict()  # block ids read once recently, oldest first
+        self.used = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, block_id):
+        # Returns (CachedBlock or None, admit). On a miss 'admit' says whether the
+        # block has been read recently and should be put in the cache.
+        with self.lock:
+            cached = self.blocks.get(block_id)
+            if cached is not None:
+                self.blocks.move_to_end(block_id)
+                self.hits += 1
+                return cached, False
+
+            self.misses += 1
+            if block_id in self.seen_once:
+                del self.seen_once[block_id]
+                return None, True
+            self.seen_once[block_id] = None
+            if len(self.seen_once) > self.ghost_entries:
+                self.seen_once.popitem(last=False)
+            return None, False
+
+    def put(self, block_id, data, chunk_size, checksums, pinned=False):
+        # Returns False if the block does not fit next to the pinned ones
+        with self.lock:
+            existing = self.blocks.pop(block_id, None)
+            if existing is not None:
+                self.used -= len(existing.data)
+                pinned = pinned or existing.pinned
+
+            pinned_bytes = sum(len(cached.data) for cached in self.blocks.values() if cached.pinned)
+            if pinned_bytes + len(data) > self.capacity:
+                if existing is not None:
+                    self.used += len(existing.data)
+                    self.blocks[block_id] = existing
+                return False
+
+            # Evict unpinned blocks, least recently used first, until the new one fits
+            for victim_id in list(self.blocks):
+                if self.used + len(data) <= self.capacity:
+                    break
+                if not self.blocks[victim_id].pinned:
+                    self.used -= len(self.blocks.pop(victim_id).data)
+                    self.evictions += 1
+
+            self.blocks[block_id] = CachedBlock(data, chunk_size, checksums, pinned)
+            self.used += len(data)
+            return True
+
+    def unpin(self, block_id):
+        # The block stays cached but may be evicted again
+        with self.lock:
+            cached = self.blocks.get(block_id)
+            if cached is not None:
+                cached.pinned = False
+
+    def invalidate(self, block_id):
+        with self.lock:
+            cached = self.blocks.pop(block_id, None)
+            if cached is not None:
+                self.used -= len(cached.data)
+            self.seen_once.pop(block_id, None)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'capacity': self.capacity,
+                'used': self.used,
+                'blocks': len(self.blocks),
+                'pinned': sum(1 for cached in self.blocks.values() if cached.pinned),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,142 @@
+# block_store.py
+
+# On-disk block storage for a DataNode.
+#
+# Block ids are handed out by the NameNode and unique across the whole DFS, so a block
+# is stored under its id alone. Files are spread over two levels of subdirectories
+# picked by a hash of the id, which keeps every directory small however many blocks
+# the node holds:
+#
+#   <directory>/subdir<xx>/subdir<yy>/block_<id>.dat   block data
+#   <directory>/subdir<xx>/subdir<yy>/block_<id>.meta  chunk size and per-chunk checksums
+#   <directory>/tmp/                                    blocks still being written
+#
+# A block is written under tmp/ and renamed into its subdirectory once complete, so a
+# crash never leaves a partial block under a real name. The set of stored block ids is
+# kept in memory and rebuilt at startup by listing the subdirectories, without opening
+# or stat-ing any block file.
+#
+# A DataNode with several disks has one BlockStore per disk. Each store runs its disk
+# operations on its own small thread pool, so transfers on a busy disk queue up there
+# without holding up transfers on the others.
+import itertools
+import os
+import shutil
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common import DISK_IO_THREADS
+
+SHARD_FANOUT = 64
+SHARD_MIX = 0x9E3779B97F4A7C15  # Spreads consecutive block ids over the subdirectories
+
+
+class BlockStore:
+    def __init__(self, directory, io_threads=DISK_IO_THREADS):
+        self.directory = directory
+        self.tmp_directory = os.path.join(directory, 'tmp')
+        self.lock = threading.Lock()
+        self.blocks = set()  # Ids of the committed blocks
+        self.temp_counter = itertools.count()
+        self.io_queue = ThreadPoolExecutor(max_workers=io_threads)
+        self.active_writes = 0  # Maintained by the DataNode to spread writes over stores
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def submit(self, function, *args):
+        # Queue a disk operation on this store's I/O threads, returns a Future
+        return self.io_queue.submit(function, *args)
+
+    def free_space(self):
+        return shutil.disk_usage(self.directory).free
+
+    def shard_directory(self, block_id):
+        mixed = (block_id * SHARD_MIX) & 0xFFFFFFFFFFFFFFFF
+        first, second = (mixed >> 58) % SHARD_FANOUT, (mixed >> 52) % SHARD_FANOUT
+        return os.path.join(self.directory, f"subdir{first:02x}", f"subdir{second:02x}")
+
+    def block_path(self, block_id):
+        return os.path.join(self.shard_directory(block_id), f"block_{block_id}.dat")
+
+    def checksum_path(self, block_id):
+        return os.path.join(self.shard_directory(block_id), f"block_{block_id}.meta")
+
+    def load(self):
+        # Anything left in tmp/ was being written when the node stopped
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+        os.makedirs(self.tmp_directory)
+
+        blocks = set()
+        for first in os.scandir(self.directory):
+            if not (first.is_dir() and first.name.startswith('subdir')):
+                continue
+            for second in os.scandir(first.path):
+                for entry in os.scandir(second.path):
+                    if entry.name.startswith('block_') and entry.name.endswith('.dat'):
+                        blocks.add(int(entry.name[len('block_'):-len('.dat')]))
+        self.blocks = blocks
+
+    def temp_path(self, block_id):
+        # Unique per writer, so a retried write never collides with one still running
+        return os.path.join(self.tmp_directory, f"block_{block_id}_{next(self.temp_counter)}.tmp")
+
+    def commit(self, block_id, temp_path, chunk_size, checksums):
+        # Move a fully written block into place; the checksums go first so a visible
+        # block always has them
+        os.makedirs(self.shard_directory(block_id), exist_ok=True)
+        meta_temp_path = temp_path + '.meta'
+        with open(meta_temp_path, 'wb') as checksum_file:
+            checksum_file.write(struct.pack(f'!I{len(checksums)}I', chunk_size, *checksums))
+        os.replace(meta_temp_path, self.checksum_path(block_id))
+        os.replace(temp_path, self.block_path(block_id))
+        with self.lock:
+            self.blocks.add(block_id)
+
+    def discard(self, temp_path):
+        for path in (temp_path, temp_path + '.meta'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def contains(self, block_id):
+        with self.lock:
+            return block_id in self.blocks
+
+    def list_blocks(self):
+        with self.lock:
+            return list(self.blocks)
+
+    def delete(self, block_id):
+        # Returns False if the block was not stored here
+        with self.lock:
+            if block_id not in self.blocks:
+                return False
+            self.blocks.discard(block_id)
+        for path in (self.block_path(block_id), self.checksum_path(block_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return True
+
+    def read_checksums(self, block_id):
+        with open(self.checksum_path(block_id), 'rb') as checksum_file:
+            stored = checksum_file.read()
+        count = len(stored) // 4 - 1
+        chunk_size, *checksums = struct.unpack(f'!I{count}I', stored)
+        return chunk_size, checksums
+
+    def open_block(self, block_id):
+        # Returns (file, size, chunk_size, checksums); the caller closes the file.
+        # Used to send a block straight from the file without reading it into memory.
+        if not self.contains(block_id):
+            raise FileNotFoundError(f"Block {block_id} not found")
+        chunk_size, checksums = self.read_checksums(block_id)
+        block_file = open(self.block_path(block_id), 'rb')
+        return block_file, os.fstat(block_file.fileno()).st_size, chunk_size, checksums
+
+    def read_block(self, block_id):
+        # Returns the block data with the checksums it was stored with
+        block_file, _, chunk_size, checksums = self.open_block(block_id)
+        with block_file:
+            return block_file.read(), chunk_size, checksums
@@ -1,23 +1,222 @@
 from flask import Flask, render_template, request, jsonify
 import socket
-import pickle
 import threading
-import time
+import os
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
+
+import numpy as np
+
+from protocol import (ChecksumError, ConnectionPool, call, recv_message, send_packet, send_request,
+                      verify_chunks)
+from common import (CLIENT_CONNECTION_POOL_SIZE, DEFAULT_BLOCK_SIZE, PACKET_SIZE, DOWNLOAD_PARALLELISM,
+                    CLIENT_CACHE_ENTRIES, CLIENT_CACHE_TTL, COMPRESSION_WORKERS, READ_SEGMENT_SIZE,
+                    READAHEAD_SEGMENTS, PACK_CONTAINER_SIZE, PACK_MAX_FILE_SIZE, MOUNT_TABLE)
+from metadata_cache import MetadataCache
+from erasure import REPLICATED, ReedSolomon, parse_policy
+from namespace import split_path
+from compression import get_codec
+from dedup import CDC, FIXED, block_hash, cdc_chunks, fixed_chunks
+from dfs_file import DFSFile
+from federation import MountTable
 
 app = Flask(__name__)
 
+class SourceReader:
+    # Reads exact-sized pieces from a local path, a binary file object, bytes or an
+    # iterable of bytes
+    def __init__(self, source):
+        self.file = None
+        self.chunks = None
+        self.buffer = bytearray()
+        self.position = 0  # Bytes returned so far
+        if isinstance(source, str):
+            self.file = open(source, "rb")
+            self.owns_file = True
+        elif hasattr(source, 'read'):
+            self.file = source
+            self.owns_file = False
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self.chunks = iter([source])
+        else:
+            self.chunks = iter(source)
+
+    def read(self, size):
+        # Returns 'size' bytes, fewer only at the end of the source
+        while len(self.buffer) < size:
+            if self.file is not None:
+                data = self.file.read(size - len(self.buffer))
+            else:
+                data = next(self.chunks, b'')
+            if not data:
+                break
+            self.buffer += data
+
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.position += len(data)
+        return data
+
+    def close(self):
+        if self.file is not None and self.owns_file:
+            self.file.close()
+
+
+def split_packets(data, packet_size):
+    view = memoryview(data)
+    return (view[offset:offset + packet_size] for offset in range(0, len(view), packet_size))
+
+
+class BlockWriter:
+    # Streams one block as a sequence of checksummed packets to the first reachable
+    # DataNode that accepts it, which forwards them down a pipeline to the other replicas.
+    def __init__(self, block_id, data_nodes, packet_size):
+        self.block_id = block_id
+        self.seq = 0
+        self.sock = None
+        for index, data_node in enumerate(data_nodes):
+            sock = None
+            try:
+                sock = socket.create_connection((data_node['address'], data_node['port']))
+                send_request(sock, {
+                    'action': 'write_block',
+                    'block_id': block_id,
+                    'packet_size': packet_size,
+                    'pipeline': data_nodes[index + 1:]
+                })
+                # The DataNode acks once it is ready for the packets; a busy one says so instead
+                message = recv_message(sock)
+                response = message[2] if message else 'Error: no response'
+            except OSError as e:
+                response = f"Error: {e}"
+            if isinstance(response, str):
+                if sock is not None:
+                    sock.close()
+                print(f"Could not open block {block_id} on DataNode {data_node['data_node_id']}: {response}")
+                continue
+            self.sock = sock
+            break
+
+    def send(self, packet, last=False):
+        if self.sock is None:
+            return
+        try:
+            send_packet(self.sock, self.seq, packet, last)
+        except OSError as e:
+            print(f"Lost the replication pipeline while writing block {self.block_id}: {e}")
+            self.sock.close()
+            self.sock = None
+        self.seq += 1
+
+    def close(self):
+        # Ends the stream and returns the ids of the DataNodes that stored the block
+        self.send(b'', last=True)
+        if self.sock is None:
+            return []
+        try:
+            message = recv_message(self.sock)
+            response = message[2] if message else 'Error: no response'
+        except OSError as e:
+            response = f"Error: {e}"
+        finally:
+            self.sock.close()
+        if isinstance(response, str):
+            print(f"Could not store block {self.block_id}: {response}")
+            return []
+        return response['stored_on']
+
+
 class DFSClient:
-    def __init__(self, name_node_address, name_node_port):
+    def __init__(self, name_node_address, name_node_port, pool_size=CLIENT_CONNECTION_POOL_SIZE,
+                 mount_table=MOUNT_TABLE):
         self.name_node_address = name_node_address
         self.name_node_port = name_node_port
 
-    def send_request(self, request_data):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-            client_socket.connect((self.name_node_address, self.name_node_port))
-            serialized_request = pickle.dumps(request_data)
-            client_socket.sendall(serialized_request)
-            response = client_socket.recv(1024)
-            return response.decode()
+        # Which NameNode holds which part of the namespace, see federation.py. Without a
+        # mount table (a MountTable or its text form) the given NameNode holds all of it.
+        if isinstance(mount_table, str):
+            mount_table = MountTable.parse(mount_table)
+        self.mount_table = mount_table or MountTable({'/': [(name_node_address, name_node_port)]})
+
+        # Long-lived connections to each NameNode, shared by every call on this client
+        self.name_nodes = {name_node: ConnectionPool(*name_node, size=pool_size)
+                           for name_node in self.mount_table.name_nodes()}
+        self.name_node = self.name_nodes[self.mount_table.resolve('/')]
+
+        # Block locations, listings and trees, kept valid through NameNode change leases.
+        # Each NameNode numbers its changes on its own, so each gets its own cache.
+        self.caches = {name_node: MetadataCache(CLIENT_CACHE_ENTRIES, CLIENT_CACHE_TTL) for name_node in self.name_nodes}
+        self.cache = self.caches[self.mount_table.resolve('/')]
+
+        # Worker processes for block compression, started on first use
+        self.compression_workers = COMPRESSION_WORKERS
+        self.compression_pool = None
+        self.compression_pool_lock = threading.Lock()
+
+    def run_codec(self, function, data):
+        # Run a codec function in the process pool so codecs use every core instead of
+        # taking turns on the GIL. Returns a Future.
+        with self.compression_pool_lock:
+            if self.compression_pool is None:
+                self.compression_pool = ProcessPoolExecutor(max_workers=self.compression_workers)
+        return self.compression_pool.submit(function, data)
+
+    def send_request(self, request_data, dfs_path=None, name_node=None):
+        # Goes to 'name_node' if given, else to the NameNode holding 'dfs_path' or the
+        # request's own 'dfs_path'. Requests naming no path go to the NameNode of '/'.
+        if name_node is None:
+            name_node = self.mount_table.resolve(dfs_path or request_data.get('dfs_path') or '/')
+        response, _ = self.name_nodes[name_node].request(request_data)
+        return response
+
+    def broadcast(self, request_data):
+        # Send a request to every NameNode, returns {'address:port': response}
+        return {f"{address}:{port}": self.send_request(request_data, name_node=(address, port))
+                for address, port in self.name_nodes}
+
+    def invalidate(self, dfs_paths):
+        # Our own changes are visible to us right away, not just after the lease
+        for cache in self.caches.values():
+            cache.invalidate(dfs_paths)
+
+    def cached_request(self, kind, dfs_path, request_data, name_node=None):
+        # Answer a read-only metadata request from the cache when the lease allows it.
+        # Errors are never cached.
+        name_node = name_node or self.mount_table.resolve(dfs_path)
+        cache = self.caches[name_node]
+        if not cache.lease_valid():
+            cache.renew(self.send_request({'action': 'get_changes', 'since': cache.txid}, name_node=name_node))
+
+        response = cache.get(kind, dfs_path)
+        if response is None:
+            generation = cache.generation
+            response = self.send_request(request_data, name_node=name_node)
+            if not isinstance(response, str):
+                cache.put(kind, dfs_path, response, generation)
+        return response
+
+    def batch(self, requests):
+        # Send several metadata requests in one round trip per NameNode involved,
+        # responses come back in the same order as the requests
+        per_name_node = {}
+        for index, request_data in enumerate(requests):
+            name_node = self.mount_table.resolve(request_data.get('dfs_path') or '/')
+            per_name_node.setdefault(name_node, []).append(index)
+
+        responses = [None] * len(requests)
+        for name_node, indexes in per_name_node.items():
+            request_data = {
+                'action': 'batch',
+                'requests': [requests[index] for index in indexes]
+            }
+            batch_responses = self.send_request(request_data, name_node=name_node)
+            if isinstance(batch_responses, str):
+                batch_responses = [batch_responses] * len(indexes)
+            for index, response in zip(indexes, batch_responses):
+                responses[index] = response
+        return responses
 
     def register_data_node(self, data_node_id, data_node_address, data_node_port):
         request_data = {
@@ -34,14 +233,23 @@ class DFSClient:
             'parent_path': parent_path,
             'directory_name': directory_name
         }
-        return self.send_request(request_data)
+        directory_path = parent_path.rstrip('/') + '/' + directory_name
+        # Our own changes are visible to us right away, not just after the lease
+        self.invalidate([directory_path])
+        return self.send_request(request_data, directory_path)
 
-    def delete_directory(self, directory_path):
+    def delete_directory(self, directory_path, recursive=True):
+        # Deletes everything below the directory unless 'recursive' is False
         request_data = {
             'action': 'delete_directory',
-            'directory_path': directory_path
+            'directory_path': directory_path,
+            'recursive': recursive
         }
-        return self.send_request(request_data)
+        self.invalidate([directory_path])
+        # A mount point spread over several NameNodes is deleted on each of them
+        responses = [self.send_request(request_data, name_node=name_node)
+                     for name_node in self.mount_table.spread(directory_path)]
+        return next((response for response in responses if not response.startswith('Error')), responses[0])
 
     def move_file(self, source_path, destination_path):
         request_data = {
@@ -49,21 +257,510 @@ class DFSClient:
             'source_path': source_path,
             'destination_path': destination_path
         }
-        return self.send_request(request_data)
+        # Moving onto a directory spread over several NameNodes lands below it, on the
+        # NameNode of the source's name
+        name_node = self.mount_table.resolve(source_path)
+        destination = destination_path
+        if len(self.mount_table.spread(destination_path)) > 1 and split_path(source_path):
+            destination = destination_path.rstrip('/') + '/' + split_path(source_path)[-1]
+        if self.mount_table.resolve(destination) != name_node:
+            return f"Error: Cannot move '{source_path}' to '{destination_path}', they are on different NameNodes."
+        self.invalidate([source_path, destination_path])
+        return self.send_request(request_data, name_node=name_node)
+
+    def upload_file(self, source, dfs_path, block_size=DEFAULT_BLOCK_SIZE, compression=None, dedup=None):
+        # 'source' is a local path, a binary file object or an iterable of bytes chunks.
+        # Blocks go straight to the DataNodes; the NameNode only allocates and records them.
+        # 'compression' names a codec from compression.py, e.g. 'zlib' or 'lzma'.
+        # 'dedup' is 'fixed' or 'cdc' to skip sending blocks that are already stored,
+        # see dedup.py.
+        return self.write_file(source, dfs_path, block_size, compression, dedup)
+
+    def write_file(self, source, dfs_path, block_size, compression=None, dedup=None, expected_blocks=None):
+        # The storage policy of the target directory decides between replicated blocks
+        # and erasure-coded block groups
+        try:
+            codec = get_codec(compression)
+        except ValueError as e:
+            return f"Error: {e}"
+        policy = self.send_request({'action': 'get_storage_policy', 'dfs_path': dfs_path})
+        if policy.startswith('Error'):
+            return policy
+        if codec is not None and policy != REPLICATED:
+            return f"Error: '{dfs_path}' is erasure-coded ({policy}), its blocks are stored uncompressed."
+        if dedup is not None and policy != REPLICATED:
+            return f"Error: '{dfs_path}' is erasure-coded ({policy}), its blocks are not deduplicated."
+        if dedup not in (None, FIXED, CDC):
+            return f"Error: Unknown deduplication mode '{dedup}'."
+        if dedup == CDC and codec is not None:
+            # Compressed files rely on every block but the last holding block_size bytes
+            return "Error: Content-defined chunking cannot be combined with compression."
 
-    def upload_file(self, local_path, dfs_path):
+        reader = SourceReader(source)
+        try:
+            if policy == REPLICATED:
+                written = self.write_replicated(reader, dfs_path, block_size, codec, dedup)
+            else:
+                written = self.write_striped(reader, dfs_path, block_size, policy)
+        finally:
+            reader.close()
+        if isinstance(written, str):
+            return written
+
+        blocks, size, attributes = written
         request_data = {
-            'action': 'upload_file',
-            'local_path': local_path,
+            'action': 'complete_file',
+            'dfs_path': dfs_path,
+            'size': size,
+            'block_size': block_size,
+            'blocks': blocks,
+            'attributes': attributes
+        }
+        if expected_blocks is not None:
+            request_data['expected_blocks'] = expected_blocks
+        response = self.send_request(request_data)
+        self.invalidate([dfs_path])
+        return response
+
+    def upload_packed(self, files, container_size=PACK_CONTAINER_SIZE):
+        # Upload many small files, packed back to back into shared container blocks.
+        # 'files' is an iterable of (source, dfs_path) with sources as for upload_file or bytes.
+        # A packed file costs the NameNode a namespace entry but no block of its own and
+        # is read like any other file. Files over PACK_MAX_FILE_SIZE are uploaded normally.
+        def entries():
+            for source, dfs_path in files:
+                reader = SourceReader(source)
+                try:
+                    data = reader.read(PACK_MAX_FILE_SIZE + 1)
+                    if len(data) <= PACK_MAX_FILE_SIZE:
+                        yield data, dfs_path, None
+                        continue
+                    rest = iter(lambda: reader.read(PACKET_SIZE), b'')
+                    response = self.upload_file(itertools.chain([data], rest), dfs_path)
+                finally:
+                    reader.close()
+                if response.startswith('Error'):
+                    raise IOError(response)
+
+        try:
+            written = self.write_packed(entries(), container_size)
+        except IOError as e:
+            # A large file could not be uploaded
+            return str(e)
+        if isinstance(written, str):
+            return written
+        packed, containers, rejected = written
+        if rejected:
+            return (f"Error: Could not create {len(rejected)} files: {rejected}; "
+                    f"{packed} others packed into {containers} container blocks.")
+        return f"{packed} files packed into {containers} container blocks successfully."
+
+    def repack_files(self, dfs_paths, container_size=PACK_CONTAINER_SIZE):
+        # Copy packed files into new containers, e.g. to compact containers that are mostly
+        # deleted files. A file that changes meanwhile keeps its newer version.
+        def entries():
+            for dfs_path in dfs_paths:
+                locations = self.get_block_locations(dfs_path, use_cache=False)
+                if isinstance(locations, str) or 'container_offset' not in locations['attributes']:
+                    continue
+                data = b''.join(memoryview(read())[:length] for _, length, read in self.file_pieces(dfs_path, locations))
+                yield data, dfs_path, [block['block_id'] for block in locations['blocks']]
+
+        written = self.write_packed(entries(), container_size)
+        if isinstance(written, str):
+            return written
+        return f"{written[0]} files repacked into {written[1]} container blocks successfully."
+
+    def write_packed(self, entries, container_size):
+        # Collect (data, dfs_path, expected blocks) entries into containers of up to
+        # 'container_size' bytes and store each one. Returns (files, containers, rejected)
+        # with {path: reason} for files the NameNode refused, or an error string.
+        # A container belongs to one NameNode, so each NameNode's files are collected apart
+        open_containers = {}  # NameNode -> (container, files)
+        packed = containers = 0
+        rejected = {}
+        for data, dfs_path, expected_blocks in itertools.chain(entries, [(None, None, None)]):
+            name_node = self.mount_table.resolve(dfs_path) if data is not None else None
+            for key in list(open_containers) if data is None else [name_node]:
+                container, files = open_containers.get(key, (None, None))
+                if files and (data is None or len(container) + len(data) > container_size):
+                    response = self.write_container(container, files)
+                    if isinstance(response, str):
+                        return response
+                    packed += response['packed']
+                    rejected.update(response['rejected'])
+                    containers += response['packed'] > 0
+                    del open_containers[key]
+            if data is None:
+                break
+            container, files = open_containers.setdefault(name_node, (bytearray(), []))
+            file = {'dfs_path': dfs_path, 'offset': len(container), 'length': len(data)}
+            if expected_blocks is not None:
+                file['expected_blocks'] = expected_blocks
+            files.append(file)
+            container += data
+        return packed, containers, rejected
+
+    def write_container(self, container, files):
+        # One replicated block holding every file in 'files', then a single request
+        # records all of them. Returns the NameNode's response ({'packed', 'skipped',
+        # 'rejected', ...}) or an error string.
+        allocation = self.send_request({
+            'action': 'allocate_block',
+            'dfs_path': files[0]['dfs_path'],
+            'block_size': len(container),
+        })
+        if isinstance(allocation, str):
+            return allocation
+
+        writer = BlockWriter(allocation['block_id'], allocation['data_nodes'], PACKET_SIZE)
+        for packet in split_packets(container, PACKET_SIZE):
+            writer.send(packet)
+        stored_on = writer.close()
+        if not stored_on:
+            return f"Error: Container block {allocation['block_id']} could not be stored on any DataNode."
+
+        response = self.send_request({
+            'action': 'complete_packed_files',
+            'block': {'block_id': allocation['block_id'], 'size': len(container), 'data_node_ids': stored_on},
+            'files': files,
+        }, files[0]['dfs_path'])
+        self.invalidate([file['dfs_path'] for file in files])
+        return response
+
+    def write_replicated(self, reader, dfs_path, block_size, codec=None, dedup=None):
+        # Returns (blocks, size, attributes) or an error string
+        packet_size = min(PACKET_SIZE, block_size)
+        if codec is None and dedup is None:
+            contents = ((packets, None) for packets in self.block_packets(reader, block_size, packet_size))
+        else:
+            # Whole blocks are needed up front to compress or hash them
+            chunks = cdc_chunks(reader, block_size) if dedup == CDC else fixed_chunks(reader, block_size)
+            if codec is not None:
+                chunks = self.compressed_blocks(chunks, codec)
+            contents = ((split_packets(chunk, packet_size), block_hash(chunk) if dedup else None) for chunk in chunks)
+
+        blocks = []
+        written = {}  # content hash -> block written earlier in this upload
+        for packets, content_hash in contents:
+            if content_hash is not None:
+                existing = written.get(content_hash) or self.send_request({'action': 'find_block', 'hash': content_hash}, dfs_path)
+                if isinstance(existing, str):
+                    return existing
+                if existing:
+                    # Already stored, refer to it instead of sending it again
+                    blocks.append({'block_id': existing['block_id'], 'size': existing['size'],
+                                   'data_node_ids': existing['data_node_ids'], 'hash': content_hash})
+                    continue
+
+            allocation = self.send_request({
+                'action': 'allocate_block',
+                'dfs_path': dfs_path,
+                'block_size': block_size,
+            })
+            if isinstance(allocation, str):
+                return allocation
+
+            block_id = allocation['block_id']
+            writer = BlockWriter(block_id, allocation['data_nodes'], packet_size)
+            block_length = 0
+            for packet in packets:
+                writer.send(packet)
+                block_length += len(packet)
+            stored_on = writer.close()
+
+            if not stored_on:
+                return f"Error: Block {block_id} of '{dfs_path}' could not be stored on any DataNode."
+
+            block = {'block_id': block_id, 'size': block_length, 'data_node_ids': stored_on}
+            if content_hash is not None:
+                block['hash'] = content_hash
+                written[content_hash] = block
+            blocks.append(block)
+
+        attributes = {}
+        if codec is not None:
+            attributes['compression'] = codec.name
+        if dedup is not None:
+            attributes['dedup'] = dedup
+        return blocks, reader.position, attributes
+
+    def block_packets(self, reader, block_size, packet_size):
+        # Yields the packets of each block in turn, reading the source as they are sent
+        def packets(packet):
+            block_length = 0
+            while packet:
+                yield packet
+                block_length += len(packet)
+                packet = reader.read(min(packet_size, block_size - block_length)) if block_length < block_size else b''
+
+        packet = reader.read(packet_size)
+        while packet:
+            yield packets(packet)
+            packet = reader.read(packet_size)
+
+    def compressed_blocks(self, chunks, codec):
+        # Compress each chunk; upcoming ones are compressed in the process pool while
+        # earlier ones are being sent
+        pending = deque()
+        while True:
+            while len(pending) < self.compression_workers:
+                data = next(chunks, None)
+                if data is None:
+                    break
+                pending.append(self.run_codec(codec.compress, data))
+            if not pending:
+                return
+            yield pending.popleft().result()
+
+    def write_striped(self, reader, dfs_path, block_size, policy):
+        # Cut the source into block groups of k data cells, add m parity cells and
+        # write every cell to its own DataNode. Returns (blocks, size, attributes) or an
+        # error string. Cells of the last group are shorter, padded with zeros.
+        coder = ReedSolomon(*parse_policy(policy))
+        data_cells, parity_cells = coder.data_cells, coder.parity_cells
+        cell_size = -(-block_size // data_cells)
+        packet_size = min(PACKET_SIZE, cell_size)
+        blocks = []
+        size = 0
+
+        with ThreadPoolExecutor(max_workers=data_cells + parity_cells) as executor:
+            data = reader.read(data_cells * cell_size)
+            while data:
+                cell_length = -(-len(data) // data_cells)
+                cells = np.zeros((data_cells, cell_length), dtype=np.uint8)
+                cells.reshape(-1)[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+                cells = np.concatenate([cells, coder.encode(cells)])
+
+                allocation = self.send_request({
+                    'action': 'allocate_block_group',
+                    'dfs_path': dfs_path,
+                    'policy': policy,
+                    'cell_size': cell_length,
+                })
+                if isinstance(allocation, str):
+                    return allocation
+
+                def write_cell(index):
+                    writer = BlockWriter(allocation['block_ids'][index], [allocation['data_nodes'][index]], packet_size)
+                    cell = memoryview(cells[index])
+                    for offset in range(0, cell_length, packet_size):
+                        writer.send(cell[offset:offset + packet_size])
+                    return writer.close()
+
+                stored_on = list(executor.map(write_cell, range(len(cells))))
+                # Up to m lost cells per group can be rebuilt from the others
+                if sum(1 for data_node_ids in stored_on if not data_node_ids) > parity_cells:
+                    return f"Error: Too many cells of a block group of '{dfs_path}' could not be stored."
+
+                for block_id, data_node_ids in zip(allocation['block_ids'], stored_on):
+                    blocks.append({'block_id': block_id, 'size': cell_length, 'data_node_ids': data_node_ids})
+                size += len(data)
+                data = reader.read(data_cells * cell_size)
+
+        return blocks, size, {'storage_policy': policy, 'cell_size': cell_size}
+
+    def convert_file(self, dfs_path):
+        # Rewrite a file under its directory's current storage policy, e.g. re-encode a
+        # replicated file below an erasure-coded directory. The NameNode only swaps in the
+        # new blocks if the file was not replaced in the meantime.
+        locations = self.get_block_locations(dfs_path, use_cache=False)
+        if isinstance(locations, str):
+            return locations
+        source = (memoryview(read())[:length] for _, length, read in self.file_pieces(dfs_path, locations))
+        return self.write_file(source, dfs_path, locations['block_size'],
+                               expected_blocks=[block['block_id'] for block in locations['blocks']])
+
+    def set_storage_policy(self, dfs_path, policy):
+        # REPLICATED or 'RS-<data cells>-<parity cells>', e.g. 'RS-6-3', for files below 'dfs_path'
+        request_data = {
+            'action': 'set_storage_policy',
+            'dfs_path': dfs_path,
+            'policy': policy
+        }
+        self.invalidate([dfs_path])
+        responses = [self.send_request(request_data, name_node=name_node)
+                     for name_node in self.mount_table.spread(dfs_path)]
+        return next((response for response in responses if response.startswith('Error')), responses[0])
+
+    def get_block_locations(self, dfs_path, use_cache=True):
+        request_data = {
+            'action': 'get_block_locations',
             'dfs_path': dfs_path
         }
-        return self.send_request(request_data)
+        if not use_cache:
+            return self.send_request(request_data)
+        return self.cached_request('locations', dfs_path, request_data)
+
+    def read_block(self, block, first_replica=0, offset=0, length=None, block_cache=True):
+        # Try each replica in turn until one returns the block. The NameNode lists live
+        # replicas first; reads start at 'first_replica' among those, so they spread over
+        # live DataNodes and only fall back to the others when all of them fail.
+        # With 'length' only that byte range is read. Without 'block_cache' the DataNode
+        # neither serves the block from its block cache nor admits it there.
+        request_data = {'action': 'read_block', 'block_id': block['block_id']}
+        if length is not None:
+            request_data.update(offset=offset, length=length)
+        if not block_cache:
+            request_data['block_cache'] = False
+        live = block.get('live_replicas', len(block['data_nodes']))
+        start = first_replica % live if live else 0
+        data_nodes = block['data_nodes'][start:live] + block['data_nodes'][:start] + block['data_nodes'][live:]
+        for data_node in data_nodes:
+            try:
+                response, block_data = call(data_node['address'], data_node['port'], request_data)
+                if not isinstance(response, str):
+                    verify_chunks(block_data, response['chunk_size'], response['checksums'])
+                    if length is None:
+                        return block_data
+                    # The DataNode sends whole checksum chunks, starting at or before 'offset'
+                    skip = offset - response['offset']
+                    return memoryview(block_data)[skip:skip + length]
+            except (OSError, ChecksumError) as e:
+                response = f"Error: {e}"
+            print(f"Could not read block {block['block_id']} from DataNode {data_node['data_node_id']}: {response}")
+        raise IOError(f"Block {block['block_id']} is not available on any DataNode")
+
+    def read_replicated_block(self, dfs_path, block, first_replica=0, offset=0, length=None, block_cache=True):
+        try:
+            return self.read_block(block, first_replica, offset, length, block_cache)
+        except IOError:
+            # Cached locations can predate re-replication, ask the NameNode again
+            fresh = self.get_block_locations(dfs_path, use_cache=False)
+            fresh_blocks = {} if isinstance(fresh, str) else {b['block_id']: b for b in fresh['blocks']}
+            if block['block_id'] not in fresh_blocks:
+                raise
+            return self.read_block(fresh_blocks[block['block_id']], first_replica, offset, length, block_cache)
+
+    def read_compressed_block(self, dfs_path, block, first_replica, codec, block_cache=True):
+        data = self.read_replicated_block(dfs_path, block, first_replica, block_cache=block_cache)
+        return self.run_codec(codec.decompress, data).result()
+
+    def read_block_group(self, group, coder, block_cache=True):
+        # Read the data cells of one erasure-coded block group. Cells that cannot be read
+        # are rebuilt from parity cells, which are only fetched when needed.
+        # Returns the k data cells back to back as a uint8 array.
+        data_cells = coder.data_cells
+        cells = {}
+
+        def fetch(index):
+            try:
+                return index, np.frombuffer(self.read_block(group[index], block_cache=block_cache), dtype=np.uint8)
+            except IOError:
+                return index, None
+
+        with ThreadPoolExecutor(max_workers=len(group)) as executor:
+            wanted = list(range(data_cells))
+            next_parity = data_cells
+            while wanted:
+                for index, cell in executor.map(fetch, wanted):
+                    if cell is not None:
+                        cells[index] = cell
+                missing = data_cells - len(cells)
+                wanted = list(range(next_parity, min(len(group), next_parity + missing)))
+                next_parity += len(wanted)
 
-    def download_file(self, dfs_path, local_path):
+        if len(cells) < data_cells:
+            raise IOError(f"Only {len(cells)} of the {len(group)} cells of block group "
+                          f"{group[0]['block_id']} are readable, {data_cells} are needed")
+        return coder.decode(cells).reshape(-1)
+
+    def file_pieces(self, dfs_path, locations, segment_size=None, block_cache=True):
+        # Split a file into pieces that can be read independently, as [(offset, length, read)]
+        # where read() returns at least 'length' bytes. A piece is one block of a
+        # replicated file or one block group of an erasure-coded file. With 'segment_size'
+        # blocks of uncompressed replicated files are split further into ranged reads of
+        # that size; compressed blocks and block groups can only be read whole.
+        attributes = locations.get('attributes', {})
+        policy = attributes.get('storage_policy', REPLICATED)
+        codec = get_codec(attributes.get('compression'))
+        blocks = locations['blocks']
+        pieces = []
+        if 'container_offset' in attributes:
+            # A packed small file: one byte range of its container block
+            if locations['size']:
+                pieces.append((0, locations['size'], partial(self.read_replicated_block, dfs_path, blocks[0], 0,
+                                                             attributes['container_offset'], locations['size'],
+                                                             block_cache)))
+        elif codec is not None:
+            # Every block but the last holds exactly block_size bytes of the file
+            block_size = locations['block_size']
+            for index, block in enumerate(blocks):
+                offset = index * block_size
+                pieces.append((offset, min(block_size, locations['size'] - offset),
+                               partial(self.read_compressed_block, dfs_path, block, index, codec, block_cache)))
+        elif policy == REPLICATED:
+            offset = 0
+            for index, block in enumerate(blocks):
+                # Start at a different live replica for each block to spread reads across DataNodes
+                if segment_size is None or block['size'] <= segment_size:
+                    pieces.append((offset, block['size'], partial(self.read_replicated_block, dfs_path, block, index,
+                                                               block_cache=block_cache)))
+                else:
+                    for start in range(0, block['size'], segment_size):
+                        length = min(segment_size, block['size'] - start)
+                        pieces.append((offset + start, length,
+                                       partial(self.read_replicated_block, dfs_path, block, index, start, length,
+                                               block_cache)))
+                offset += block['size']
+        else:
+            coder = ReedSolomon(*parse_policy(policy))
+            width = coder.data_cells + coder.parity_cells
+            group_size = coder.data_cells * attributes['cell_size']
+            for offset in range(0, locations['size'], group_size):
+                first = offset // group_size * width
+                pieces.append((offset, min(group_size, locations['size'] - offset),
+                               partial(self.read_block_group, blocks[first:first + width], coder, block_cache)))
+        return pieces
+
+    def download_file(self, dfs_path, local_path, parallelism=DOWNLOAD_PARALLELISM):
+        # Look up every block location once, then fetch blocks concurrently and write each
+        # one straight to its offset in the preallocated output file, in whatever order
+        # they arrive.
+        locations = self.get_block_locations(dfs_path)
+        if isinstance(locations, str):
+            return locations
+
+        fd = os.open(local_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, locations['size'])
+
+            def fetch(piece):
+                offset, length, read = piece
+                data = memoryview(read())[:length]
+                written = 0
+                while written < len(data):
+                    written += os.pwrite(fd, data[written:], offset + written)
+
+            with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+                pieces = self.file_pieces(dfs_path, locations)
+                for future in as_completed([executor.submit(fetch, piece) for piece in pieces]):
+                    future.result()
+        except (IOError, ValueError) as e:
+            return f"Error downloading file '{dfs_path}': {e}"
+        finally:
+            os.close(fd)
+
+        return f"File '{dfs_path}' downloaded to local path '{local_path}' successfully."
+
+    def open(self, dfs_path, segment_size=READ_SEGMENT_SIZE, readahead=READAHEAD_SEGMENTS, block_cache=True):
+        # A seekable, read-only file object (io.RawIOBase) over a DFS file. Only the
+        # parts that are read are fetched; wrap it in io.BufferedReader for small reads.
+        # With 'block_cache' False every read goes to the DataNodes' disks, for data
+        # read once (a scan) that would only push hot blocks out of their caches.
+        # Raises FileNotFoundError if the file does not exist.
+        locations = self.get_block_locations(dfs_path)
+        if isinstance(locations, str):
+            raise FileNotFoundError(locations)
+        pieces = self.file_pieces(dfs_path, locations, segment_size, block_cache)
+        return DFSFile(dfs_path, locations['size'], pieces, readahead)
+
+    def pin_file(self, dfs_path, pinned=True):
+        # Keep the file's blocks in DataNode memory for repeated reads (or release them)
         request_data = {
-            'action': 'download_file',
+            'action': 'pin_file',
             'dfs_path': dfs_path,
-            'local_path': local_path
+            'pinned': pinned
         }
         return self.send_request(request_data)
 
@@ -77,14 +774,32 @@ class DFSClient:
             'action': 'list_directory_contents',
             'dfs_path': dfs_path
         }
-        return self.send_request(request_data)
+        # Entries of a mount point spread over several NameNodes come from each of them,
+        # and mount points below 'dfs_path' show up as directories
+        responses = [self.cached_request('listing', dfs_path, request_data, name_node)
+                     for name_node in self.mount_table.spread(dfs_path)]
+        listings = [response for response in responses if not isinstance(response, str)]
+        mounts = self.mount_table.mounts_below(dfs_path)
+        if not listings and not mounts:
+            return responses[0]
+        return list(dict.fromkeys(itertools.chain(*listings, mounts)))
 
     def traverse_directory(self, dfs_path):
         request_data = {
             'action': 'traverse_directory',
             'dfs_path': dfs_path
         }
-        return self.send_request(request_data)
+        # Merged like listings; the trees of other mount points below are not included
+        responses = [self.cached_request('tree', dfs_path, request_data, name_node)
+                     for name_node in self.mount_table.spread(dfs_path)]
+        trees = [response for response in responses if not isinstance(response, str)]
+        mounts = self.mount_table.mounts_below(dfs_path)
+        if not trees and not mounts:
+            return responses[0]
+        structure = {name: {} for name in mounts}
+        for tree in trees:
+            structure.update(tree)
+        return structure
 
     def send_heartbeat(self, data_node_id):
         request_data = {
@@ -96,22 +811,6 @@ class DFSClient:
 
 # Initialize the DFSClient
 dfs_client = DFSClient(name_node_address='localhost', name_node_port=5007)  # Replace 12345 with your actual NameNode port
-# Heartbeat function for the DataNode
-def heartbeat(data_node_id, interval):
-    while True:
-        print(f"Heartbeat from DataNode {data_node_id}")
-        time.sleep(interval)
-
-# Example of starting the thread
-data_node_id = 1
-interval = 5
-heartbeat_thread = threading.Thread(target=heartbeat, args=(data_node_id, interval))
-heartbeat_thread.start()
-# Example of starting the thread
-data_node_id = 0
-interval = 5
-heartbeat_thread = threading.Thread(target=heartbeat, args=(data_node_id, interval))
-heartbeat_thread.start()
 
 @app.route('/')
 def index():
@@ -144,7 +843,9 @@ def move_file():
 @app.route('/upload_file', methods=['POST'])
 def upload_file():
     data = request.form
-    response = dfs_client.upload_file(data['local_path'], data['dfs_path'])
+    block_size = int(data.get('block_size') or DEFAULT_BLOCK_SIZE)
+    response = dfs_client.upload_file(data['local_path'], data['dfs_path'], block_size,
+                                      data.get('compression') or None, data.get('dedup') or None)
     return render_template('index.html', message=response)
 
 @app.route('/download_file', methods=['POST'])
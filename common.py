@@ -5,3 +5,92 @@ DATA_NODE_PORT_0 = 6000
 DATA_NODE_PORT_1 = 7003  # Replace with the actual port number for DataNodes
 NAME_NODE_PORT = 5007  # Replace with the actual port number for NameNode
 NAME_NODE_ADDRESS ='localhost'
+
+# NameNode request server
+NAME_NODE_WORKERS = 16  # Worker threads serving client and DataNode requests
+NAME_NODE_MAX_IN_FLIGHT = 64  # Requests dispatched at once before the accept loop stops reading new ones
+
+# Wire protocol limits; larger frames are rejected before anything is allocated for them
+MAX_MESSAGE_METADATA = 256 * 1024 * 1024  # Bytes of pickled metadata, e.g. a full block report
+MAX_MESSAGE_PAYLOAD = 1024 * 1024 * 1024  # Bytes of raw payload, at most one block
+
+# Persistent connections each DFSClient keeps open to the NameNode
+CLIENT_CONNECTION_POOL_SIZE = 4
+
+# Block layout
+DEFAULT_BLOCK_SIZE = 64 * 1024 * 1024  # Bytes per block, can be overridden per file
+PACKET_SIZE = 64 * 1024  # Blocks are streamed and checksummed in packets of this size
+REPLICATION_FACTOR = 2  # Copies of each block written by the client
+
+# Blocks a client fetches at the same time when downloading a file
+DOWNLOAD_PARALLELISM = 8
+
+# NameNode persistence
+NAME_NODE_METADATA_DIRECTORY = "namenode_metadata"  # Edit log segments and fsimage checkpoints
+CHECKPOINT_INTERVAL = 300  # Seconds between checkpoints
+CHECKPOINT_EDITS = 100000  # Also checkpoint once this many edits have been logged
+
+# DataNode heartbeats and block reports
+HEARTBEAT_INTERVAL = 3  # Seconds between heartbeats
+HEARTBEAT_TIMEOUT = 10  # A DataNode is marked dead after this long without a heartbeat
+BLOCK_REPORT_INTERVAL = 300  # Seconds between full block reports, heartbeats carry incremental ones
+
+# Re-replication of blocks that lost replicas
+MAX_REPLICATION_STREAMS = 2  # Copies a DataNode takes part in at once, as source or target
+REPLICATION_BANDWIDTH = 50 * 1024 * 1024  # Bytes per second a DataNode spends sending copies
+REPLICATION_TIMEOUT = 120  # Seconds before an unfinished copy is rescheduled
+REPLICATION_CHECK_INTERVAL = 1  # Seconds between scheduling rounds
+REPLICATION_SCAN_INTERVAL = 300  # Seconds between full scans for under-replicated blocks
+
+# Leases of clients writing files
+BLOCK_LEASE_TIMEOUT = 3600  # Seconds without a new block after which an upload's unfinished blocks are abandoned
+LEASE_CHECK_INTERVAL = 60  # Seconds between checks for expired leases
+
+# Recursive deletes
+DELETION_BATCH = 1000  # Files and directories of a deleted subtree removed per NameNode lock hold
+
+# Block placement
+DEFAULT_RACK = "/default-rack"  # Failure domain of DataNodes that do not name one
+
+# DataNode I/O
+DATA_NODE_MAX_TRANSFERS = 64  # Connections a DataNode serves at once; more are turned away
+DISK_IO_THREADS = 2  # Threads doing disk I/O per data directory
+DISK_IO_QUEUE_DEPTH = 8  # Packets of one block write queued for disk before the sender waits
+DATA_NODE_SOCKET_TIMEOUT = 60  # Seconds a DataNode waits on a silent peer before dropping the connection
+
+# Client metadata cache
+CLIENT_CACHE_ENTRIES = 10000  # Cached listings, trees and block locations per DFSClient
+CLIENT_CACHE_TTL = 60  # Seconds an entry is kept at most
+CLIENT_CACHE_LEASE = 2  # Seconds a client trusts its cache before asking the NameNode what changed
+NAME_NODE_CHANGE_LOG_SIZE = 10000  # Recent namespace changes the NameNode remembers for clients
+
+# DataNode block cache
+DATA_NODE_CACHE_SIZE = 256 * 1024 * 1024  # Bytes of hot block data a DataNode keeps in memory
+DATA_NODE_CACHE_GHOST_ENTRIES = 4096  # Ids of blocks read once that are remembered for admission
+
+# Erasure coding
+EC_CONVERSION_INTERVAL = 60  # Seconds between scans for replicated files to re-encode
+EC_CONVERSION_BATCH = 100  # Files converted per scan at most
+
+# Client block compression
+COMPRESSION_WORKERS = 4  # Processes compressing and decompressing blocks per DFSClient
+
+# Small files packed into shared container blocks
+PACK_CONTAINER_SIZE = 64 * 1024 * 1024  # Bytes of small files collected into one container block
+PACK_MAX_FILE_SIZE = 1024 * 1024  # Larger files are uploaded on their own even in packing mode
+PACK_COMPACTION_THRESHOLD = 0.5  # Containers with less than this fraction of live bytes are repacked
+PACK_COMPACTION_INTERVAL = 300  # Seconds between compaction passes
+PACK_COMPACTION_BATCH = 16  # Containers repacked per pass at most
+
+# Random-access reads through DFSClient.open
+READ_SEGMENT_SIZE = 4 * 1024 * 1024  # Bytes fetched per request from a replicated block
+READAHEAD_SEGMENTS = 4  # Segments fetched ahead of a sequential reader
+
+# Federation: several NameNodes, each holding part of the namespace (see federation.py)
+BLOCK_POOL_BITS = 48  # Block ids of NameNode n run from n << BLOCK_POOL_BITS
+MOUNT_TABLE = None  # e.g. "/=localhost:5007;/users=localhost:5017,localhost:5027"; None for a single NameNode
+
+# Metrics, served in the Prometheus text format at http://<host>:<port>/metrics
+NAME_NODE_METRICS_PORT = 5008
+DATA_NODE_METRICS_PORT_0 = 6010
+DATA_NODE_METRICS_PORT_1 = 7013
@@ -0,0 +1,68 @@
+# compactor.py
+
+# Background compaction of container blocks holding packed small files.
+#
+# Small files uploaded with DFSClient.upload_packed share container blocks. Deleting or
+# overwriting one only stops the NameNode from counting its bytes as live; the
+# container keeps its size until every file in it is gone. This compactor asks the
+# NameNode for containers whose live bytes have fallen below PACK_COMPACTION_THRESHOLD
+# of their size and copies the files still in them into new, full containers. The
+# NameNode relinks a file only if it still points at the old container, and the old
+# container is deleted with its last reference.
+import logging
+import threading
+import time
+
+from client import DFSClient
+from common import (NAME_NODE_ADDRESS, NAME_NODE_PORT, PACK_COMPACTION_BATCH, PACK_COMPACTION_INTERVAL,
+                    PACK_COMPACTION_THRESHOLD)
+
+
+class ContainerCompactor:
+    def __init__(self, client, interval=PACK_COMPACTION_INTERVAL, threshold=PACK_COMPACTION_THRESHOLD,
+                 batch=PACK_COMPACTION_BATCH):
+        self.client = client
+        self.interval = interval
+        self.threshold = threshold
+        self.batch = batch
+
+    def compact_pending(self):
+        # One pass over the sparse containers of every NameNode, returns how many files
+        # were repacked. Files of all of them are packed together, so several sparse
+        # containers become one full one.
+        containers = []
+        for name_node, response in self.client.broadcast({
+            'action': 'list_compactable_containers',
+            'threshold': self.threshold,
+            'limit': self.batch,
+        }).items():
+            if isinstance(response, str):
+                logging.error(f"Could not list containers to compact on NameNode {name_node}: {response}")
+                continue
+            containers.extend(response)
+
+        dfs_paths = [dfs_path for _, paths in containers for dfs_path in paths]
+        if not dfs_paths:
+            return 0
+        response = self.client.repack_files(dfs_paths)
+        if response.startswith('Error'):
+            logging.warning(f"Could not compact containers {[block_id for block_id, _ in containers]}: {response}")
+            return 0
+        logging.info(f"Compacted containers {[block_id for block_id, _ in containers]}: {response}")
+        return len(dfs_paths)
+
+    def run(self):
+        while True:
+            try:
+                self.compact_pending()
+            except Exception as e:
+                logging.error(f"Error compacting containers: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    ContainerCompactor(DFSClient(NAME_NODE_ADDRESS, NAME_NODE_PORT)).run()
@@ -0,0 +1,47 @@
+# compression.py
+
+# Block compression codecs for the DFS client.
+#
+# A file can be written with a codec named in its attributes ('compression'). Each
+# block is then compressed on its own before it leaves the client, so DataNodes store
+# and send the smaller bytes without knowing about compression, and a block can still
+# be read and decompressed without the rest of the file. Every block except the last
+# holds exactly 'block_size' bytes of file data, so offsets in the file never depend
+# on compressed sizes.
+#
+# Codecs are looked up by name when a file is read, so a reader needs the codec the
+# file was written with. Codec functions run in a process pool, so they must be
+# picklable: module-level functions or functools.partial objects over them.
+import lzma
+import zlib
+from functools import partial
+
+
+class Codec:
+    __slots__ = ('name', 'compress', 'decompress')
+
+    def __init__(self, name, compress, decompress):
+        self.name = name
+        self.compress = compress  # bytes -> bytes
+        self.decompress = decompress  # bytes -> bytes
+
+
+CODECS = {}
+
+
+def register_codec(name, compress, decompress):
+    CODECS[name] = Codec(name, compress, decompress)
+
+
+def get_codec(name):
+    # Returns the Codec for 'name', None for uncompressed files
+    if name is None:
+        return None
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(f"Unknown compression codec '{name}'")
+    return codec
+
+
+register_codec('zlib', partial(zlib.compress, level=6), zlib.decompress)
+register_codec('lzma', partial(lzma.compress, preset=6), lzma.decompress)
@@ -0,0 +1,596 @@
+import argparse
+import socket
+import logging
+import threading
+import time
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from common import (NAME_NODE_ADDRESS, NAME_NODE_PORT, HEARTBEAT_INTERVAL, BLOCK_REPORT_INTERVAL, REPLICATION_BANDWIDTH,
+                    DEFAULT_RACK, DATA_NODE_MAX_TRANSFERS, DISK_IO_QUEUE_DEPTH, DATA_NODE_CACHE_SIZE,
+                    DATA_NODE_CACHE_GHOST_ENTRIES, DATA_NODE_SOCKET_TIMEOUT, MOUNT_TABLE)
+from protocol import (MSG_REQUEST, ChecksumError, ConnectionPool, ProtocolError, checksum, chunk_range, recv_message,
+                      recv_packet, send_file_response, send_packet, send_request, send_response, verify_chunks)
+from block_store import BlockStore
+from block_cache import BlockCache
+from metrics import MetricsRegistry, start_metrics_server
+from federation import MountTable
+
+def setup_logging():
+    # Set up logging to a file and console
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s]: %(message)s",
+        handlers=[
+            logging.FileHandler("datanode_log.txt"),  # Log to a file
+            logging.StreamHandler()  # Log to the console
+        ]
+    )
+
+setup_logging()
+
+class Throttler:
+    # Token bucket shared by every re-replication stream of a DataNode, so copies
+    # never take more than 'rate' bytes per second away from client traffic
+    def __init__(self, rate):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next_free = time.monotonic()
+
+    def throttle(self, size):
+        # Reserve 'size' bytes of the budget and sleep until they are due
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_free)
+            self.next_free = start + size / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+class NameNodeService:
+    # Registration, heartbeats and block reports to one NameNode
+    def __init__(self, data_node, address, port):
+        self.data_node = data_node
+        self.name = f"{address}:{port}"
+        # Persistent connection, used only for registration and heartbeats
+        self.connection = ConnectionPool(address, port)
+
+        # Block changes not yet reported to this NameNode. Heartbeats carry these
+        # incremental reports; a full report is sent after registering and then every
+        # BLOCK_REPORT_INTERVAL seconds.
+        self.report_lock = threading.Lock()
+        self.blocks_added = []
+        self.blocks_removed = []
+        self.last_full_report = None
+
+    def report(self, added=None, removed=None):
+        with self.report_lock:
+            if added is not None:
+                self.blocks_added.append(added)
+            if removed is not None:
+                self.blocks_removed.append(removed)
+
+    def register(self):
+        data_node = self.data_node
+        registration_data = {
+            'action': 'register',
+            'data_node_id': data_node.data_node_id,
+            'data_node_address': 'localhost',
+            'data_node_port': data_node.port,
+            'rack': data_node.rack,
+            **data_node.storage_report(),
+        }
+
+        response, _ = self.connection.request(registration_data)
+        logging.info(f"{self.name}: {response}")
+        self.last_full_report = None
+
+    def send_heartbeat(self):
+        data_node = self.data_node
+        with self.report_lock:
+            blocks_added, self.blocks_added = self.blocks_added, []
+            blocks_removed, self.blocks_removed = self.blocks_removed, []
+
+        heartbeat_data = {
+            'action': 'heartbeat',
+            'data_node_id': data_node.data_node_id,
+            'blocks_added': blocks_added,
+            'blocks_removed': blocks_removed,
+            **data_node.storage_report(),
+        }
+        full_report = self.last_full_report is None or time.time() - self.last_full_report >= BLOCK_REPORT_INTERVAL
+        if full_report:
+            heartbeat_data['full_report'] = [block_id for store in data_node.stores for block_id in store.list_blocks()]
+
+        try:
+            response, _ = self.connection.request(heartbeat_data, timeout=HEARTBEAT_INTERVAL * 2)
+        except Exception:
+            # Report these changes again with the next heartbeat
+            with self.report_lock:
+                self.blocks_added[:0] = blocks_added
+                self.blocks_removed[:0] = blocks_removed
+            raise
+
+        if full_report:
+            self.last_full_report = time.time()
+        if not response['registered']:
+            logging.warning(f"NameNode {self.name} does not know this DataNode, registering again.")
+            self.register()
+            return
+        for command in response['commands']:
+            data_node.run_command(command)
+
+    def run(self):
+        while True:
+            try:
+                self.send_heartbeat()
+                time.sleep(HEARTBEAT_INTERVAL)
+            except Exception as e:
+                logging.error(f"Error in run loop ({self.name}): {e}")
+                time.sleep(HEARTBEAT_INTERVAL)
+
+class DataNode:
+    def __init__(self, data_node_id, data_directory, port, rack=DEFAULT_RACK, max_transfers=DATA_NODE_MAX_TRANSFERS,
+                 cache_size=DATA_NODE_CACHE_SIZE, metrics_port=None, name_node_address=NAME_NODE_ADDRESS,
+                 name_node_port=NAME_NODE_PORT, name_nodes=None):
+        # 'data_directory' is one path or a list of paths, ideally one per disk
+        self.data_node_id = data_node_id
+        self.data_directories = [data_directory] if isinstance(data_directory, str) else list(data_directory)
+        self.port = port
+        self.metrics_port = metrics_port  # Serves Prometheus metrics over HTTP if set
+        self.rack = rack  # Failure domain; the NameNode keeps replicas of a block in different ones
+
+        # One block store per data directory, each with its own disk I/O queue
+        self.stores = [BlockStore(directory) for directory in self.data_directories]
+
+        # Blocks read repeatedly, or pinned by the NameNode, are served from memory
+        self.cache = BlockCache(cache_size, DATA_NODE_CACHE_GHOST_ENTRIES)
+
+        # Set up the server socket. Connections are served by a bounded pool; once every
+        # slot is taken new ones are turned away rather than queued, since a queued
+        # pipeline write could wait on a node that is itself waiting on this one.
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.bind(('localhost', self.port))
+        self.server_socket.listen()
+        self.port = self.server_socket.getsockname()[1]  # Port 0 picks a free one
+        self.transfer_pool = ThreadPoolExecutor(max_workers=max_transfers)
+        self.transfer_slots = threading.BoundedSemaphore(max_transfers)
+        self.socket_timeout = DATA_NODE_SOCKET_TIMEOUT  # A silent peer loses its slot after this long
+
+        # Registration, heartbeats and block reports, to every NameNode of a federated
+        # cluster (given as 'name_nodes' or by MOUNT_TABLE) or to the single NameNode
+        if name_nodes is None:
+            name_nodes = (MountTable.parse(MOUNT_TABLE).name_nodes() if MOUNT_TABLE
+                          else [(name_node_address, name_node_port)])
+        self.name_nodes = [NameNodeService(self, address, port) for address, port in name_nodes]
+
+        # Caps the bandwidth of re-replication copies this node sends
+        self.replication_throttler = Throttler(REPLICATION_BANDWIDTH)
+
+        # Block transfers in progress, reported so the NameNode can steer writes to idle nodes
+        self.transfer_lock = threading.Lock()
+        self.active_transfers = 0
+
+        # Request counts, latencies and block traffic; the byte totals also go to the
+        # NameNode with every heartbeat, which turns them into transfer rates
+        self.metrics = MetricsRegistry('datanode')
+        self.register_metrics()
+
+        # Register with the NameNodes
+        self.register_with_name_nodes()
+
+    def register_metrics(self):
+        metrics = self.metrics
+        self.request_count = metrics.counter('requests_total', "Requests served, by action", ('action',))
+        self.request_latency = metrics.histogram('request_seconds', "Time to serve a request, by action", ('action',))
+        self.bytes_received = metrics.counter('received_bytes_total', "Block bytes received from clients and peers")
+        self.bytes_sent = metrics.counter('sent_bytes_total', "Block bytes sent to readers and replication targets")
+        self.rejected_connections = metrics.counter('rejected_connections_total',
+                                                    "Connections turned away with every transfer slot taken")
+
+        metrics.gauge('active_transfers', "Transfers in progress", function=lambda: self.active_transfers)
+        metrics.gauge('blocks', "Blocks stored", function=lambda: sum(len(store.blocks) for store in self.stores))
+        metrics.gauge('disk_free_bytes', "Free bytes, by data directory", ('directory',),
+                      function=lambda: {(store.directory,): store.free_space() for store in self.stores})
+        metrics.gauge('disk_active_writes', "Block writes in progress, by data directory", ('directory',),
+                      function=lambda: {(store.directory,): store.active_writes for store in self.stores})
+        for key in ('used', 'blocks', 'pinned', 'hits', 'misses', 'evictions'):
+            metrics.gauge(f"cache_{key}", f"Block cache {key}", function=lambda key=key: self.cache.stats()[key])
+
+    def register_with_name_nodes(self):
+        for name_node in self.name_nodes:
+            try:
+                name_node.register()
+            except Exception as e:
+                # Its heartbeats will register again once it is reachable
+                logging.error(f"Could not register with NameNode {name_node.name}: {e}")
+
+    def report_block_added(self, block_id):
+        for name_node in self.name_nodes:
+            name_node.report(added=block_id)
+
+    def report_block_removed(self, block_id):
+        for name_node in self.name_nodes:
+            name_node.report(removed=block_id)
+
+    def storage_report(self):
+        # Directories on the same device are counted once
+        capacity = remaining = 0
+        devices = set()
+        for directory in self.data_directories:
+            device = os.stat(directory).st_dev
+            if device not in devices:
+                devices.add(device)
+                usage = shutil.disk_usage(directory)
+                capacity += usage.total
+                remaining += usage.free
+        return {
+            'capacity': capacity,
+            'remaining': remaining,
+            'active_transfers': self.active_transfers,
+            'cache': self.cache.stats(),
+            'bytes_sent': self.bytes_sent.labels().snapshot(),
+            'bytes_received': self.bytes_received.labels().snapshot(),
+        }
+
+    def store_for(self, block_id):
+        # The store holding 'block_id', or None
+        for store in self.stores:
+            if store.contains(block_id):
+                return store
+        return None
+
+    def choose_store(self):
+        # New blocks go to the store with the fewest writes in progress, then the most free space
+        with self.transfer_lock:
+            store = min(self.stores, key=lambda store: (store.active_writes, -store.free_space()))
+            store.active_writes += 1
+        return store
+
+    def track_transfer(self, delta):
+        with self.transfer_lock:
+            self.active_transfers += delta
+
+    def run_command(self, command):
+        # Commands the NameNode sends back in heartbeat responses
+        action = command['action']
+        if action == 'delete_blocks':
+            for block_id in command['block_ids']:
+                self.delete_block(block_id)
+        elif action == 'cache_blocks':
+            # Loading the blocks waits on their disks' I/O queues, not on this thread
+            for block_id in command['block_ids']:
+                store = self.store_for(block_id)
+                if store is not None:
+                    store.submit(self.pin_block, store, block_id)
+        elif action == 'uncache_blocks':
+            for block_id in command['block_ids']:
+                self.cache.unpin(block_id)
+        elif action == 'replicate_block':
+            # Copies can take a while, so they must not hold up the heartbeat loop
+            threading.Thread(target=self.replicate_block, args=(command['block_id'], command['targets']),
+                             daemon=True).start()
+        else:
+            logging.warning(f"Unknown command from NameNode: {action}")
+
+    def pin_block(self, store, block_id):
+        try:
+            block_data, chunk_size, checksums = store.read_block(block_id)
+        except FileNotFoundError:
+            return
+        if self.cache.put(block_id, bytes(block_data), chunk_size, checksums, pinned=True):
+            logging.info(f"Block {block_id} pinned in memory.")
+        else:
+            logging.warning(f"Block {block_id} does not fit in the block cache next to the pinned blocks.")
+
+    def delete_block(self, block_id):
+        # Returns False if the block is not stored here
+        self.cache.invalidate(block_id)
+        store = self.store_for(block_id)
+        if store is None or not store.submit(store.delete, block_id).result():
+            return False
+        self.report_block_removed(block_id)
+        logging.info(f"Block {block_id} deleted.")
+        return True
+
+    def open_downstream(self, block_id, packet_size, pipeline):
+        # Connect to the next DataNode in the replication pipeline, skipping unreachable
+        # and busy ones. A DataNode acks the write once its own downstream is set up.
+        for index, data_node in enumerate(pipeline):
+            sock = None
+            try:
+                sock = socket.create_connection((data_node['address'], data_node['port']),
+                                                timeout=self.socket_timeout)
+                send_request(sock, {
+                    'action': 'write_block',
+                    'block_id': block_id,
+                    'packet_size': packet_size,
+                    'pipeline': pipeline[index + 1:],
+                })
+                message = recv_message(sock)
+                response = message[2] if message else 'Error: no response'
+            except Exception as e:
+                # Unreachable, or answered with something that is not a valid ack
+                response = f"Error: {e}"
+            if not isinstance(response, str):
+                return sock
+            if sock is not None:
+                sock.close()
+            logging.warning(f"Could not open block {block_id} on DataNode {data_node['data_node_id']}: {response}")
+        return None
+
+    def receive_block(self, client_socket, block_id, packet_size, pipeline=(), request_id=0):
+        # Write the packets of one block as they arrive, checking each checksum on the way.
+        # Each packet is forwarded to the next replica in 'pipeline' before it is written
+        # here, so every replica receives the block at the same time.
+        # The block only becomes visible under its real name once every packet has verified.
+        # Packets are written by the chosen store's I/O threads, so receiving the next
+        # packet overlaps with writing the previous ones.
+        store = self.choose_store()
+        temp_path = store.temp_path(block_id)
+        checksums = []
+        size = 0
+        seq = 0
+        pending_writes = deque()
+        downstream = None
+        try:
+            downstream = self.open_downstream(block_id, packet_size, pipeline) if pipeline else None
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            # Tell the writer to start streaming; until then it may still pick another node
+            send_response(client_socket, {'ready': True}, request_id=request_id)
+            try:
+                while True:
+                    packet, last = recv_packet(client_socket, seq)
+                    if downstream is not None:
+                        try:
+                            send_packet(downstream, seq, packet, last)
+                        except OSError as e:
+                            # Keep the local replica, the rest of the pipeline is lost
+                            logging.warning(f"Lost downstream replica of block {block_id}: {e}")
+                            downstream.close()
+                            downstream = None
+                    if packet:
+                        # Every packet but the last must be exactly packet_size so the
+                        # stored checksums line up with fixed-size chunks on reads
+                        if len(packet) > packet_size or size % packet_size:
+                            raise ProtocolError(f"Unexpected packet size in block {block_id}")
+                        pending_writes.append(store.submit(os.pwrite, fd, packet, size))
+                        if len(pending_writes) > DISK_IO_QUEUE_DEPTH:
+                            pending_writes.popleft().result()
+                        checksums.append(checksum(packet))
+                        size += len(packet)
+                    seq += 1
+                    if last:
+                        break
+            finally:
+                # Let queued writes finish before the file is closed (or discarded)
+                while pending_writes:
+                    pending_writes.popleft().result()
+                os.close(fd)
+
+            store.submit(store.commit, block_id, temp_path, packet_size, checksums).result()
+            self.cache.invalidate(block_id)
+            for other in self.stores:
+                # A rewritten block may have had an older copy on another disk
+                if other is not store:
+                    other.delete(block_id)
+            logging.info(f"Block {block_id} stored locally ({size} bytes, {len(checksums)} packets).")
+            self.bytes_received.inc(size)
+            self.report_block_added(block_id)
+
+            # Acks travel back up the chain: report ourselves plus whatever downstream stored
+            stored_on = [self.data_node_id]
+            if downstream is not None:
+                try:
+                    message = recv_message(downstream)
+                    if message and isinstance(message[2], dict):
+                        stored_on.extend(message[2]['stored_on'])
+                    elif message:
+                        logging.warning(f"Downstream replica of block {block_id} failed: {message[2]}")
+                except OSError as e:
+                    logging.warning(f"Lost downstream ack for block {block_id}: {e}")
+        except Exception:
+            store.discard(temp_path)
+            raise
+        finally:
+            with self.transfer_lock:
+                store.active_writes -= 1
+            if downstream is not None:
+                downstream.close()
+
+        return {'block_id': block_id, 'size': size, 'stored_on': stored_on}
+
+    def replicate_block(self, block_id, targets):
+        # Copy a local replica to 'targets' through the same pipeline a client write
+        # uses. The NameNode learns about the new replicas from the targets' block reports.
+        store = self.store_for(block_id)
+        try:
+            if store is None:
+                raise FileNotFoundError(block_id)
+            block_data, chunk_size, checksums = store.submit(store.read_block, block_id).result()
+            verify_chunks(block_data, chunk_size, checksums)
+        except FileNotFoundError:
+            logging.warning(f"Cannot replicate block {block_id}: not stored here")
+            return
+        except ChecksumError as e:
+            # Never spread a corrupt replica; dropping it lets the NameNode pick another source
+            logging.error(f"Local replica of block {block_id} is corrupt, deleting it: {e}")
+            self.delete_block(block_id)
+            return
+
+        downstream = self.open_downstream(block_id, chunk_size, targets)
+        if downstream is None:
+            return
+        self.track_transfer(1)
+        try:
+            view = memoryview(block_data)
+            for seq, offset in enumerate(range(0, len(block_data), chunk_size)):
+                packet = view[offset:offset + chunk_size]
+                self.replication_throttler.throttle(len(packet))
+                send_packet(downstream, seq, packet)
+                self.bytes_sent.inc(len(packet))
+            send_packet(downstream, len(checksums), b'', last=True)
+
+            message = recv_message(downstream)
+            if message and isinstance(message[2], dict):
+                logging.info(f"Block {block_id} replicated to DataNodes {message[2]['stored_on']}.")
+            else:
+                logging.warning(f"Replication of block {block_id} failed: {message[2] if message else 'no ack'}")
+        except OSError as e:
+            logging.warning(f"Replication of block {block_id} failed: {e}")
+        finally:
+            self.track_transfer(-1)
+            downstream.close()
+
+    def handle_requests(self):
+        while True:
+            client_socket, _ = self.server_socket.accept()
+            if not self.transfer_slots.acquire(blocking=False):
+                # Writers wait for an ack before streaming a block and readers for the
+                # block itself, so both move on to the next replica
+                logging.warning("Too many transfers in progress, turning a connection away.")
+                self.rejected_connections.inc()
+                try:
+                    send_response(client_socket, "Error: DataNode is busy")
+                except OSError:
+                    pass
+                client_socket.close()
+                continue
+            self.transfer_pool.submit(self.handle_connection, client_socket)
+
+    def handle_connection(self, client_socket):
+        tracked = False
+        action = None
+        started = time.perf_counter()
+        # An idle or half-open peer must not hold a transfer slot for good
+        client_socket.settimeout(self.socket_timeout)
+        try:
+            message = recv_message(client_socket)
+            if message:
+                self.track_transfer(1)
+                tracked = True
+                msg_type, request_id, request_data, payload = message
+                action = request_data.get('action')
+                if msg_type != MSG_REQUEST:
+                    action = 'invalid'
+                    logging.warning('Invalid message received.')
+                    send_response(client_socket, 'Invalid action', request_id=request_id)
+                elif action == 'write_block':
+                    # The block follows this request as a stream of checksummed packets
+                    block_id = request_data['block_id']
+                    try:
+                        response = self.receive_block(client_socket, block_id, request_data['packet_size'],
+                                                      request_data.get('pipeline', ()), request_id)
+                    except ProtocolError as e:
+                        logging.error(f"Rejected block {block_id}: {e}")
+                        response = f"Error: Block {block_id} rejected: {e}"
+                    send_response(client_socket, response, request_id=request_id)
+                elif action == 'read_block':
+                    self.send_block(client_socket, request_data['block_id'], request_id,
+                                    request_data.get('offset', 0), request_data.get('length'),
+                                    request_data.get('block_cache', True))
+                elif action == 'cache_stats':
+                    send_response(client_socket, self.cache.stats(), request_id=request_id)
+                elif action == 'metrics':
+                    send_response(client_socket, self.metrics.render(), request_id=request_id)
+                elif action == 'delete_block':
+                    deleted = [block_id for block_id in request_data['block_ids'] if self.delete_block(block_id)]
+                    send_response(client_socket, {'deleted': deleted}, request_id=request_id)
+                else:
+                    logging.warning('Invalid action received.')
+                    action = 'invalid'
+                    send_response(client_socket, 'Invalid action', request_id=request_id)
+        except TimeoutError:
+            logging.warning(f"Peer silent for {self.socket_timeout}s, dropping its connection.")
+        except Exception as e:
+            logging.error(f"Error processing request: {e}")
+        finally:
+            if tracked:
+                self.track_transfer(-1)
+                self.request_count.labels(action).inc()
+                self.request_latency.labels(action).observe(time.perf_counter() - started)
+            client_socket.close()
+            self.transfer_slots.release()
+
+    def send_block(self, client_socket, block_id, request_id, offset=0, length=None, block_cache=True):
+        # Cached blocks are sent from memory. A block read for the second time recently
+        # is loaded into the cache; anything else waits its turn on the disk's I/O
+        # queue to be opened and goes from the block file to the socket without a copy.
+        # With 'length' only the checksum chunks covering that byte range are sent; the
+        # response says at which offset they start. Reads without 'block_cache' go to
+        # disk and leave the cache as it was.
+        block_file = None
+        cached, admit = self.cache.get(block_id) if block_cache else (None, False)
+        if cached is not None:
+            block_data, chunk_size, checksums = cached.data, cached.chunk_size, cached.checksums
+        else:
+            store = self.store_for(block_id)
+            try:
+                if store is None:
+                    raise FileNotFoundError(block_id)
+                if admit:
+                    block_data, chunk_size, checksums = store.submit(store.read_block, block_id).result()
+                    self.cache.put(block_id, block_data, chunk_size, checksums)
+                    if not store.contains(block_id):
+                        # Deleted while we were loading it
+                        self.cache.invalidate(block_id)
+                else:
+                    block_file, size, chunk_size, checksums = store.submit(store.open_block, block_id).result()
+            except FileNotFoundError:
+                send_response(client_socket, f"Error: Block {block_id} not found", request_id=request_id)
+                return
+        if block_file is None:
+            size = len(block_data)
+
+        start, end = chunk_range(size, chunk_size, offset, length)
+        response = {
+            'block_id': block_id,
+            'offset': start,
+            'chunk_size': chunk_size,
+            'checksums': checksums[start // chunk_size:-(-end // chunk_size)],
+        }
+        if block_file is None:
+            send_response(client_socket, response, memoryview(block_data)[start:end], request_id=request_id)
+        else:
+            with block_file:
+                send_file_response(client_socket, response, block_file, end - start, request_id=request_id,
+                                   offset=start)
+        self.bytes_sent.inc(end - start)
+
+    def run(self):
+        # Serve block transfers on their own thread so heartbeats keep going
+        threading.Thread(target=self.handle_requests, daemon=True).start()
+        if self.metrics_port:
+            start_metrics_server(self.metrics, self.metrics_port)
+
+        # Each NameNode gets its own heartbeat thread, so one that is slow or down does
+        # not hold up reports to the others
+        for name_node in self.name_nodes[1:]:
+            threading.Thread(target=name_node.run, daemon=True).start()
+        try:
+            self.name_nodes[0].run()
+        except KeyboardInterrupt:
+            print("Shutting down the DataNode.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a DataNode")
+    parser.add_argument('--id', type=int, required=True, help="DataNode id, unique in the cluster")
+    parser.add_argument('--data-directory', action='append', required=True,
+                        help="Block storage directory; repeat for one per disk")
+    parser.add_argument('--port', type=int, default=0, help="0 picks a free port")
+    parser.add_argument('--rack', default=DEFAULT_RACK)
+    parser.add_argument('--cache-size', type=int, default=DATA_NODE_CACHE_SIZE)
+    parser.add_argument('--metrics-port', type=int, default=None)
+    parser.add_argument('--name-node-address', default=NAME_NODE_ADDRESS)
+    parser.add_argument('--name-node-port', type=int, default=NAME_NODE_PORT)
+    parser.add_argument('--name-node', action='append', metavar='ADDRESS:PORT',
+                        help="Every NameNode of a federated cluster; repeat for each")
+    args = parser.parse_args()
+    name_nodes = [(address, int(port)) for address, port in
+                  (name_node.rsplit(':', 1) for name_node in args.name_node)] if args.name_node else None
+
+    DataNode(args.id, args.data_directory, args.port, rack=args.rack, cache_size=args.cache_size,
+             metrics_port=args.metrics_port, name_node_address=args.name_node_address,
+             name_node_port=args.name_node_port, name_nodes=name_nodes).run()
@@ -0,0 +1,76 @@
+# dedup.py
+
+# Chunking and content hashing for deduplicated uploads.
+#
+# A file written with deduplication is cut into blocks that are named by the SHA-256 of
+# their content. Before sending a block the client asks the NameNode whether a block
+# with that hash is already stored; if so the file just refers to it and no data is
+# transferred. The NameNode counts references and deletes a shared block only when the
+# last file using it is gone.
+#
+# Fixed-size chunking finds repeated blocks only at the same offsets, e.g. a file
+# uploaded again unchanged. Content-defined chunking puts block boundaries where the
+# content says so, wherever it sits in the file, so inserting or removing bytes only
+# changes the blocks around the edit and the rest of a new snapshot still matches the
+# old one. A boundary is placed where a rolling hash over the last CDC_WINDOW bytes has
+# its top bits zero; the number of bits is chosen so that on random data this happens
+# once every block_size / 4 to block_size / 2 bytes. Blocks are kept between
+# block_size / 8 and block_size bytes.
+#
+# The rolling hash is a moving sum of per-byte random values, so a whole buffer is
+# hashed with a few NumPy passes instead of a Python loop per byte.
+import hashlib
+
+import numpy as np
+
+FIXED = 'fixed'
+CDC = 'cdc'
+
+CDC_WINDOW = 64
+CDC_MIX = np.uint64(0x9E3779B97F4A7C15)
+CDC_GEAR = np.random.default_rng(0x5EED).integers(0, 2 ** 64, size=256, dtype=np.uint64)
+
+
+def block_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def find_boundary(data, start, end, bits):
+    # The first offset p in [start, end] where a block may end, i.e. just after a window
+    # data[p - CDC_WINDOW:p] whose mixed hash has 'bits' zero top bits, or None
+    values = np.frombuffer(data, dtype=np.uint8)[start - CDC_WINDOW:end]
+    sums = np.concatenate(([np.uint64(0)], np.cumsum(CDC_GEAR[values], dtype=np.uint64)))
+    with np.errstate(over='ignore'):
+        window_hashes = (sums[CDC_WINDOW:] - sums[:-CDC_WINDOW]) * CDC_MIX
+    candidates = np.flatnonzero((window_hashes >> np.uint64(64 - bits)) == 0)
+    return int(candidates[0]) + start if len(candidates) else None
+
+
+def cdc_chunks(reader, block_size):
+    # Yield the content-defined blocks of everything 'reader' returns
+    min_size = max(CDC_WINDOW, block_size // 8)
+    bits = max(1, (block_size // 2).bit_length() - 1)
+    buffer = bytearray()
+    while True:
+        buffer += reader.read(block_size - len(buffer))
+        if len(buffer) <= min_size:
+            if buffer:
+                yield bytes(buffer)
+            return
+
+        # Scan in steps, most blocks end long before block_size
+        end = None
+        for start in range(min_size, len(buffer) + 1, min_size):
+            end = find_boundary(buffer, start, min(start + min_size, len(buffer)), bits)
+            if end is not None:
+                break
+        end = end or len(buffer)
+        yield bytes(buffer[:end])
+        del buffer[:end]
+
+
+def fixed_chunks(reader, block_size):
+    data = reader.read(block_size)
+    while data:
+        yield data
+        data = reader.read(block_size)
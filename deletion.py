@@ -0,0 +1,75 @@
+# deletion.py
+
+# Background removal of deleted subtrees for the NameNode.
+#
+# Deleting a path only unlinks it from the namespace tree and logs the edit, so the
+# request returns at once however many files are below it. The unlinked subtree is
+# queued here, and a worker thread takes it apart a batch of nodes at a time: each
+# file's blocks lose a reference and blocks nothing refers to any more are queued for
+# deletion on their DataNodes, which pick the commands up with their next heartbeat.
+# The NameNode lock is held for one batch at a time, so other requests are served in
+# between.
+#
+# Nothing about this work is logged. If the NameNode restarts first, replaying the
+# delete queues the subtree again, and a checkpoint never contains it because it is no
+# longer in the tree. Blocks left behind on DataNodes are reported as unknown in their
+# next block report and deleted then.
+import logging
+import threading
+
+from namespace import FileRecord
+
+
+class DeletionMonitor:
+    def __init__(self, name_node, batch_size):
+        # Shares the NameNode's lock, its namespace counts and its block map
+        self.name_node = name_node
+        self.batch_size = batch_size
+        self.stack = []  # Nodes still to take apart, directories are emptied one child at a time
+        self.wakeup = threading.Event()
+
+    def enqueue(self, node):
+        # Called with the NameNode lock held, with a subtree just unlinked from the namespace
+        self.stack.append(node)
+        self.wakeup.set()
+
+    def pending(self):
+        return len(self.stack)
+
+    def process_batch(self):
+        # Take apart up to 'batch_size' nodes, returns how many were handled
+        name_node = self.name_node
+        processed = 0
+        with name_node.lock:
+            while self.stack and processed < self.batch_size:
+                node = self.stack[-1]
+                if isinstance(node, FileRecord):
+                    self.stack.pop()
+                    name_node.release_file(node)
+                elif node.children:
+                    self.stack.append(node.children.popitem()[1])
+                    continue
+                else:
+                    self.stack.pop()
+                name_node.namespace.forget(node)
+                processed += 1
+        return processed
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            try:
+                removed = 0
+                while True:
+                    processed = self.process_batch()
+                    if not processed:
+                        break
+                    removed += processed
+                if removed:
+                    logging.info(f"Removed {removed} deleted files and directories")
+            except Exception as e:
+                logging.error(f"Error removing deleted files: {e}")
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
@@ -0,0 +1,108 @@
+# dfs_file.py
+
+# Seekable read-only file objects over DFS files, returned by DFSClient.open.
+#
+# The file is split into pieces that can be fetched on their own: byte ranges of
+# replicated blocks, whole compressed blocks or whole erasure-coded block groups. A read
+# fetches only the pieces covering the bytes asked for. While each read starts where
+# the previous one stopped, the next few pieces are fetched in the background, so a
+# sequential reader rarely waits on the network. After a seek elsewhere the readahead
+# pauses until reading is sequential again. The last few pieces fetched are kept, so
+# small reads within one piece cost a single request.
+import bisect
+import io
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DFSFile(io.RawIOBase):
+    def __init__(self, dfs_path, size, pieces, readahead):
+        super().__init__()
+        self.name = dfs_path
+        self.size = size
+        self.pieces = pieces  # [(offset, length, read)] in file order, see DFSClient.file_pieces
+        self.offsets = [piece[0] for piece in pieces]
+        self.readahead = readahead
+        self.position = 0
+        self.last_read_end = 0
+        self.fetched = OrderedDict()  # piece index -> Future of its data, least recently used first
+        self.executor = ThreadPoolExecutor(max_workers=max(1, readahead))
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self.position = position
+        return position
+
+    def fetch(self, index):
+        # Start fetching piece 'index' unless it is already fetched or on its way
+        future = self.fetched.get(index)
+        if future is None:
+            future = self.executor.submit(self.pieces[index][2])
+            self.fetched[index] = future
+        self.fetched.move_to_end(index)
+        while len(self.fetched) > self.readahead + 2:
+            self.fetched.popitem(last=False)[1].cancel()
+        return future
+
+    def readinto(self, buffer):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        if self.position >= self.size:
+            return 0
+
+        index = bisect.bisect_right(self.offsets, self.position) - 1
+        offset, length, _ = self.pieces[index]
+        future = self.fetch(index)
+        if self.position == self.last_read_end:
+            for ahead in range(index + 1, min(len(self.pieces), index + 1 + self.readahead)):
+                self.fetch(ahead)
+        try:
+            data = future.result()
+        except Exception:
+            # Fetch it again on the next attempt
+            self.fetched.pop(index, None)
+            raise
+
+        start = self.position - offset
+        count = min(len(buffer), length - start)
+        memoryview(buffer).cast('B')[:count] = memoryview(data).cast('B')[start:start + count]
+        self.position += count
+        self.last_read_end = self.position
+        return count
+
+    def readall(self):
+        data = bytearray(max(0, self.size - self.position))
+        view = memoryview(data)
+        filled = 0
+        while filled < len(data):
+            count = self.readinto(view[filled:])
+            if not count:
+                break
+            filled += count
+        return bytes(data[:filled])
+
+    def close(self):
+        if not self.closed:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.fetched.clear()
+        super().close()
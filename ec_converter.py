@@ -0,0 +1,61 @@
+# ec_converter.py
+
+# Background re-encoding of replicated files under erasure-coded directories.
+#
+# Setting an erasure coding policy on a directory only changes how new files there are
+# written. Files that were already there stay replicated until this converter rewrites
+# them: it asks the NameNode for replicated files below erasure-coded directories, reads
+# each one and writes it again through the normal client write path, which now encodes
+# it. The NameNode swaps the new block groups in only if the file was not replaced in
+# the meantime, and drops the old replicas. All data moves between the converter and
+# the DataNodes; the NameNode never reads or writes block data.
+import logging
+import threading
+import time
+
+from client import DFSClient
+from common import EC_CONVERSION_BATCH, EC_CONVERSION_INTERVAL, NAME_NODE_ADDRESS, NAME_NODE_PORT
+
+
+class ErasureCodingConverter:
+    def __init__(self, client, interval=EC_CONVERSION_INTERVAL, batch=EC_CONVERSION_BATCH):
+        self.client = client
+        self.interval = interval
+        self.batch = batch
+
+    def convert_pending(self):
+        # One pass over the files waiting for conversion, returns how many were converted.
+        # Every NameNode of a federated cluster lists the files in its part of the namespace.
+        files = []
+        for name_node, response in self.client.broadcast({'action': 'list_convertible_files',
+                                                          'limit': self.batch}).items():
+            if isinstance(response, str):
+                logging.error(f"Could not list files to convert on NameNode {name_node}: {response}")
+                continue
+            files.extend(response)
+
+        converted = 0
+        for dfs_path, policy in files:
+            response = self.client.convert_file(dfs_path)
+            if isinstance(response, str) and response.startswith('Error'):
+                logging.warning(f"Could not convert '{dfs_path}' to {policy}: {response}")
+                continue
+            logging.info(f"Converted '{dfs_path}' to {policy}")
+            converted += 1
+        return converted
+
+    def run(self):
+        while True:
+            try:
+                self.convert_pending()
+            except Exception as e:
+                logging.error(f"Error converting files: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    ErasureCodingConverter(DFSClient(NAME_NODE_ADDRESS, NAME_NODE_PORT)).run()
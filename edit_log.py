@@ -0,0 +1,133 @@
+# edit_log.py
+
+# Append-only log of NameNode namespace mutations.
+#
+# Each edit is written as a length-prefixed, checksummed record:
+#
+#   record length (4 bytes) | crc32 (4 bytes) | txid (8 bytes) | pickled edit
+#
+# Mutations are appended to an in-memory buffer while the NameNode lock is held and
+# made durable afterwards by sync(). Whichever caller gets there first writes and
+# fsyncs everything buffered so far, and the callers that arrive meanwhile just wait
+# for it, so concurrent mutations share one fsync (group commit).
+#
+# The log is split into segments named edits_<first txid>.log. A checkpoint rolls
+# the log to a new segment, so older segments can be deleted once an fsimage
+# covering them is on disk.
+import glob
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+RECORD_HEADER = struct.Struct('!IIQ')
+
+
+def segment_path(directory, first_txid):
+    return os.path.join(directory, f"edits_{first_txid:020d}.log")
+
+
+def list_segments(directory):
+    # Returns [(first_txid, path)] in txid order
+    segments = []
+    for path in glob.glob(os.path.join(directory, "edits_*.log")):
+        name = os.path.basename(path)
+        segments.append((int(name[len("edits_"):-len(".log")]), path))
+    return sorted(segments)
+
+
+def encode_edit(txid, edit):
+    encoded = pickle.dumps(edit, protocol=pickle.HIGHEST_PROTOCOL)
+    body = struct.pack('!Q', txid) + encoded
+    return struct.pack('!II', len(encoded), zlib.crc32(body)) + body
+
+
+def read_edits(path, repair=False):
+    # Yields (txid, edit) from one segment. Stops at the first torn or corrupt record,
+    # which can only be the tail of a segment that was being written during a crash.
+    # With 'repair' the torn tail is cut off so new edits can be appended after it.
+    with open(path, 'rb') as segment:
+        data = segment.read()
+
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc, txid = RECORD_HEADER.unpack_from(data, offset)
+        end = offset + RECORD_HEADER.size + length
+        if end > len(data) or zlib.crc32(data[offset + 8:end]) != crc:
+            break
+        yield txid, pickle.loads(data[offset + RECORD_HEADER.size:end])
+        offset = end
+
+    if repair and offset < len(data):
+        with open(path, 'r+b') as segment:
+            segment.truncate(offset)
+
+
+class EditLog:
+    def __init__(self, directory, last_txid):
+        # 'last_txid' is the last transaction already applied from the image and older segments
+        self.directory = directory
+        self.condition = threading.Condition()
+        self.buffer = bytearray()
+        self.last_txid = last_txid
+        self.synced_txid = last_txid
+        self.syncing = False
+        self.segment = open(segment_path(directory, last_txid + 1), 'ab')
+
+    def log_edit(self, edit):
+        # Buffer one edit and return its txid; cheap enough to call under the NameNode lock
+        with self.condition:
+            self.last_txid += 1
+            self.buffer += encode_edit(self.last_txid, edit)
+            return self.last_txid
+
+    def sync(self, txid):
+        # Block until 'txid' is on disk, writing and fsyncing the buffer if nobody else is
+        with self.condition:
+            while self.synced_txid < txid:
+                if self.syncing:
+                    self.condition.wait()
+                    continue
+
+                self.syncing = True
+                data, self.buffer = self.buffer, bytearray()
+                target_txid = self.last_txid
+                segment = self.segment
+                self.condition.release()
+                try:
+                    segment.write(data)
+                    segment.flush()
+                    os.fsync(segment.fileno())
+                except Exception:
+                    # Put the edits back so a later sync retries them
+                    self.condition.acquire()
+                    self.buffer[:0] = data
+                    self.syncing = False
+                    self.condition.notify_all()
+                    raise
+                self.condition.acquire()
+                self.syncing = False
+                self.synced_txid = target_txid
+                self.condition.notify_all()
+
+    def roll(self):
+        # Finish the current segment and start a new one. The caller must stop new edits
+        # from being logged meanwhile (the NameNode holds its lock). Returns the last txid
+        # of the finished segment.
+        self.sync(self.last_txid)
+        with self.condition:
+            self.segment.close()
+            self.segment = open(segment_path(self.directory, self.last_txid + 1), 'ab')
+            return self.last_txid
+
+    def purge(self, up_to_txid):
+        # Delete segments whose edits are all covered by an fsimage at 'up_to_txid'
+        segments = list_segments(self.directory)
+        for (first_txid, path), following in zip(segments, segments[1:] + [(None, None)]):
+            if following[0] is not None and following[0] - 1 <= up_to_txid:
+                os.remove(path)
+
+    def close(self):
+        self.sync(self.last_txid)
+        self.segment.close()
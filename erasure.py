@@ -0,0 +1,126 @@
+# erasure.py
+
+# Reed-Solomon erasure coding for striped storage.
+#
+# A file stored under an 'RS-<k>-<m>' policy is cut into block groups of k data cells.
+# Each group gets m parity cells, and every cell is stored as an ordinary block on its
+# own DataNode. Any k of the k + m cells of a group are enough to rebuild the others,
+# so a group survives the loss of m DataNodes at a storage cost of (k + m) / k instead
+# of 2x replication.
+#
+# Arithmetic is in GF(2^8). The code is systematic: data cells are stored as they are
+# and parity comes from a Cauchy matrix, every square submatrix of which is
+# invertible, so any k surviving cells can be decoded. Encoding and decoding work on
+# whole cells at once through a 256x256 multiplication table and NumPy lookups.
+import re
+
+import numpy as np
+
+REPLICATED = 'REPLICATED'
+
+GF_POLYNOMIAL = 0x11d
+
+
+def build_tables():
+    exp = np.zeros(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int32)
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= GF_POLYNOMIAL
+    exp[255:510] = exp[:255]
+
+    a = np.arange(256)[:, None]
+    b = np.arange(256)[None, :]
+    mul = exp[(log[a] + log[b]) % 255]
+    mul[(a == 0) | (b == 0)] = 0
+    return exp, log, mul.astype(np.uint8)
+
+
+GF_EXP, GF_LOG, GF_MUL = build_tables()
+
+
+def gf_inverse(value):
+    return int(GF_EXP[255 - GF_LOG[value]])
+
+
+def gf_invert_matrix(matrix):
+    # Gauss-Jordan elimination over GF(2^8); 'matrix' is a small square list of lists
+    size = len(matrix)
+    rows = [list(row) + [int(i == j) for j in range(size)] for i, row in enumerate(matrix)]
+    for column in range(size):
+        pivot = next((row for row in range(column, size) if rows[row][column]), None)
+        if pivot is None:
+            raise ValueError("Matrix is singular")
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+
+        scale = gf_inverse(rows[column][column])
+        rows[column] = [int(GF_MUL[scale, value]) for value in rows[column]]
+        for row in range(size):
+            factor = rows[row][column]
+            if row != column and factor:
+                rows[row] = [value ^ int(GF_MUL[factor, pivot_value])
+                             for value, pivot_value in zip(rows[row], rows[column])]
+    return [row[size:] for row in rows]
+
+
+def parse_policy(policy):
+    # 'RS-6-3' -> (6, 3); REPLICATED -> None
+    if policy == REPLICATED:
+        return None
+    match = re.fullmatch(r'RS-(\d+)-(\d+)', policy or '')
+    if not match or int(match.group(1)) < 1 or int(match.group(2)) < 1 or sum(map(int, match.groups())) > 255:
+        raise ValueError(f"Unknown storage policy '{policy}'")
+    return int(match.group(1)), int(match.group(2))
+
+
+class ReedSolomon:
+    def __init__(self, data_cells, parity_cells):
+        self.data_cells = data_cells
+        self.parity_cells = parity_cells
+        # Cauchy matrix: parity[i][j] = 1 / (x_i + y_j) with x_i = k + i and y_j = j
+        self.parity_matrix = np.array([[gf_inverse((data_cells + i) ^ j) for j in range(data_cells)]
+                                       for i in range(parity_cells)], dtype=np.uint8)
+
+    def generator_row(self, index):
+        # Row of the full (k + m) x k generator matrix for cell 'index'
+        if index < self.data_cells:
+            return [int(index == j) for j in range(self.data_cells)]
+        return [int(value) for value in self.parity_matrix[index - self.data_cells]]
+
+    def combine(self, coefficients, cells):
+        # XOR of GF products: sum_j coefficients[j] * cells[j], over equally long uint8 rows
+        # Multiplying by a constant is one lookup in that constant's table row
+        result = np.zeros(cells.shape[1], dtype=np.uint8)
+        for coefficient, cell in zip(coefficients, cells):
+            if coefficient == 1:
+                result ^= cell
+            elif coefficient:
+                result ^= np.take(GF_MUL[coefficient], cell)
+        return result
+
+    def encode(self, data):
+        # 'data' is a (k, cell length) uint8 array, returns the (m, cell length) parity
+        return np.stack([self.combine(row, data) for row in self.parity_matrix])
+
+    def decode(self, cells):
+        # 'cells' maps cell index -> uint8 array for at least k cells of one group.
+        # Returns the (k, cell length) data cells, rebuilding missing ones.
+        if len(cells) < self.data_cells:
+            raise ValueError(f"Need {self.data_cells} cells to decode, have {len(cells)}")
+        available = sorted(cells)[:self.data_cells]
+        length = len(cells[available[0]])
+        data = np.empty((self.data_cells, length), dtype=np.uint8)
+        missing = [index for index in range(self.data_cells) if index not in cells]
+        for index in range(self.data_cells):
+            if index in cells:
+                data[index] = cells[index]
+        if missing:
+            inverse = gf_invert_matrix([self.generator_row(index) for index in available])
+            stacked = np.stack([cells[index] for index in available])
+            for index in missing:
+                data[index] = self.combine(inverse[index], stacked)
+        return data
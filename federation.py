@@ -0,0 +1,89 @@
+# federation.py
+
+# Mount table for a namespace split across several NameNode processes.
+#
+# Each NameNode of a federated cluster holds part of the namespace and hands out block
+# ids from its own block pool: the top bits of a block id are the NameNode's namespace
+# id, so pools never collide on the DataNodes they share. DataNodes register with and
+# report to every NameNode, and each NameNode only acts on blocks of its own pool.
+#
+# Clients route each request with the mount table. A mount point maps a path prefix to
+# one NameNode, or to several: then every entry directly below the mount point lives,
+# with its whole subtree, on the NameNode picked by a hash of its name. The longest
+# matching prefix wins. Requests for different subtrees go to different processes,
+# which is what spreads metadata work over several cores. NameNodes store full paths,
+# so moving a NameNode's subtree to another mount point needs no rewriting, but a
+# rename cannot cross from one NameNode to another.
+#
+# A mount table is written as  /=localhost:5007;/users=localhost:5017,localhost:5027
+import zlib
+
+from namespace import split_path
+
+
+def normalize(path):
+    return '/' + '/'.join(split_path(path))
+
+
+class MountTable:
+    def __init__(self, mounts):
+        # {path prefix: [(address, port), ...]}; there must be an entry for '/'
+        self.mounts = {normalize(prefix): list(name_nodes) for prefix, name_nodes in mounts.items()}
+        if '/' not in self.mounts:
+            raise ValueError("The mount table has no entry for '/'")
+        if not all(self.mounts.values()):
+            raise ValueError("Every mount point needs at least one NameNode")
+
+    @classmethod
+    def parse(cls, spec):
+        mounts = {}
+        for entry in filter(None, (entry.strip() for entry in spec.split(';'))):
+            prefix, _, name_nodes = entry.partition('=')
+            mounts[prefix] = [(address.strip(), int(port))
+                              for address, port in (name_node.rsplit(':', 1) for name_node in name_nodes.split(','))]
+        return cls(mounts)
+
+    def __str__(self):
+        return ';'.join(f"{prefix}=" + ','.join(f"{address}:{port}" for address, port in name_nodes)
+                        for prefix, name_nodes in self.mounts.items())
+
+    def name_nodes(self):
+        # Every NameNode in the table once, in order of appearance
+        seen = []
+        for name_nodes in self.mounts.values():
+            seen.extend(name_node for name_node in name_nodes if name_node not in seen)
+        return seen
+
+    def mount_point(self, path):
+        # (longest mount prefix of 'path', the components of 'path' below it)
+        components = split_path(path)
+        for length in range(len(components), -1, -1):
+            prefix = '/' + '/'.join(components[:length])
+            if prefix in self.mounts:
+                return prefix, components[length:]
+
+    def resolve(self, path):
+        # The NameNode holding 'path'. A mount point spread over several NameNodes
+        # exists on all of them; the first one answers for the directory itself.
+        prefix, below = self.mount_point(path)
+        name_nodes = self.mounts[prefix]
+        if len(name_nodes) == 1 or not below:
+            return name_nodes[0]
+        return name_nodes[zlib.crc32(below[0].encode()) % len(name_nodes)]
+
+    def spread(self, path):
+        # The NameNodes holding entries directly below the directory 'path'
+        prefix, below = self.mount_point(path)
+        return list(self.mounts[prefix]) if not below else [self.resolve(path)]
+
+    def mounts_below(self, path):
+        # Names of the entries directly below 'path' that lead to other mount points,
+        # which the NameNodes holding 'path' may know nothing about
+        components = split_path(path)
+        names = []
+        for prefix in self.mounts:
+            prefix_components = split_path(prefix)
+            if len(prefix_components) > len(components) and prefix_components[:len(components)] == components:
+                if prefix_components[len(components)] not in names:
+                    names.append(prefix_components[len(components)])
+        return names
@@ -0,0 +1,144 @@
+# fsimage.py
+
+# Compact binary snapshot of the NameNode namespace.
+#
+# Layout, all integers big-endian:
+#
+#   magic (8 bytes) | txid (8) | next block id (8) | entry count (8) | node table length (4)
+#   node table: pickled list of DataNode ids, referenced by index from block records
+#   entries, each one of:
+#     'D' | path length (4) | path | attribute length (4) | pickled optional attributes
+#     'F' | path length (4) | path | size (8) | block size (8) | attribute length (4) |
+#           pickled optional attributes | block count (4) |
+#           per block: block id (8) | size (8) | replica count (1) | replica indexes (2 each) |
+#                      hash length (1) | SHA-256 of the content for deduplicated blocks
+#
+# Images are written to a temporary file and renamed into place, and read back through
+# mmap so loading a large image does not copy the whole file into memory first.
+import glob
+import mmap
+import os
+import pickle
+import struct
+
+MAGIC = b'YDFSIMG1'
+IMAGE_HEADER = struct.Struct('!8sQQQI')
+PATH_HEADER = struct.Struct('!cI')
+FILE_HEADER = struct.Struct('!QQI')
+BLOCK_HEADER = struct.Struct('!QQB')
+
+
+def image_path(directory, txid):
+    return os.path.join(directory, f"fsimage_{txid:020d}.img")
+
+
+def latest_image(directory):
+    # Returns the path of the newest fsimage, or None
+    images = sorted(glob.glob(os.path.join(directory, "fsimage_*.img")))
+    return images[-1] if images else None
+
+
+def save_image(directory, txid, next_block_id, entries):
+    # 'entries' is a list of ('D', path, attributes) and
+    # ('F', path, size, block_size, attributes, blocks) where blocks is a list of
+    # (block_id, size, data_node_ids) with the hex content hash as a fourth field for
+    # deduplicated blocks
+    node_table = []
+    node_index = {}
+    for entry in entries:
+        if entry[0] == 'F':
+            for block in entry[5]:
+                for data_node_id in block[2]:
+                    if data_node_id not in node_index:
+                        node_index[data_node_id] = len(node_table)
+                        node_table.append(data_node_id)
+    encoded_table = pickle.dumps(node_table, protocol=pickle.HIGHEST_PROTOCOL)
+
+    path = image_path(directory, txid)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as image:
+        image.write(IMAGE_HEADER.pack(MAGIC, txid, next_block_id, len(entries), len(encoded_table)))
+        image.write(encoded_table)
+
+        for entry in entries:
+            encoded_path = entry[1].encode()
+            image.write(PATH_HEADER.pack(entry[0].encode(), len(encoded_path)))
+            image.write(encoded_path)
+            if entry[0] != 'F':
+                encoded_attributes = pickle.dumps(entry[2], protocol=pickle.HIGHEST_PROTOCOL) if entry[2] else b''
+                image.write(struct.pack('!I', len(encoded_attributes)))
+                image.write(encoded_attributes)
+                continue
+
+            _, _, size, block_size, attributes, blocks = entry
+            encoded_attributes = pickle.dumps(attributes, protocol=pickle.HIGHEST_PROTOCOL) if attributes else b''
+            image.write(FILE_HEADER.pack(size, block_size, len(encoded_attributes)))
+            image.write(encoded_attributes)
+            image.write(struct.pack('!I', len(blocks)))
+            for block in blocks:
+                block_id, block_size_used, data_node_ids = block[:3]
+                digest = bytes.fromhex(block[3]) if len(block) > 3 else b''
+                image.write(BLOCK_HEADER.pack(block_id, block_size_used, len(data_node_ids)))
+                image.write(struct.pack(f'!{len(data_node_ids)}H', *(node_index[node] for node in data_node_ids)))
+                image.write(struct.pack('!B', len(digest)) + digest)
+
+        image.flush()
+        os.fsync(image.fileno())
+
+    os.replace(temp_path, path)
+    return path
+
+
+def load_image(path):
+    # Returns (txid, next_block_id, entries) with entries in the same form save_image takes
+    with open(path, 'rb') as image, mmap.mmap(image.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, txid, next_block_id, entry_count, table_length = IMAGE_HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not an fsimage")
+        offset = IMAGE_HEADER.size
+        node_table = pickle.loads(data[offset:offset + table_length])
+        offset += table_length
+
+        entries = []
+        for _ in range(entry_count):
+            kind, path_length = PATH_HEADER.unpack_from(data, offset)
+            offset += PATH_HEADER.size
+            entry_path = data[offset:offset + path_length].decode()
+            offset += path_length
+            if kind == b'D':
+                attributes_length, = struct.unpack_from('!I', data, offset)
+                offset += 4
+                attributes = pickle.loads(data[offset:offset + attributes_length]) if attributes_length else {}
+                offset += attributes_length
+                entries.append(('D', entry_path, attributes))
+                continue
+
+            size, block_size, attributes_length = FILE_HEADER.unpack_from(data, offset)
+            offset += FILE_HEADER.size
+            attributes = pickle.loads(data[offset:offset + attributes_length]) if attributes_length else {}
+            offset += attributes_length
+            block_count, = struct.unpack_from('!I', data, offset)
+            offset += 4
+
+            blocks = []
+            for _ in range(block_count):
+                block_id, block_size_used, replica_count = BLOCK_HEADER.unpack_from(data, offset)
+                offset += BLOCK_HEADER.size
+                replicas = struct.unpack_from(f'!{replica_count}H', data, offset)
+                offset += 2 * replica_count
+                block = (block_id, block_size_used, [node_table[index] for index in replicas])
+                digest_length = data[offset]
+                if digest_length:
+                    block += (data[offset + 1:offset + 1 + digest_length].hex(),)
+                offset += 1 + digest_length
+                blocks.append(block)
+            entries.append(('F', entry_path, size, block_size, attributes, blocks))
+
+    return txid, next_block_id, entries
+
+
+def purge_images(directory, keep_txid):
+    # Remove every image older than the one at 'keep_txid'
+    for path in glob.glob(os.path.join(directory, "fsimage_*.img")):
+        if path != image_path(directory, keep_txid):
+            os.remove(path)
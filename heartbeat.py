@@ -0,0 +1,55 @@
+# heartbeat.py
+
+# DataNode liveness tracking for the NameNode.
+#
+# Each heartbeat pushes the node's new expiry deadline onto a min-heap, so recording
+# one costs O(log n). A timer thread sleeps until the earliest deadline and pops
+# expired entries. An entry whose deadline is older than the node's latest one was
+# superseded by a later heartbeat and is just dropped, so nothing ever scans all nodes.
+import heapq
+import threading
+import time
+
+
+class HeartbeatMonitor:
+    def __init__(self, timeout, on_dead):
+        self.timeout = timeout
+        self.on_dead = on_dead  # Called with the data node id when it expires
+        self.condition = threading.Condition()
+        self.deadlines = {}  # data node id -> latest deadline
+        self.heap = []
+
+    def heartbeat(self, data_node_id):
+        # Returns True if the node was not being tracked (new or previously expired)
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            was_tracked = data_node_id in self.deadlines
+            self.deadlines[data_node_id] = deadline
+            heapq.heappush(self.heap, (deadline, data_node_id))
+            if len(self.heap) == 1:
+                self.condition.notify()
+        return not was_tracked
+
+    def run(self):
+        while True:
+            expired = []
+            with self.condition:
+                while not self.heap:
+                    self.condition.wait()
+
+                now = time.monotonic()
+                while self.heap and self.heap[0][0] <= now:
+                    deadline, data_node_id = heapq.heappop(self.heap)
+                    if self.deadlines.get(data_node_id) == deadline:
+                        del self.deadlines[data_node_id]
+                        expired.append(data_node_id)
+
+                if not expired and self.heap:
+                    self.condition.wait(self.heap[0][0] - now)
+
+            # Callbacks run outside the condition so they may take other locks
+            for data_node_id in expired:
+                self.on_dead(data_node_id)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
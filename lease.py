@@ -0,0 +1,67 @@
+# lease.py
+
+# Expiry of blocks allocated for uploads that never completed.
+#
+# A client writing a file holds a lease on its path, taken and renewed by every block
+# the NameNode allocates for it. Allocated blocks stay incomplete until complete_file
+# (or complete_packed_files) records them; a client that dies in between leaves them
+# behind, and the replicas it did write would otherwise be accepted by every block
+# report and kept forever. Once a lease has gone BLOCK_LEASE_TIMEOUT without renewal,
+# this monitor logs an 'abandon_blocks' edit for the blocks still incomplete under it.
+# Applying the edit drops them, which queues their replicas for deletion on the
+# DataNodes. Leases are not persisted: replaying the allocations after a restart grants
+# them again, so writers get the full timeout to finish or fail.
+import logging
+import threading
+import time
+
+
+class LeaseMonitor:
+    def __init__(self, name_node, timeout, check_interval):
+        # Shares the NameNode's lock and block map
+        self.name_node = name_node
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.leases = {}  # {dfs_path: [last renewal, ids of its incomplete blocks]}
+
+    def add_block(self, dfs_path, block_id):
+        # Called with the NameNode lock held when a block is allocated for 'dfs_path'
+        lease = self.leases.setdefault(dfs_path, [0, set()])
+        lease[0] = time.monotonic()
+        lease[1].add(block_id)
+
+    def remove_block(self, dfs_path, block_id):
+        # Called with the NameNode lock held when an incomplete block is completed or dropped
+        lease = self.leases.get(dfs_path)
+        if lease is not None:
+            lease[1].discard(block_id)
+            if not lease[1]:
+                del self.leases[dfs_path]
+
+    def pending(self):
+        return sum(len(block_ids) for _, block_ids in self.leases.values())
+
+    def expire(self):
+        # Abandon the blocks of every expired lease, returns how many were abandoned
+        name_node = self.name_node
+        deadline = time.monotonic() - self.timeout
+        with name_node.lock:
+            expired = [dfs_path for dfs_path, (renewed, _) in self.leases.items() if renewed < deadline]
+            block_ids = sorted(block_id for dfs_path in expired for block_id in self.leases[dfs_path][1])
+            if not block_ids:
+                return 0
+            txid = name_node.log_edit(('abandon_blocks', block_ids))
+        name_node.edit_log.sync(txid)
+        logging.warning(f"Abandoned {len(block_ids)} blocks of unfinished uploads to {expired}")
+        return len(block_ids)
+
+    def run(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self.expire()
+            except Exception as e:
+                logging.error(f"Error expiring block leases: {e}")
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
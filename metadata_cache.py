@@ -0,0 +1,95 @@
+# metadata_cache.py
+
+# Client-side cache of NameNode metadata: block locations, directory listings and
+# directory trees.
+#
+# Entries are kept in LRU order, bounded in number and dropped after a TTL. Between
+# those limits they stay valid under a lease: for the lease period the NameNode hands
+# out, the client answers from the cache without asking anything. When the lease
+# runs out the client asks the NameNode which paths changed since the last check and
+# drops every entry those changes could affect, then trusts the rest for another lease.
+# A cached answer is therefore at most one lease old, and an unchanged namespace costs
+# one small request per lease instead of one per call.
+import threading
+import time
+from collections import OrderedDict
+
+from namespace import split_path
+
+
+def affects(changed_path, cached_path):
+    # A change at 'changed_path' invalidates entries for the path itself, for its
+    # ancestors (their listings and trees include it) and for anything below it
+    changed, cached = split_path(changed_path), split_path(cached_path)
+    shorter = min(len(changed), len(cached))
+    return changed[:shorter] == cached[:shorter]
+
+
+class MetadataCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (kind, path) -> (value, expiry)
+
+        # Namespace version the cache was last checked against, and when that lease ends
+        self.txid = None
+        self.lease_expiry = 0
+        # Bumped on every invalidation; a lookup that raced with one is not cached
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def lease_valid(self):
+        return self.txid is not None and time.monotonic() < self.lease_expiry
+
+    def get(self, kind, path):
+        # Returns the cached value or None
+        key = (kind, path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, kind, path, value, generation):
+        # 'generation' is the one seen before the value was fetched
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[(kind, path)] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end((kind, path))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, changed_paths):
+        with self.lock:
+            self.generation += 1
+            for key in [key for key in self.entries if any(affects(path, key[1]) for path in changed_paths)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def renew(self, changes):
+        # Apply a NameNode 'get_changes' response and extend the lease.
+        # 'paths' is None when the NameNode no longer remembers every change since our txid.
+        if changes['paths'] is None:
+            self.clear()
+        elif changes['paths']:
+            self.invalidate(changes['paths'])
+        with self.lock:
+            self.txid = changes['txid']
+            self.lease_expiry = time.monotonic() + changes['lease']
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,249 @@
+# metrics.py
+
+# Counters, gauges and latency histograms for the NameNode and DataNodes.
+#
+# Each node keeps one MetricsRegistry. Metrics may have labels, e.g. the request action;
+# every combination of label values is its own series, created on first use. Updating a
+# series takes one small lock, so instrumenting every request costs a few microseconds.
+# Gauges can also be computed on demand from a function, for values the node already
+# tracks (block counts, queue lengths) and that would be wasteful to maintain twice.
+#
+# Histograms are log-linear in the style of HdrHistogram: every power of two is split
+# into HISTOGRAM_SUB_BUCKETS equal buckets, so any recorded value is known to within
+# about 6% from a few hundred counters, whatever its magnitude. Percentiles come from
+# the bucket counts.
+#
+# The registry is exported in the Prometheus text format, over HTTP by
+# start_metrics_server and through the nodes' 'metrics' action, and as plain
+# dictionaries for 'status' responses.
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HISTOGRAM_SUB_BUCKET_BITS = 4
+HISTOGRAM_SUB_BUCKETS = 1 << HISTOGRAM_SUB_BUCKET_BITS
+HISTOGRAM_PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def bucket_index(value):
+    # Bucket of a non-negative integer value
+    if value < HISTOGRAM_SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - HISTOGRAM_SUB_BUCKET_BITS - 1
+    return (shift + 1) * HISTOGRAM_SUB_BUCKETS + (value >> shift) - HISTOGRAM_SUB_BUCKETS
+
+
+def bucket_bounds(index):
+    # The [lower, upper) integer values counted in a bucket
+    if index < HISTOGRAM_SUB_BUCKETS:
+        return index, index + 1
+    shift = index // HISTOGRAM_SUB_BUCKETS - 1
+    mantissa = index % HISTOGRAM_SUB_BUCKETS + HISTOGRAM_SUB_BUCKETS
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class CounterSeries:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class GaugeSeries(CounterSeries):
+    def set(self, value):
+        with self.lock:
+            self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class HistogramSeries:
+    def __init__(self, unit):
+        self.unit = unit  # Recorded values are counted in multiples of this
+        self.lock = threading.Lock()
+        self.counts = {}  # bucket index -> count
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = bucket_index(max(0, int(value / self.unit)))
+        with self.lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank
+        with self.lock:
+            counts = sorted(self.counts.items())
+            count, maximum = self.count, self.max
+        if not count:
+            return 0.0
+        rank = math.ceil(fraction * count)
+        seen = 0
+        for index, bucket_count in counts:
+            seen += bucket_count
+            if seen >= rank:
+                return min(bucket_bounds(index)[1] * self.unit, maximum)
+        return maximum
+
+    def cumulative_buckets(self):
+        # [(upper bound, values below it)] at every power of two, for Prometheus 'le' buckets
+        with self.lock:
+            counts = sorted(self.counts.items())
+            count = self.count
+        buckets = []
+        seen = 0
+        bound = 1
+        for index, bucket_count in counts:
+            lower = bucket_bounds(index)[0]
+            while bound <= lower:
+                buckets.append((bound * self.unit, seen))
+                bound <<= 1
+            seen += bucket_count
+        buckets.append((bound * self.unit, count))
+        return buckets
+
+    def snapshot(self):
+        stats = {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'max': self.max,
+        }
+        for fraction in HISTOGRAM_PERCENTILES:
+            stats[f"p{fraction * 100:g}"] = self.percentile(fraction)
+        return stats
+
+
+class Metric:
+    def __init__(self, kind, name, help_text, label_names, new_series, function=None):
+        self.kind = kind
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.new_series = new_series
+        # Computed gauges: returns a value, or {label values: value} if the gauge has labels
+        self.function = function
+        self.lock = threading.Lock()
+        self.series = {}  # tuple of label values -> series
+
+    def labels(self, *values):
+        series = self.series.get(values)
+        if series is None:
+            with self.lock:
+                series = self.series.setdefault(values, self.new_series())
+        return series
+
+    # Shortcuts for metrics without labels
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def collect(self):
+        # {tuple of label values: series or plain value}
+        if self.function is None:
+            return dict(self.series)
+        value = self.function()
+        return dict(value) if self.label_names else {(): value}
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class MetricsRegistry:
+    def __init__(self, prefix):
+        self.prefix = prefix  # e.g. 'namenode', prepended to every metric name
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self.register(Metric('counter', f"{self.prefix}_{name}", help_text, label_names, CounterSeries))
+
+    def gauge(self, name, help_text, label_names=(), function=None):
+        return self.register(Metric('gauge', f"{self.prefix}_{name}", help_text, label_names, GaugeSeries, function))
+
+    def histogram(self, name, help_text, label_names=(), unit=1e-6):
+        # 'unit' is the resolution of recorded values; the default suits latencies in seconds
+        return self.register(Metric('histogram', f"{self.prefix}_{name}", help_text, label_names,
+                                    lambda: HistogramSeries(unit)))
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for values, series in sorted(metric.collect().items()):
+                labels = format_labels(metric.label_names, values)
+                if metric.kind != 'histogram':
+                    value = series.snapshot() if hasattr(series, 'snapshot') else series
+                    lines.append(f"{metric.name}{labels} {value}")
+                    continue
+                for bound, count in series.cumulative_buckets():
+                    bucket_labels = format_labels(metric.label_names, values, [('le', f"{bound:g}")])
+                    lines.append(f"{metric.name}_bucket{bucket_labels} {count}")
+                lines.append(f"{metric.name}_bucket{format_labels(metric.label_names, values, [('le', '+Inf')])} "
+                             f"{series.count}")
+                lines.append(f"{metric.name}_sum{labels} {series.sum}")
+                lines.append(f"{metric.name}_count{labels} {series.count}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        # {metric name: value} for unlabelled metrics, {metric name: {label values: value}}
+        # otherwise; histograms give count, sum, mean, max and percentiles
+        stats = {}
+        for metric in self.metrics.values():
+            values = {','.join(map(str, label_values)): series.snapshot() if hasattr(series, 'snapshot') else series
+                      for label_values, series in metric.collect().items()}
+            stats[metric.name] = values.get('', 0) if not metric.label_names else values
+        return stats
+
+
+def start_metrics_server(registry, port, address='localhost'):
+    # Serve the registry to Prometheus at http://<address>:<port>/metrics
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,16 +1,31 @@
+import argparse
 import socket
-import pickle
 import os
 import logging
-import random
-import math
-import traceback
-import shutil  
-from flask import Flask, request, jsonify
 import time
+import threading
+import selectors
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Import shared constants
-from common import NAME_NODE_PORT
+from common import (NAME_NODE_PORT, NAME_NODE_WORKERS, NAME_NODE_MAX_IN_FLIGHT, REPLICATION_FACTOR,
+                    NAME_NODE_METADATA_DIRECTORY, CHECKPOINT_INTERVAL, CHECKPOINT_EDITS, HEARTBEAT_TIMEOUT,
+                    DEFAULT_BLOCK_SIZE, DEFAULT_RACK, CLIENT_CACHE_LEASE, NAME_NODE_CHANGE_LOG_SIZE,
+                    NAME_NODE_METRICS_PORT, DELETION_BATCH, BLOCK_POOL_BITS, BLOCK_LEASE_TIMEOUT,
+                    LEASE_CHECK_INTERVAL)
+from protocol import MSG_REQUEST, recv_message, send_response
+from namespace import Namespace, FileRecord, DirectoryNode, join_path, split_path
+from edit_log import EditLog, list_segments, read_edits
+from fsimage import latest_image, load_image, save_image, purge_images
+from heartbeat import HeartbeatMonitor
+from replication import ReplicationMonitor
+from deletion import DeletionMonitor
+from lease import LeaseMonitor
+from placement import LoadAwarePlacementPolicy
+from erasure import REPLICATED, parse_policy
+from metrics import MetricsRegistry, start_metrics_server
 
 def setup_logging():
     # Set up logging to a file and console
@@ -26,58 +41,380 @@ def setup_logging():
 setup_logging()
 
 class NameNode:
-    def __init__(self):
-        # In-memory storage for metadata
-        self.metadata = {}
+    def __init__(self, max_workers=NAME_NODE_WORKERS, max_in_flight=NAME_NODE_MAX_IN_FLIGHT,
+                 metadata_directory=NAME_NODE_METADATA_DIRECTORY, placement_policy=None, port=NAME_NODE_PORT,
+                 namespace_id=0):
+        # In-memory storage for metadata. 'namespace' is the directory tree of files,
+        # 'data_nodes' holds DataNode registrations and 'blocks' maps a block id to the
+        # file it belongs to and the DataNodes holding it; block data lives only on DataNodes.
+        self.namespace = Namespace()
+        self.data_nodes = {}
         self.blocks = {}
 
-        # Dictionary to track active DataNodes and their last heartbeat times
-        self.active_data_nodes = {}
+        # In a federated cluster every NameNode has its own 'namespace_id' and allocates
+        # block ids from its own pool. DataNodes report every block they hold to every
+        # NameNode; blocks of other pools are none of this one's business.
+        self.namespace_id = namespace_id
+        self.next_block_id = namespace_id << BLOCK_POOL_BITS
 
-        # Start the server socket
+        # SHA-256 of block content -> block id, for blocks written with deduplication.
+        # Such a block can be shared by several files; its 'refs' counts the references
+        # and it is deleted only when the last one goes.
+        self.block_hashes = {}
+
+        # Which blocks each DataNode holds, kept up to date by block reports
+        self.data_node_blocks = {}
+
+        # Commands waiting to be handed to a DataNode in its next heartbeat response
+        self.pending_commands = {}
+
+        # Blocks of pinned files, which DataNodes keep in their block caches. Pins are
+        # not logged; DataNodes learn them again after a restart from their full report.
+        self.pinned_blocks = set()
+
+        # Picks the DataNodes for new replicas from the load and capacity in heartbeats
+        self.placement_policy = placement_policy or LoadAwarePlacementPolicy()
+
+        # Guards 'namespace', 'data_nodes', 'blocks', 'data_node_blocks' and 'pending_commands'
+        # across worker threads.
+        # Hold it only around dictionary updates, never around file or socket I/O.
+        self.lock = threading.RLock()
+
+        # DataNodes are marked dead when no heartbeat arrives within HEARTBEAT_TIMEOUT,
+        # and the blocks they held are queued for re-replication
+        self.heartbeat_monitor = HeartbeatMonitor(HEARTBEAT_TIMEOUT, self.mark_data_node_dead)
+        self.replication_monitor = ReplicationMonitor(self)
+
+        # Deleted subtrees are unlinked at once and taken apart in the background
+        self.deletion_monitor = DeletionMonitor(self, DELETION_BATCH)
+
+        # Blocks allocated for uploads that never complete are abandoned once the
+        # writer's lease on the path expires
+        self.lease_monitor = LeaseMonitor(self, BLOCK_LEASE_TIMEOUT, LEASE_CHECK_INTERVAL)
+
+        # Request counts, latencies and traffic, plus gauges computed from the state above.
+        # Exported by 'status', the 'metrics' action and over HTTP on NAME_NODE_METRICS_PORT.
+        self.metrics = MetricsRegistry('namenode')
+        self.register_metrics()
+
+        # Rebuild the namespace from the latest fsimage plus the edit log after it.
+        # Every mutation is logged before its response is sent.
+        self.metadata_directory = metadata_directory
+        os.makedirs(self.metadata_directory, exist_ok=True)
+        self.checkpoint_txid = self.load_namespace()
+        self.edit_log = EditLog(self.metadata_directory, self.last_loaded_txid)
+
+        # Recent (txid, changed paths), so clients can check their metadata caches.
+        # Changes up to 'changes_floor' have been forgotten.
+        self.recent_changes = deque()
+        self.changes_floor = self.last_loaded_txid
+
+        # Start the server socket; port 0 picks a free one
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.bind(('localhost', NAME_NODE_PORT))
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('localhost', port))
         self.server_socket.listen()
+        self.port = self.server_socket.getsockname()[1]
+        self.server_socket.setblocking(False)
+
+        # The accept loop only waits for readable sockets; requests are served by a
+        # bounded worker pool so a slow upload never blocks metadata RPCs.
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server_socket, selectors.EVENT_READ)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='namenode-worker')
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+
+        # Client connections are persistent. A worker hands its connection back to the
+        # accept loop as soon as it has read one request, so pipelined requests on the
+        # same connection are served concurrently. The socketpair wakes the loop up.
+        self.rearm_queue = queue.SimpleQueue()
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ)
 
         print("NameNode is listening for socket connections.")
 
-    def handle_client(self, client_socket):
-        request = client_socket.recv(1024)
-        if request:
-            try:
-                request_data = pickle.loads(request)
-                action = request_data.get('action')
-                if action == 'create_directory':
-                    response = self.create_directory(request_data['parent_path'], request_data['directory_name'])
-                elif action == 'upload_file':
-                    response = self.upload_file(request_data['local_path'], request_data['dfs_path'])
-                elif action == 'download_file':
-                    response = self.download_file(request_data['dfs_path'], request_data['local_path'])
-                elif action == 'delete_directory':
-                    response = self.delete_directory(request_data['directory_path'])
-                elif action == 'move_file':
-                    response = self.move_file(request_data['source_path'], request_data['destination_path'])
-                elif action == 'register':
-                    self.register_data_node(request_data)
-                    response = 'Registration successful'
-                elif action == 'status':
-                    response = self.get_status()
-                elif action == 'list_directory_contents':
-                    response = self.list_directory_contents(request_data['dfs_path'])
-                elif action == 'traverse_directory':
-                    response = self.traverse_directory(request_data['dfs_path'])
-                else:
-                    response = 'Invalid action'
-            except Exception as e:
-                response = f"Error processing request: {e}"
+    def register_metrics(self):
+        metrics = self.metrics
+        self.request_count = metrics.counter('requests_total', "Requests served, by action", ('action',))
+        self.request_errors = metrics.counter('request_errors_total', "Requests answered with an error", ('action',))
+        self.request_latency = metrics.histogram('request_seconds', "Time to serve a request, by action", ('action',))
+        self.bytes_received = metrics.counter('received_bytes_total', "Bytes of requests received")
+        self.bytes_sent = metrics.counter('sent_bytes_total', "Bytes of responses sent")
+        self.requests_in_flight = metrics.gauge('requests_in_flight', "Requests being served by the worker pool")
+
+        def per_data_node(key):
+            with self.lock:
+                return {(str(node_id),): info.get(key) or 0 for node_id, info in self.data_nodes.items()}
+
+        def data_nodes_by_status():
+            with self.lock:
+                counts = {('active',): 0, ('dead',): 0}
+                for info in self.data_nodes.values():
+                    counts[(info['status'],)] = counts.get((info['status'],), 0) + 1
+                return counts
+
+        metrics.gauge('blocks', "Blocks in the block map", function=lambda: len(self.blocks))
+        metrics.gauge('data_nodes', "Registered DataNodes, by status", ('status',), function=data_nodes_by_status)
+        metrics.gauge('replication_queue', "Blocks waiting for re-replication",
+                      function=lambda: len(self.replication_monitor.heap))
+        metrics.gauge('pending_deletions', "Nodes of deleted subtrees not yet removed",
+                      function=self.deletion_monitor.pending)
+        metrics.gauge('open_blocks', "Allocated blocks of uploads not yet completed",
+                      function=self.lease_monitor.pending)
+        metrics.gauge('pending_commands', "Commands waiting for the next heartbeat of their DataNode",
+                      function=lambda: sum(len(commands) for commands in list(self.pending_commands.values())))
+        metrics.gauge('data_node_blocks', "Blocks held, by DataNode", ('data_node_id',),
+                      function=lambda: {(str(node_id),): len(blocks)
+                                        for node_id, blocks in list(self.data_node_blocks.items())})
+        metrics.gauge('data_node_remaining_bytes', "Free bytes reported, by DataNode", ('data_node_id',),
+                      function=lambda: per_data_node('remaining'))
+        metrics.gauge('data_node_active_transfers', "Transfers in progress, by DataNode", ('data_node_id',),
+                      function=lambda: per_data_node('active_transfers'))
+        metrics.gauge('data_node_send_bytes_per_second', "Block bytes sent per second, by DataNode",
+                      ('data_node_id',), function=lambda: per_data_node('send_rate'))
+        metrics.gauge('data_node_receive_bytes_per_second', "Block bytes received per second, by DataNode",
+                      ('data_node_id',), function=lambda: per_data_node('receive_rate'))
+
+    def handle_client(self, client_socket, send_lock):
+        try:
+            message = recv_message(client_socket, sized=True)
+        except Exception as e:
+            logging.error(f"Error reading request: {e}")
+            message = None
+        if message is None:
+            # Peer closed the connection or sent a malformed frame
+            client_socket.close()
+            return
+
+        # The whole request has been read, let the next one on this connection be dispatched
+        self.rearm_client(client_socket, send_lock)
+
+        msg_type, request_id, request_data, payload, size = message
+        self.bytes_received.inc(size)
+        started = time.perf_counter()
+        if msg_type != MSG_REQUEST:
+            response = f"Error processing request: unexpected message type {msg_type}"
         else:
-            response = 'Empty request'
+            response = self.handle_request(request_data, payload)
+
+        # Unknown actions share one series so junk requests cannot add new ones
+        action = request_data.get('action') if isinstance(request_data, dict) else None
+        if msg_type != MSG_REQUEST or response == 'Invalid action':
+            action = 'invalid'
+        self.request_count.labels(action).inc()
+        self.request_latency.labels(action).observe(time.perf_counter() - started)
+        if isinstance(response, str) and response.startswith(('Error', 'Invalid')):
+            self.request_errors.labels(action).inc()
+
+        # Responses may be sent out of order, the request id tells the client which is which
+        with send_lock:
+            self.bytes_sent.inc(send_response(client_socket, response, request_id=request_id))
+
+    def handle_request(self, request_data, payload=b''):
+        try:
+            action = request_data.get('action')
+            if action == 'create_directory':
+                response = self.create_directory(request_data['parent_path'], request_data['directory_name'])
+            elif action == 'allocate_block':
+                response = self.allocate_block(request_data['dfs_path'],
+                                               request_data.get('block_size', DEFAULT_BLOCK_SIZE))
+            elif action == 'allocate_block_group':
+                response = self.allocate_block_group(request_data['dfs_path'], request_data['policy'],
+                                                     request_data['cell_size'])
+            elif action == 'complete_file':
+                response = self.complete_file(request_data['dfs_path'], request_data['size'],
+                                              request_data['block_size'], request_data['blocks'],
+                                              request_data.get('attributes'), request_data.get('expected_blocks'))
+            elif action == 'complete_packed_files':
+                response = self.complete_packed_files(request_data['block'], request_data['files'])
+            elif action == 'list_compactable_containers':
+                response = self.list_compactable_containers(request_data['threshold'], request_data.get('limit', 16))
+            elif action == 'set_storage_policy':
+                response = self.set_storage_policy(request_data['dfs_path'], request_data['policy'])
+            elif action == 'get_storage_policy':
+                with self.lock:
+                    response = self.namespace.storage_policy(request_data['dfs_path'], REPLICATED)
+            elif action == 'list_convertible_files':
+                response = self.list_convertible_files(request_data.get('limit', 100))
+            elif action == 'get_block_locations':
+                response = self.get_block_locations(request_data['dfs_path'])
+            elif action == 'find_block':
+                response = self.find_block(request_data['hash'])
+            elif action == 'delete_directory':
+                response = self.delete_directory(request_data['directory_path'], request_data.get('recursive', True))
+            elif action == 'move_file':
+                response = self.move_file(request_data['source_path'], request_data['destination_path'])
+            elif action == 'register':
+                self.register_data_node(request_data)
+                response = 'Registration successful'
+            elif action == 'heartbeat':
+                response = self.process_heartbeat(request_data)
+            elif action == 'pin_file':
+                response = self.pin_file(request_data['dfs_path'], request_data.get('pinned', True))
+            elif action == 'get_changes':
+                response = self.get_changes(request_data.get('since'))
+            elif action == 'status':
+                response = self.get_status()
+            elif action == 'metrics':
+                response = self.metrics.render()
+            elif action == 'list_directory_contents':
+                response = self.list_directory_contents(request_data['dfs_path'])
+            elif action == 'traverse_directory':
+                response = self.traverse_directory(request_data['dfs_path'])
+            elif action == 'batch':
+                # Several metadata operations in one round trip, answered in order
+                response = [self.handle_request(sub_request) for sub_request in request_data['requests']]
+            else:
+                response = 'Invalid action'
+        except Exception as e:
+            response = f"Error processing request: {e}"
 
         if response is None:
             response = 'Error: No valid response'
 
-        client_socket.sendall(str(response).encode())
-        client_socket.close()
+        return response
+
+    def owns_block(self, block_id):
+        return block_id >> BLOCK_POOL_BITS == self.namespace_id
+
+    def process_heartbeat(self, request_data):
+        # Record liveness and apply the block report carried by the heartbeat.
+        # The response hands back any commands queued for this DataNode.
+        data_node_id = request_data['data_node_id']
+        for key in ('full_report', 'blocks_added', 'blocks_removed'):
+            if key in request_data:
+                request_data[key] = [block_id for block_id in request_data[key] if self.owns_block(block_id)]
+        with self.lock:
+            data_node_info = self.data_nodes.get(data_node_id)
+            if data_node_info is None:
+                # Unknown node, e.g. after a NameNode restart: it must register again
+                return {'registered': False, 'commands': []}
+
+            revived = data_node_info['status'] != 'active'
+            data_node_info['status'] = 'active'
+            self.update_data_node_stats(data_node_info, request_data)
+
+            orphans = []
+            if 'full_report' in request_data:
+                orphans.extend(self.process_full_report(data_node_id, request_data['full_report']))
+            for block_id in request_data.get('blocks_added', ()):
+                if not self.add_replica(block_id, data_node_id):
+                    orphans.append(block_id)
+            for block_id in request_data.get('blocks_removed', ()):
+                self.remove_replica(block_id, data_node_id)
+
+            # Replicas of blocks that no file references any more can be deleted
+            if orphans:
+                self.queue_command(data_node_id, {'action': 'delete_blocks', 'block_ids': orphans})
+            commands = self.pending_commands.pop(data_node_id, [])
+
+        self.heartbeat_monitor.heartbeat(data_node_id)
+        if revived:
+            logging.info(f"DataNode {data_node_id} is active again.")
+        return {'registered': True, 'commands': commands}
+
+    def process_full_report(self, data_node_id, reported_block_ids):
+        # Reconcile everything the NameNode believes a DataNode holds with what it reported.
+        # Returns the reported blocks the NameNode does not know about.
+        reported = set(reported_block_ids)
+        for block_id in self.data_node_blocks.get(data_node_id, set()) - reported:
+            self.remove_replica(block_id, data_node_id)
+        orphans = [block_id for block_id in reported if not self.add_replica(block_id, data_node_id)]
+
+        # A restarted DataNode has lost its cache, so pin its blocks again
+        pinned = self.pinned_blocks & self.data_node_blocks.get(data_node_id, set())
+        if pinned:
+            self.queue_command(data_node_id, {'action': 'cache_blocks', 'block_ids': list(pinned)})
+        return orphans
+
+    def add_replica(self, block_id, data_node_id):
+        # Returns False if the block is unknown
+        block_info = self.blocks.get(block_id)
+        if block_info is None:
+            return False
+        if data_node_id not in block_info['data_node_ids']:
+            block_info['data_node_ids'].append(data_node_id)
+            if block_id in self.pinned_blocks:
+                self.queue_command(data_node_id, {'action': 'cache_blocks', 'block_ids': [block_id]})
+        self.data_node_blocks.setdefault(data_node_id, set()).add(block_id)
+        return True
+
+    def remove_replica(self, block_id, data_node_id):
+        block_info = self.blocks.get(block_id)
+        if block_info is not None and data_node_id in block_info['data_node_ids']:
+            block_info['data_node_ids'].remove(data_node_id)
+            self.replication_monitor.enqueue([block_id])
+        self.data_node_blocks.get(data_node_id, set()).discard(block_id)
+
+    def release_block(self, block_id):
+        # Drop one file reference to a block, and the block once nothing refers to it
+        block_info = self.blocks.get(block_id)
+        if block_info is not None:
+            block_info['refs'] = block_info.get('refs', 1) - 1
+            if block_info['refs'] <= 0:
+                self.drop_block(block_id)
+
+    def release_file(self, file_record):
+        # Drop a file's references to its blocks. A packed file's bytes also stop
+        # counting as live in its container, which tells the compactor what to repack.
+        if 'container_offset' in file_record.attributes:
+            for block_id in file_record.blocks:
+                if block_id in self.blocks:
+                    self.blocks[block_id]['live'] -= file_record.size
+        for block_id in file_record.blocks:
+            self.release_block(block_id)
+
+    def drop_block(self, block_id):
+        # Forget a block entirely, e.g. when the file that owned it is replaced, and
+        # tell the DataNodes holding it to delete their replicas
+        block_info = self.blocks.pop(block_id, None)
+        self.pinned_blocks.discard(block_id)
+        if block_info is not None:
+            if not block_info['complete']:
+                self.lease_monitor.remove_block(block_info['dfs_path'], block_id)
+            if block_info.get('hash') and self.block_hashes.get(block_info['hash']) == block_id:
+                del self.block_hashes[block_info['hash']]
+            for data_node_id in block_info['data_node_ids']:
+                self.data_node_blocks.get(data_node_id, set()).discard(block_id)
+                self.queue_command(data_node_id, {'action': 'delete_blocks', 'block_ids': [block_id]})
+
+    def queue_command(self, data_node_id, command):
+        # Block deletions queued back to back, e.g. for a deleted directory, go out as one command
+        commands = self.pending_commands.setdefault(data_node_id, [])
+        if commands and command['action'] == 'delete_blocks' and commands[-1]['action'] == 'delete_blocks':
+            commands[-1]['block_ids'].extend(command['block_ids'])
+        else:
+            commands.append(command)
+
+    def mark_data_node_dead(self, data_node_id):
+        # Called by the heartbeat monitor once a DataNode's deadline passes
+        with self.lock:
+            data_node_info = self.data_nodes.get(data_node_id)
+            if data_node_info is None:
+                return
+            data_node_info['status'] = 'dead'
+            lost_blocks = self.data_node_blocks.get(data_node_id, set())
+            self.replication_monitor.enqueue(lost_blocks)
+
+        logging.warning(f"DataNode {data_node_id} is inactive, {len(lost_blocks)} blocks queued for re-replication.")
+
+    def serve_client(self, client_socket, send_lock):
+        # Runs on a worker thread; frees the in-flight slot taken by the accept loop
+        self.requests_in_flight.inc()
+        try:
+            self.handle_client(client_socket, send_lock)
+        except Exception as e:
+            # The connection is already re-armed, so the accept loop notices if it died
+            logging.error(f"Error serving client: {e}")
+        finally:
+            self.requests_in_flight.dec()
+            self.in_flight.release()
+
+    def rearm_client(self, client_socket, send_lock):
+        # Ask the accept loop to watch this connection for its next request
+        self.rearm_queue.put((client_socket, send_lock))
+        self.wakeup_writer.send(b'\0')
 
     def register_data_node(self, registration_data):
         # Implement logic to register a DataNode with the NameNode
@@ -85,261 +422,646 @@ class NameNode:
         data_node_address = registration_data.get('data_node_address')
         data_node_port = registration_data.get('data_node_port')
 
-        # Example: Store DataNode information in the 'metadata' dictionary
-        self.metadata[data_node_id] = {
-            'address': data_node_address,
-            'port': data_node_port,
-            'status': 'active'
-        }
+        # Store DataNode information in the 'data_nodes' dictionary
+        with self.lock:
+            self.data_nodes[data_node_id] = {
+                'address': data_node_address,
+                'port': data_node_port,
+                'rack': registration_data.get('rack', DEFAULT_RACK),
+                'status': 'active'
+            }
+            self.update_data_node_stats(self.data_nodes[data_node_id], registration_data)
+        self.heartbeat_monitor.heartbeat(data_node_id)
 
         logging.info(f"DataNode {data_node_id} registered with NameNode")
 
+    def update_data_node_stats(self, data_node_info, report):
+        # Storage and load figures the placement policy works from. The reported
+        # transfer count now covers the writes scheduled before this report was sent.
+        for key in ('capacity', 'remaining', 'active_transfers', 'cache'):
+            if key in report:
+                data_node_info[key] = report[key]
+        data_node_info['scheduled_transfers'] = 0
+
+        # Transfer rates from the byte counters since the previous report
+        now = time.monotonic()
+        elapsed = now - data_node_info.get('reported_at', now)
+        for key, rate_key in (('bytes_sent', 'send_rate'), ('bytes_received', 'receive_rate')):
+            if key in report:
+                previous = data_node_info.get(key)
+                if previous is not None and elapsed > 0 and report[key] >= previous:
+                    data_node_info[rate_key] = (report[key] - previous) / elapsed
+                data_node_info[key] = report[key]
+        data_node_info['reported_at'] = now
+
     def create_directory(self, parent_path, directory_name):
-        # Implement the logic to create a directory
-        directory_path = os.path.join(parent_path, directory_name)
+        # Create the directory and any missing parents, like mkdir -p
+        directory_path = join_path(parent_path, directory_name)
+        with self.lock:
+            try:
+                txid = self.log_edit(('mkdirs', directory_path))
+            except NotADirectoryError as e:
+                return f"Error creating directory '{directory_name}': {e}"
+        self.edit_log.sync(txid)
+        return f"Directory '{directory_name}' created successfully."
+
+    def allocate_block(self, dfs_path, block_size=DEFAULT_BLOCK_SIZE):
+        # Hand out a new block id and the DataNodes the client should write it to.
+        # The NameNode never sees the block data itself.
+        data_nodes = dict(self.get_data_nodes())
+        if not data_nodes:
+            return "Error: No available data nodes."
+
+        if len(data_nodes) < REPLICATION_FACTOR:
+            logging.warning("Insufficient data nodes for replication.")
+
+        with self.lock:
+            targets = self.placement_policy.choose_targets(REPLICATION_FACTOR, data_nodes, block_size=block_size)
+            if not targets:
+                return "Error: No data node has room for the block."
+            for data_node_id in targets:
+                data_nodes[data_node_id]['scheduled_transfers'] = data_nodes[data_node_id].get('scheduled_transfers', 0) + 1
+
+            block_id = self.next_block_id
+            txid = self.log_edit(('allocate_block', block_id, dfs_path, targets))
+        self.edit_log.sync(txid)
+
+        logging.info(f"Block {block_id} of {dfs_path} allocated on DataNodes {targets}")
+        return {
+            'block_id': block_id,
+            'data_nodes': [self.data_node_location(node_id, data_nodes[node_id]) for node_id in targets],
+        }
+
+    def allocate_block_group(self, dfs_path, policy, cell_size):
+        # Allocate the k data and m parity cells of one erasure-coded block group, each
+        # on a different DataNode (and failure domain where possible)
         try:
-            os.makedirs(directory_path)
-            return f"Directory '{directory_name}' created successfully."
-        except OSError as e:
-            return f"Error creating directory '{directory_name}': {e}"
-
-    def upload_file(self, local_path, dfs_path):
-        # Step 1: File Splitting
-        block_size = 1024  # Choose an appropriate block size
-        block_count = int((os.path.getsize(local_path) + block_size - 1) / block_size)
-
-        # Step 2: Block Creation
-        block_ids = list(range(block_count))
-
-        # Step 3: Uploading Blocks
-        for block_id in block_ids:
-            with open(local_path, "rb") as file:
-                file.seek(block_id * block_size)
-                block_data = file.read(block_size)
-
-            # Step 3: Uploading Blocks
-            data_nodes = self.get_data_nodes()
-
-            if not data_nodes:
-                return "Error: No available data nodes."
-
-            data_node_id = block_id % len(data_nodes)
-            data_node_address = data_nodes[data_node_id][1]
-
-            # Upload block to the DataNode
-            self.store_block(block_id, block_data, dfs_path, data_node_id)
-
-            # Step 4: Replication
-            replication_factor = 2
-            self.replicate_block(block_id, dfs_path, replication_factor, data_node_id)
-
-            # Step 5: Metadata Update
-            block_size = 1024  # Same as the block size chosen earlier
-            file_metadata = {
-                'size': os.path.getsize(local_path),
-                'parent_folder': os.path.dirname(dfs_path),
-                'block_size': block_size,
-                'data_nodes': [node[0] for node in data_nodes],
-            }
-            self.store_file_metadata(local_path, dfs_path, file_metadata)
+            data_cells, parity_cells = parse_policy(policy)
+        except (ValueError, TypeError):
+            return f"Error: '{policy}' is not an erasure coding policy."
+        data_nodes = dict(self.get_data_nodes())
+
+        with self.lock:
+            targets = self.placement_policy.choose_targets(data_cells + parity_cells, data_nodes, block_size=cell_size)
+            if len(targets) < data_cells + parity_cells:
+                return f"Error: {policy} needs {data_cells + parity_cells} DataNodes with room, found {len(targets)}."
+            for data_node_id in targets:
+                data_nodes[data_node_id]['scheduled_transfers'] = data_nodes[data_node_id].get('scheduled_transfers', 0) + 1
 
-            # Step 6: Store block information in 'blocks' dictionary
-            self.store_file_blocks(local_path, dfs_path, block_id, data_node_id)
+            block_ids = []
+            for data_node_id in targets:
+                block_ids.append(self.next_block_id)
+                txid = self.log_edit(('allocate_block', self.next_block_id, dfs_path, [data_node_id]))
+        self.edit_log.sync(txid)
 
-        return f"File '{local_path}' uploaded to DFS path '{dfs_path}' successfully."
+        logging.info(f"Block group {block_ids} of {dfs_path} allocated on DataNodes {targets}")
+        return {
+            'block_ids': block_ids,
+            'data_nodes': [self.data_node_location(node_id, data_nodes[node_id]) for node_id in targets],
+        }
+
+    def complete_file(self, dfs_path, size, block_size, blocks, attributes=None, expected_blocks=None):
+        # Called by the client once every block has been written to its DataNodes.
+        # 'blocks' lists {'block_id', 'size', 'data_node_ids'} in file order, with the
+        # content 'hash' for deduplicated blocks; those may also be blocks that were
+        # already stored for another file and were found with find_block.
+        # With 'expected_blocks' the file is only replaced if it still has exactly those
+        # blocks, so a background rewrite never clobbers a newer upload.
+        with self.lock:
+            file_blocks = []
+            for block in blocks:
+                block_info = self.blocks.get(block['block_id'])
+                if block_info is not None and block_info['complete']:
+                    if not block.get('hash') or block_info.get('hash') != block['hash']:
+                        return f"Error: Block {block['block_id']} was not allocated for '{dfs_path}'."
+                    # Shared with another file; the NameNode knows best where it is
+                    file_blocks.append((block['block_id'], block_info['size'], list(block_info['data_node_ids']),
+                                        block['hash']))
+                    continue
+                if block_info is None or block_info['dfs_path'] != dfs_path:
+                    if block.get('hash'):
+                        return f"Error: Block {block['block_id']} is no longer stored, upload '{dfs_path}' again."
+                    return f"Error: Block {block['block_id']} was not allocated for '{dfs_path}'."
+                file_block = (block['block_id'], block['size'], block['data_node_ids'])
+                file_blocks.append(file_block + (block['hash'],) if block.get('hash') else file_block)
+            if expected_blocks is not None:
+                current = self.namespace.get_file(dfs_path)
+                if current is None or current.blocks != list(expected_blocks):
+                    return f"Error: '{dfs_path}' changed while it was being rewritten."
 
-    def download_file(self, dfs_path, local_path):
-        # Step 1: Check Metadata
-        file_metadata = self.metadata.get(dfs_path)
-        if file_metadata:
-            print(f"Step 1: Metadata found for file '{dfs_path}'")
+            edit = ('complete_file', dfs_path, size, block_size, file_blocks, attributes or {})
             try:
-                # Step 2: Calculate Block Count
-                block_count = math.ceil(file_metadata['size'] / file_metadata['block_size'])
-                block_ids = list(range(block_count))
-                print(f"Step 2: Calculated block count: {block_count}")
+                txid = self.log_edit(edit)
+            except OSError as e:
+                return f"Error: Cannot create file '{dfs_path}': {e}"
+        self.edit_log.sync(txid)
 
-                # Step 3: Data Block Retrieval
-                data_nodes = self.get_data_nodes()
-                print(f"Step 3: Total reachable data nodes: {len(data_nodes)}")
+        logging.info(f"Metadata for {dfs_path} stored in the namespace")
+        return f"File uploaded to DFS path '{dfs_path}' successfully."
 
-                for block_id in block_ids:
-                    data_node_id = block_id % len(data_nodes)
-                    data_node_address = data_nodes[data_node_id][1]
+    def complete_packed_files(self, block, files):
+        # Record the small files a client packed into one container block. 'block' is
+        # {'block_id', 'size', 'data_node_ids'}, 'files' lists {'dfs_path', 'offset',
+        # 'length'} for each file in it. A file given with 'expected_blocks' is only
+        # replaced if it still has exactly those blocks, as in complete_file; the
+        # compactor relies on that to never overwrite a newer upload. Files whose path
+        # cannot hold a file are rejected up front, so the edit applies as a whole.
+        # Returns {'block_id', 'packed', 'skipped', 'rejected'} with the paths that were
+        # skipped because they changed and {path: reason} for the rejected ones.
+        with self.lock:
+            block_info = self.blocks.get(block['block_id'])
+            if block_info is None or block_info['complete']:
+                return f"Error: Block {block['block_id']} was not allocated as a container."
 
-                    # Step 4: Loop Over Blocks
-                    print(f"Step 4: Retrieving Block {block_id} from DataNode {data_node_id}")
+            packed, skipped, rejected = [], [], {}
+            for file in files:
+                try:
+                    self.namespace.check_file_path(file['dfs_path'])
+                except OSError as e:
+                    rejected[file['dfs_path']] = str(e)
+                    continue
+                expected_blocks = file.get('expected_blocks')
+                if expected_blocks is not None:
+                    current = self.namespace.get_file(file['dfs_path'])
+                    if current is None or current.blocks != list(expected_blocks):
+                        skipped.append(file['dfs_path'])
+                        continue
+                packed.append((file['dfs_path'], file['offset'], file['length']))
+            if packed:
+                edit = ('complete_packed', (block['block_id'], block['size'], block['data_node_ids']), packed)
+            else:
+                # Nothing refers to the container, its replicas can go. Logged, so that
+                # replaying its allocation does not bring it back.
+                edit = ('abandon_blocks', [block['block_id']])
+            try:
+                txid = self.log_edit(edit)
+            except OSError as e:
+                return f"Error: Cannot create packed files: {e}"
+        self.edit_log.sync(txid)
+        if not packed and not rejected:
+            return f"Error: No file was packed into block {block['block_id']}, all of them changed."
 
-                    # Retrieve block from the DataNode
-                    block_data = self.read_block(block_id, dfs_path, data_node_id)
+        logging.info(f"{len(packed)} files packed into block {block['block_id']}")
+        return {'block_id': block['block_id'], 'packed': len(packed), 'skipped': skipped, 'rejected': rejected}
 
-                    # Step 5: Write to Local File
-                    with open(local_path, "ab") as file:
-                        file.write(block_data)
+    def list_compactable_containers(self, threshold, limit):
+        # Container blocks whose live bytes have dropped below 'threshold' of their size,
+        # as [(block id, [paths of the files still in it])]. Finding the files takes a
+        # walk of the namespace, which is only done when some container qualifies.
+        with self.lock:
+            sparse = [block_id for block_id, block_info in self.blocks.items()
+                      if 'live' in block_info and block_info['live'] < threshold * block_info['size']][:limit]
+            if not sparse:
+                return []
+            members = {block_id: [] for block_id in sparse}
+            for path, file_record in self.namespace.iter_files('/'):
+                if 'container_offset' in file_record.attributes and file_record.blocks[0] in members:
+                    members[file_record.blocks[0]].append(path)
+        return list(members.items())
 
-                    print(f"Step 5: Appended Block {block_id} data to local file")
+    def log_edit(self, edit):
+        # Apply a mutation and append it to the edit log; called with the lock held.
+        # Nothing is logged if applying it fails. Callers sync the returned txid after
+        # releasing the lock so concurrent mutations share one fsync.
+        self.apply_edit(edit)
+        txid = self.edit_log.log_edit(edit)
 
-                # Step 6: Logging
-                logging.info(f"File '{dfs_path}' downloaded to local path '{local_path}' successfully.")
-                print("Download process completed successfully.")
-            except Exception as e:
-                traceback.print_exc()
-                logging.error(f"Error downloading file '{dfs_path}': {e}")
-                print(f"Error: {e}")
-        else:
-            logging.error(f"File '{dfs_path}' not found in DFS.")
-            print(f"Error: File '{dfs_path}' not found in DFS.")
+        changed_paths = self.changed_paths(edit)
+        if changed_paths:
+            if len(self.recent_changes) >= NAME_NODE_CHANGE_LOG_SIZE:
+                self.changes_floor = self.recent_changes.popleft()[0]
+            self.recent_changes.append((txid, changed_paths))
+        return txid
 
-    def delete_directory(self, directory_path):
-        # Implement logic to delete a directory and its contents
-        try:
-            os.rmdir(directory_path)
-            return f"Directory '{directory_path}' deleted successfully."
-        except OSError as e:
-            return f"Error deleting directory '{directory_path}': {e}"
+    def changed_paths(self, edit):
+        # Namespace paths an edit changes, for client cache invalidation
+        if edit[0] in ('complete_file', 'mkdirs', 'set_storage_policy', 'delete'):
+            return [edit[1]]
+        if edit[0] == 'rename':
+            return [edit[1], edit[2]]
+        if edit[0] == 'complete_packed':
+            return [file[0] for file in edit[2]]
+        return []
 
-    def move_file(self, source_path, destination_path):
-        # Implement logic to move a file to another directory
+    def pin_file(self, dfs_path, pinned=True):
+        # Ask the DataNodes holding a file's blocks to keep them in memory, or stop
+        # keeping them there. Takes effect with each DataNode's next heartbeat.
+        action = 'cache_blocks' if pinned else 'uncache_blocks'
+        with self.lock:
+            file_record = self.namespace.get_file(dfs_path)
+            if file_record is None:
+                return f"Error: File '{dfs_path}' not found"
+
+            per_data_node = {}
+            for block_id in file_record.blocks:
+                if pinned:
+                    self.pinned_blocks.add(block_id)
+                else:
+                    self.pinned_blocks.discard(block_id)
+                for data_node_id in self.blocks[block_id]['data_node_ids']:
+                    per_data_node.setdefault(data_node_id, []).append(block_id)
+            for data_node_id, block_ids in per_data_node.items():
+                self.queue_command(data_node_id, {'action': action, 'block_ids': block_ids})
+
+        return f"File '{dfs_path}' {'pinned in' if pinned else 'unpinned from'} DataNode memory."
+
+    def find_block(self, content_hash):
+        # A stored block with this SHA-256, as {'block_id', 'size', 'data_node_ids'}, or
+        # {} if there is none. Lets a client refer to data that is already stored
+        # instead of sending it again.
+        with self.lock:
+            block_id = self.block_hashes.get(content_hash)
+            block_info = self.blocks.get(block_id)
+            if block_info is None or not block_info['data_node_ids']:
+                return {}
+            return {
+                'block_id': block_id,
+                'size': block_info['size'],
+                'data_node_ids': list(block_info['data_node_ids']),
+            }
+
+    def set_storage_policy(self, dfs_path, policy):
+        # Applies to files written below 'dfs_path' from now on; existing replicated
+        # files there are re-encoded by the background converter (ec_converter.py)
         try:
-            os.rename(source_path, destination_path)
-            return f"File '{source_path}' moved to '{destination_path}' successfully."
-        except FileNotFoundError:
-            return f"Error: File '{source_path}' not found."
-        except OSError as e:
-            return f"Error moving file '{source_path}' to '{destination_path}': {e}"
+            parse_policy(policy)
+        except ValueError as e:
+            return f"Error: {e}"
+        with self.lock:
+            try:
+                txid = self.log_edit(('set_storage_policy', dfs_path, policy))
+            except NotADirectoryError as e:
+                return f"Error: {e}"
+        self.edit_log.sync(txid)
+        return f"Storage policy of '{dfs_path}' set to {policy}."
 
-    def get_data_nodes(self):
-        # Implement logic to retrieve available and reachable data nodes
-        reachable_data_nodes = [node for node in self.metadata.items() if 'status' in node[1] and node[1]['status'] == 'active']
-        if not reachable_data_nodes:
-            print("No reachable data nodes.")
+    def list_convertible_files(self, limit):
+        # Replicated files sitting below a directory with an erasure coding policy,
+        # as [(path, policy)]
+        convertible = []
+        with self.lock:
+            for path, file_record in self.namespace.iter_files('/'):
+                if file_record.size == 0 or file_record.attributes.get('storage_policy', REPLICATED) != REPLICATED:
+                    continue
+                if 'container_offset' in file_record.attributes:
+                    # Packed small files stay in their replicated containers
+                    continue
+                policy = self.namespace.storage_policy(path, REPLICATED)
+                if policy != REPLICATED:
+                    convertible.append((path, policy))
+                    if len(convertible) >= limit:
+                        break
+        return convertible
+
+    def get_changes(self, since):
+        # Paths changed after txid 'since', and how long the client may trust its cache
+        # before asking again. 'paths' is None if some of those changes are forgotten
+        # (or the client has no txid yet) and the client must drop its whole cache.
+        with self.lock:
+            txid = self.edit_log.last_txid
+            if since is None or since < self.changes_floor:
+                paths = None
+            else:
+                paths = []
+                for change_txid, changed_paths in reversed(self.recent_changes):
+                    if change_txid <= since:
+                        break
+                    paths.extend(changed_paths)
+        return {'txid': txid, 'paths': paths, 'lease': CLIENT_CACHE_LEASE}
+
+    def apply_edit(self, edit):
+        # Apply one namespace mutation to the in-memory state, live or during log replay
+        action = edit[0]
+        if action == 'allocate_block':
+            _, block_id, dfs_path, data_node_ids = edit
+            self.blocks[block_id] = {
+                'dfs_path': dfs_path,
+                'size': 0,
+                'data_node_ids': list(data_node_ids),
+                'complete': False,
+            }
+            self.lease_monitor.add_block(dfs_path, block_id)
+            self.next_block_id = max(self.next_block_id, block_id + 1)
+        elif action == 'complete_file':
+            _, dfs_path, size, block_size, blocks, attributes = edit
+            data_node_ids = []
+            for block in blocks:
+                for data_node_id in block[2]:
+                    if data_node_id not in data_node_ids:
+                        data_node_ids.append(data_node_id)
+
+            file_record = FileRecord(size, block_size, [block[0] for block in blocks], data_node_ids, attributes)
+            replaced = self.store_file_metadata(dfs_path, file_record)
+
+            # Each cell of an erasure-coded file is stored once; parity covers its loss
+            replicas = 1 if attributes.get('storage_policy', REPLICATED) != REPLICATED else REPLICATION_FACTOR
+            new_blocks = []
+            for block in blocks:
+                # Blocks have (id, size, data node ids) and, if deduplicated, a content hash
+                block_id, block_size_used, block_data_node_ids = block[:3]
+                content_hash = block[3] if len(block) > 3 else None
+                block_info = self.blocks.get(block_id)
+                if block_info is not None and block_info['complete']:
+                    # Already stored for another file, or earlier in this one
+                    block_info['refs'] = block_info.get('refs', 1) + 1
+                    if 'container_offset' in attributes:
+                        block_info['live'] += size
+                    continue
+                if block_info is not None:
+                    self.lease_monitor.remove_block(block_info['dfs_path'], block_id)
+
+                self.blocks[block_id] = {
+                    'dfs_path': dfs_path,
+                    'size': block_size_used,
+                    'data_node_ids': [],
+                    'complete': True,
+                    'replicas': replicas,
+                    'refs': 1,
+                }
+                if content_hash:
+                    self.blocks[block_id]['hash'] = content_hash
+                    self.block_hashes[content_hash] = block_id
+                if 'container_offset' in attributes:
+                    # Bytes of the container still used by packed files
+                    self.blocks[block_id]['live'] = size
+                for data_node_id in block_data_node_ids:
+                    self.add_replica(block_id, data_node_id)
+                self.next_block_id = max(self.next_block_id, block_id + 1)
+                new_blocks.append(block)
+
+            # The replaced file's blocks go once nothing else refers to them. This comes
+            # after the new references, so blocks the new version shares are kept.
+            if replaced is not None:
+                self.release_file(replaced)
+
+            # Blocks written with fewer replicas than wanted get topped up in the background
+            self.replication_monitor.enqueue([block[0] for block in new_blocks if len(block[2]) < replicas])
+        elif action == 'complete_packed':
+            # Each packed file is a one-block file referring to its byte range of the container
+            _, block, files = edit
+            for dfs_path, offset, length in files:
+                self.apply_edit(('complete_file', dfs_path, length, block[1], [block], {'container_offset': offset}))
+        elif action == 'abandon_blocks':
+            # Allocated blocks of an upload that never completed
+            for block_id in edit[1]:
+                block_info = self.blocks.get(block_id)
+                if block_info is not None and not block_info['complete']:
+                    self.drop_block(block_id)
+        elif action == 'mkdirs':
+            self.namespace.mkdirs(edit[1])
+        elif action == 'set_storage_policy':
+            _, dfs_path, policy = edit
+            self.namespace.mkdirs(dfs_path).storage_policy = policy
+        elif action == 'rename':
+            self.namespace.rename(edit[1], edit[2])
+        elif action == 'delete':
+            self.deletion_monitor.enqueue(self.namespace.detach(edit[1]))
         else:
-            print(f"Total reachable data nodes: {len(reachable_data_nodes)}")
+            raise ValueError(f"Unknown edit {action}")
 
-        return reachable_data_nodes
+    def load_namespace(self):
+        # Load the newest fsimage, then replay every logged edit after it.
+        # Returns the txid the image was taken at.
+        image_txid = 0
+        image = latest_image(self.metadata_directory)
+        if image:
+            image_txid, self.next_block_id, entries = load_image(image)
+            for entry in entries:
+                if entry[0] == 'D':
+                    self.apply_edit(('mkdirs', entry[1]))
+                    if entry[2].get('storage_policy'):
+                        self.apply_edit(('set_storage_policy', entry[1], entry[2]['storage_policy']))
+                else:
+                    _, path, size, block_size, attributes, blocks = entry
+                    self.apply_edit(('complete_file', path, size, block_size, blocks, attributes))
 
-    def store_block(self, block_id, block_data, dfs_path, data_node_id):
-        # Implement logic to store a block on a DataNode
-        self.blocks[(dfs_path, block_id)] = {
-            'data': block_data,
-            'data_node_id': data_node_id
-        }
+        self.last_loaded_txid = image_txid
+        segments = list_segments(self.metadata_directory)
+        for index, (first_txid, path) in enumerate(segments):
+            for txid, edit in read_edits(path, repair=index == len(segments) - 1):
+                if txid > self.last_loaded_txid:
+                    self.apply_edit(edit)
+                    self.last_loaded_txid = txid
 
-        logging.info(f"Block {block_id} stored on DataNode {data_node_id}")
+        logging.info(f"Loaded namespace at txid {self.last_loaded_txid}: "
+                     f"{self.namespace.file_count} files, {len(self.blocks)} blocks")
+        return image_txid
 
-    def replicate_block(self, block_id, dfs_path, replication_factor, source_data_node_id):
-        # Implement logic to replicate a block to other DataNodes
-        data_nodes = self.get_data_nodes()
-        if len(data_nodes) < replication_factor:
-            logging.error("Insufficient data nodes for replication.")
-            return
+    def checkpoint(self):
+        # Write the current namespace as a new fsimage and drop the edits it covers.
+        # Only the snapshot of the tree is taken under the lock; encoding and writing
+        # the image happen outside it.
+        with self.lock:
+            txid = self.edit_log.roll()
+            next_block_id = self.next_block_id
+            entries = []
+            for path, node in self.namespace.walk('/'):
+                if isinstance(node, DirectoryNode):
+                    attributes = {'storage_policy': node.storage_policy} if node.storage_policy else {}
+                    entries.append(('D', path, attributes))
+                else:
+                    blocks = []
+                    for block_id in node.blocks:
+                        block_info = self.blocks[block_id]
+                        block = (block_id, block_info['size'], list(block_info['data_node_ids']))
+                        blocks.append(block + (block_info['hash'],) if block_info.get('hash') else block)
+                    entries.append(('F', path, node.size, node.block_size, dict(node.attributes), blocks))
 
-        # Choose replication_factor - 1 random data nodes (excluding the source)
-        target_data_nodes = [node for node in data_nodes if node[0] != source_data_node_id]
-        target_data_nodes = random.sample(target_data_nodes, min(replication_factor - 1, len(target_data_nodes)))
+        save_image(self.metadata_directory, txid, next_block_id, entries)
+        purge_images(self.metadata_directory, txid)
+        self.edit_log.purge(txid)
+        self.checkpoint_txid = txid
+        logging.info(f"Checkpoint written at txid {txid} ({len(entries)} entries)")
 
-        # Retrieve block data from the source DataNode
-        source_block_data = self.blocks.get((dfs_path, block_id), {}).get('data', b'')
+    def run_checkpointer(self, interval=CHECKPOINT_INTERVAL, max_edits=CHECKPOINT_EDITS):
+        last_checkpoint = time.time()
+        while True:
+            time.sleep(1)
+            pending_edits = self.edit_log.last_txid - self.checkpoint_txid
+            if pending_edits and (pending_edits >= max_edits or time.time() - last_checkpoint >= interval):
+                try:
+                    self.checkpoint()
+                except Exception as e:
+                    logging.error(f"Checkpoint failed: {e}")
+                last_checkpoint = time.time()
 
-        # Replicate the block to the selected target DataNodes
-        for target_data_node in target_data_nodes:
-            target_data_node_id = target_data_node[0]
-            self.store_block(block_id, source_block_data, dfs_path, target_data_node_id)
+    def get_block_locations(self, dfs_path):
+        # Everything a client needs to read a file straight from the DataNodes
+        with self.lock:
+            file_record = self.namespace.get_file(dfs_path)
+            if file_record is None:
+                logging.error(f"File '{dfs_path}' not found in DFS.")
+                return f"Error: File '{dfs_path}' not found in DFS."
 
-        logging.info(f"Block {block_id} replicated to {len(target_data_nodes)} DataNodes")
+            blocks = []
+            for block_id in file_record.blocks:
+                block_info = self.blocks[block_id]
+                # Live replicas first so clients do not start with a dead DataNode
+                data_node_ids = sorted(block_info['data_node_ids'],
+                                       key=lambda node_id: self.data_nodes.get(node_id, {}).get('status') != 'active')
+                blocks.append({
+                    'block_id': block_id,
+                    'size': block_info['size'],
+                    'data_nodes': [self.data_node_location(node_id, self.data_nodes.get(node_id, {}))
+                                   for node_id in data_node_ids],
+                    'live_replicas': sum(self.data_nodes.get(node_id, {}).get('status') == 'active'
+                                         for node_id in data_node_ids),
+                })
 
-    def store_file_metadata(self, local_path, dfs_path, file_metadata):
-        # Implement logic to store file metadata in the 'metadata' dictionary
-        self.metadata[dfs_path] = file_metadata
+            return {
+                'size': file_record.size,
+                'block_size': file_record.block_size,
+                'attributes': dict(file_record.attributes),
+                'blocks': blocks,
+            }
 
-        logging.info(f"Metadata for {dfs_path} stored in the 'metadata' dictionary")
-        print(f"Contents of 'metadata' dictionary after storing metadata for {dfs_path}: {self.metadata}")
+    def delete_directory(self, directory_path, recursive=True):
+        # Delete a directory with everything below it, or a single file. Returns as soon
+        # as the path is unlinked; its blocks are released in the background (deletion.py).
+        with self.lock:
+            node = self.namespace.lookup(directory_path)
+            if node is None:
+                return f"Error: '{directory_path}' not found."
+            if not recursive and isinstance(node, DirectoryNode) and node.children:
+                return f"Error deleting directory '{directory_path}': directory is not empty"
+            try:
+                txid = self.log_edit(('delete', directory_path))
+            except OSError as e:
+                return f"Error deleting directory '{directory_path}': {e}"
+        self.edit_log.sync(txid)
+        return f"Directory '{directory_path}' deleted successfully."
 
-    def store_file_blocks(self, local_path, dfs_path, block_id, data_node_id):
-        # Implement logic to store block information in 'blocks' dictionary
-        self.blocks[(dfs_path, block_id)]["data_node_id"] = data_node_id
+    def move_file(self, source_path, destination_path):
+        # Rename a file or directory. Moving onto an existing directory moves the source
+        # into it under its own name, like mv.
+        with self.lock:
+            source_components = split_path(source_path)
+            if source_components and isinstance(self.namespace.lookup(destination_path), DirectoryNode):
+                destination_path = join_path(destination_path, source_components[-1])
+            try:
+                txid = self.log_edit(('rename', source_path, destination_path))
+            except FileNotFoundError:
+                return f"Error: File '{source_path}' not found."
+            except (OSError, ValueError) as e:
+                return f"Error moving file '{source_path}' to '{destination_path}': {e}"
+        self.edit_log.sync(txid)
+        return f"File '{source_path}' moved to '{destination_path}' successfully."
 
-        logging.info(f"Block {block_id} information stored in the 'blocks' dictionary")
+    def get_data_nodes(self):
+        # Implement logic to retrieve available and reachable data nodes
+        with self.lock:
+            reachable_data_nodes = [node for node in self.data_nodes.items() if node[1]['status'] == 'active']
+        if not reachable_data_nodes:
+            logging.warning("No reachable data nodes.")
+        else:
+            logging.debug(f"Total reachable data nodes: {len(reachable_data_nodes)}")
 
-    
-    def read_block(self, block_id, dfs_path, data_node_id):
-        
-        # Implement the actual logic to read a block from a DataNode
-        return self.blocks.get((dfs_path, block_id), {}).get('data', b'')
+        return reachable_data_nodes
+
+    def data_node_location(self, data_node_id, data_node_info):
+        return {
+            'data_node_id': data_node_id,
+            'address': data_node_info.get('address'),
+            'port': data_node_info.get('port'),
+        }
+
+    def store_file_metadata(self, dfs_path, file_record):
+        # Link the file into the namespace tree, returns the FileRecord it replaced
+        with self.lock:
+            return self.namespace.add_file(dfs_path, file_record)
 
     def get_status(self):
-        # Implement logic to retrieve and return the status of the DFS
-        
-        return "DFS Status: OK"
+        # Cluster summary with per-DataNode figures and a snapshot of every metric
+        with self.lock:
+            data_nodes = {}
+            for data_node_id, info in self.data_nodes.items():
+                data_nodes[data_node_id] = {
+                    'status': info['status'],
+                    'rack': info.get('rack', DEFAULT_RACK),
+                    'blocks': len(self.data_node_blocks.get(data_node_id, ())),
+                    'capacity': info.get('capacity'),
+                    'remaining': info.get('remaining'),
+                    'active_transfers': info.get('active_transfers', 0),
+                    'send_rate': info.get('send_rate', 0.0),
+                    'receive_rate': info.get('receive_rate', 0.0),
+                }
+            active = sum(1 for info in data_nodes.values() if info['status'] == 'active')
+            status = {
+                'status': 'OK' if active else 'NO_ACTIVE_DATA_NODES',
+                'namespace_id': self.namespace_id,
+                'blocks': len(self.blocks),
+                'replication_queue': len(self.replication_monitor.heap),
+                'pending_deletions': self.deletion_monitor.pending(),
+                'open_blocks': self.lease_monitor.pending(),
+                'data_nodes': data_nodes,
+            }
+        status['metrics'] = self.metrics.snapshot()
+        return status
 
     def list_directory_contents(self, dfs_path):
-        # Implement logic to list the contents of a directory in the DFS
-        directory_contents = []
-        for key, metadata in self.metadata.items():
-            if key.startswith(dfs_path) and key != dfs_path:
-                relative_path = key[len(dfs_path) + 1:]
-                components = relative_path.split(os.path.sep)
-                if len(components) == 1:
-                    # It's a file, not a subdirectory
-                    directory_contents.append(components[0])
-                else:
-                    # It's a subdirectory
-                    subdirectory = components[0]
-                    if subdirectory not in directory_contents:
-                        directory_contents.append(subdirectory)
-
-        return directory_contents
+        # Names of the files and subdirectories directly under 'dfs_path'
+        try:
+            with self.lock:
+                return self.namespace.list_directory(dfs_path)
+        except FileNotFoundError as e:
+            return f"Error: {e}"
 
     def traverse_directory(self, dfs_path):
-        # Implement logic to traverse the directory structure in the DFS
-        directory_structure = {}
-        for key, metadata in self.metadata.items():
-            if key.startswith(dfs_path) and key != dfs_path:
-                relative_path = key[len(dfs_path) + 1:]
-                components = relative_path.split(os.path.sep)
-                current_dict = directory_structure
-
-                for component in components[:-1]:
-                    current_dict = current_dict.setdefault(component, {})
-
-                current_dict[components[-1]] = {
-                    'size': metadata['size'],
-                    'block_size': metadata['block_size'],
-                    'data_nodes': metadata['data_nodes'],
-                }
+        # Nested view of every file and directory under 'dfs_path'
+        try:
+            with self.lock:
+                return self.namespace.traverse(dfs_path)
+        except FileNotFoundError as e:
+            return f"Error: {e}"
 
-        return directory_structure
+    def run(self, metrics_port=NAME_NODE_METRICS_PORT):
+        threading.Thread(target=self.run_checkpointer, daemon=True).start()
+        if metrics_port:
+            start_metrics_server(self.metrics, metrics_port)
+        self.heartbeat_monitor.start()
+        self.replication_monitor.start()
+        self.deletion_monitor.start()
+        self.lease_monitor.start()
 
-    def run(self):
         while True:
             try:
-                client_socket, _ = self.server_socket.accept()
-                self.handle_client(client_socket)
-                self.check_data_node_heartbeats()  # Check DataNode heartbeats after handling each client request
+                for key, _ in self.selector.select(timeout=1):
+                    if key.fileobj is self.server_socket:
+                        # New connection: wait until it has sent a request before using a worker
+                        client_socket, _ = self.server_socket.accept()
+                        client_socket.setblocking(True)
+                        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                        self.selector.register(client_socket, selectors.EVENT_READ, threading.Lock())
+                    elif key.fileobj is self.wakeup_reader:
+                        self.wakeup_reader.recv(4096)
+                        while not self.rearm_queue.empty():
+                            client_socket, send_lock = self.rearm_queue.get()
+                            if client_socket.fileno() != -1:
+                                self.selector.register(client_socket, selectors.EVENT_READ, send_lock)
+                    else:
+                        # Request ready: hand it to the worker pool, blocking here once
+                        # max_in_flight requests are already being served
+                        client_socket = key.fileobj
+                        self.selector.unregister(client_socket)
+                        self.in_flight.acquire()
+                        self.executor.submit(self.serve_client, client_socket, key.data)
             except KeyboardInterrupt:
                 print("Shutting down the NameNode.")
                 break
             except Exception as e:
                 logging.error(f"Error in run loop: {e}")
 
-    def check_data_node_heartbeats(self):
-        # Check and update the status of active DataNodes
-        current_time = time.time()
-        inactive_data_nodes = []
-
-        for data_node_id, last_heartbeat_time in self.active_data_nodes.items():
-            if current_time - last_heartbeat_time > 10:  # Adjust the threshold as needed
-                inactive_data_nodes.append(data_node_id)
-
-        # Handle inactive DataNodes (remove or mark them as inactive)
-        for data_node_id in inactive_data_nodes:
-            logging.warning(f"DataNode {data_node_id} is inactive.")
-            # You may implement further actions here, such as re-replicating blocks stored on the inactive DataNode.
-
-    def send_heartbeat(self, data_node_id):
-        # Update the last heartbeat time for the given DataNode
-        self.active_data_nodes[data_node_id] = time.time()
+        self.executor.shutdown(wait=False)
+        self.selector.close()
+        self.server_socket.close()
 
 if __name__ == "__main__":
-    namenode = NameNode()
-    namenode.run()
+    parser = argparse.ArgumentParser(description="Run the NameNode")
+    parser.add_argument('--port', type=int, default=NAME_NODE_PORT)
+    parser.add_argument('--metadata-directory', default=NAME_NODE_METADATA_DIRECTORY)
+    parser.add_argument('--metrics-port', type=int, default=NAME_NODE_METRICS_PORT, help="0 disables the endpoint")
+    parser.add_argument('--namespace-id', type=int, default=0, help="Unique per NameNode of a federated cluster")
+    args = parser.parse_args()
+
+    namenode = NameNode(metadata_directory=args.metadata_directory, port=args.port, namespace_id=args.namespace_id)
+    namenode.run(metrics_port=args.metrics_port)
@@ -0,0 +1,221 @@
+# namespace.py
+
+# In-memory namespace tree for the NameNode.
+#
+# Directories hold a dict of their children, so resolving a path walks one dict per
+# path component and listing a directory only touches that directory's entries.
+# Neither depends on how many files exist elsewhere in the DFS. Nodes do not store
+# their full path, only their name within the parent.
+#
+# That also makes renames and deletes O(1) whatever the size of the subtree: a rename
+# moves one entry from one children dict to another, and a delete unlinks the subtree
+# and hands it back to the caller to take apart at leisure (see deletion.py).
+import posixpath
+
+
+class FileRecord:
+    __slots__ = ('size', 'block_size', 'blocks', 'data_nodes', 'attributes')
+
+    def __init__(self, size, block_size, blocks, data_nodes, attributes=None):
+        self.size = size
+        self.block_size = block_size
+        self.blocks = blocks  # Block ids in file order
+        self.data_nodes = data_nodes  # Ids of every DataNode holding part of the file
+        self.attributes = attributes or {}  # Optional per-file settings, e.g. the storage policy
+
+    def to_dict(self):
+        info = {
+            'size': self.size,
+            'block_size': self.block_size,
+            'data_nodes': self.data_nodes,
+        }
+        info.update(self.attributes)
+        return info
+
+
+class DirectoryNode:
+    __slots__ = ('children', 'storage_policy')
+
+    def __init__(self):
+        # name -> DirectoryNode or FileRecord
+        self.children = {}
+        # Policy for new files below this directory, None to inherit the parent's
+        self.storage_policy = None
+
+
+def split_path(path):
+    # '/a//b/../c/' -> ['a', 'c']
+    normalized = posixpath.normpath('/' + path)
+    return [component for component in normalized.split('/') if component]
+
+
+def join_path(parent, name):
+    return parent.rstrip('/') + '/' + name
+
+
+class Namespace:
+    def __init__(self):
+        self.root = DirectoryNode()
+        self.file_count = 0
+        self.directory_count = 1
+
+    def lookup(self, path):
+        # Returns the DirectoryNode or FileRecord at 'path', or None
+        node = self.root
+        for component in split_path(path):
+            if not isinstance(node, DirectoryNode):
+                return None
+            node = node.children.get(component)
+            if node is None:
+                return None
+        return node
+
+    def get_file(self, path):
+        node = self.lookup(path)
+        return node if isinstance(node, FileRecord) else None
+
+    def get_directory(self, path):
+        node = self.lookup(path)
+        return node if isinstance(node, DirectoryNode) else None
+
+    def mkdirs(self, path):
+        # Create 'path' and any missing parents, returns the directory
+        node = self.root
+        for component in split_path(path):
+            child = node.children.get(component)
+            if child is None:
+                child = DirectoryNode()
+                node.children[component] = child
+                self.directory_count += 1
+            elif not isinstance(child, DirectoryNode):
+                raise NotADirectoryError(f"'{component}' in '{path}' is a file")
+            node = child
+        return node
+
+    def storage_policy(self, path, default):
+        # The policy of the closest directory at or above 'path' that sets one
+        policy = default
+        node = self.root
+        for component in split_path(path):
+            if node.storage_policy is not None:
+                policy = node.storage_policy
+            node = node.children.get(component)
+            if not isinstance(node, DirectoryNode):
+                return policy
+        return node.storage_policy if node.storage_policy is not None else policy
+
+    def check_file_path(self, path):
+        # Raise what add_file would raise for 'path', without changing anything
+        components = split_path(path)
+        if not components:
+            raise IsADirectoryError("'/' is a directory")
+        node = self.root
+        for component in components[:-1]:
+            node = node.children.get(component)
+            if node is None:
+                return
+            if not isinstance(node, DirectoryNode):
+                raise NotADirectoryError(f"'{component}' in '{path}' is a file")
+        if isinstance(node.children.get(components[-1]), DirectoryNode):
+            raise IsADirectoryError(f"'{path}' is a directory")
+
+    def add_file(self, path, record):
+        # Store 'record' at 'path', creating parent directories as needed.
+        # Returns the FileRecord it replaced, if any.
+        components = split_path(path)
+        if not components:
+            raise IsADirectoryError("'/' is a directory")
+
+        parent = self.mkdirs('/' + '/'.join(components[:-1]))
+        name = components[-1]
+        existing = parent.children.get(name)
+        if isinstance(existing, DirectoryNode):
+            raise IsADirectoryError(f"'{path}' is a directory")
+
+        parent.children[name] = record
+        if existing is None:
+            self.file_count += 1
+        return existing
+
+    def parent_of(self, path):
+        # (parent DirectoryNode, name) of the entry at 'path'; the parent must exist
+        components = split_path(path)
+        if not components:
+            raise PermissionError("'/' cannot be moved or deleted")
+        parent = self.get_directory('/' + '/'.join(components[:-1]))
+        if parent is None:
+            raise FileNotFoundError(f"Directory '{'/' + '/'.join(components[:-1])}' not found")
+        return parent, components[-1]
+
+    def rename(self, source, destination):
+        # Move the file or directory at 'source' to 'destination', which must not exist
+        # yet but whose parent must. Only the two parent directories are touched.
+        if split_path(destination)[:len(split_path(source))] == split_path(source):
+            raise ValueError(f"Cannot move '{source}' into itself")
+        source_parent, source_name = self.parent_of(source)
+        if source_name not in source_parent.children:
+            raise FileNotFoundError(f"'{source}' not found")
+        destination_parent, destination_name = self.parent_of(destination)
+        if destination_name in destination_parent.children:
+            raise FileExistsError(f"'{destination}' already exists")
+        destination_parent.children[destination_name] = source_parent.children.pop(source_name)
+
+    def detach(self, path):
+        # Unlink the file or directory at 'path' and return it. The file and directory
+        # counts still include the subtree until the caller calls forget for its nodes.
+        parent, name = self.parent_of(path)
+        node = parent.children.pop(name, None)
+        if node is None:
+            raise FileNotFoundError(f"'{path}' not found")
+        return node
+
+    def forget(self, node):
+        # Take one node of a detached subtree off the counts
+        if isinstance(node, FileRecord):
+            self.file_count -= 1
+        else:
+            self.directory_count -= 1
+
+    def list_directory(self, path):
+        directory = self.get_directory(path)
+        if directory is None:
+            raise FileNotFoundError(f"Directory '{path}' not found")
+        return list(directory.children)
+
+    def traverse(self, path):
+        # Nested dict of the subtree under 'path', files map to their metadata
+        directory = self.get_directory(path)
+        if directory is None:
+            raise FileNotFoundError(f"Directory '{path}' not found")
+
+        structure = {}
+        stack = [(directory, structure)]
+        while stack:
+            node, result = stack.pop()
+            for name, child in node.children.items():
+                if isinstance(child, DirectoryNode):
+                    result[name] = {}
+                    stack.append((child, result[name]))
+                else:
+                    result[name] = child.to_dict()
+        return structure
+
+    def walk(self, path='/'):
+        # Yields (path, node) for every directory and file under 'path', parents first
+        directory = self.get_directory(path)
+        if directory is None:
+            return
+        stack = [('/' + '/'.join(split_path(path)), directory)]
+        while stack:
+            directory_path, node = stack.pop()
+            for name, child in node.children.items():
+                child_path = join_path(directory_path, name)
+                yield child_path, child
+                if isinstance(child, DirectoryNode):
+                    stack.append((child_path, child))
+
+    def iter_files(self, path='/'):
+        # Yields (path, FileRecord) for every file under 'path'
+        for child_path, child in self.walk(path):
+            if isinstance(child, FileRecord):
+                yield child_path, child
@@ -0,0 +1,69 @@
+# placement.py
+
+# Block placement policies for the NameNode.
+#
+# A policy picks the DataNodes new replicas go to, both for client writes and for
+# re-replication. It sees the per-node statistics DataNodes send with every heartbeat
+# ('capacity', 'remaining' bytes and 'active_transfers') plus the failure domain
+# ('rack') they registered with. The NameNode adds the writes it scheduled on a node
+# since that node's last heartbeat ('scheduled_transfers'), so a burst of allocations
+# between two heartbeats does not pile onto the node that looked idlest at the last one.
+import random
+
+from common import DEFAULT_RACK
+
+
+class BlockPlacementPolicy:
+    def choose_targets(self, count, data_nodes, chosen=(), excluded=(), block_size=0):
+        # Return up to 'count' DataNode ids for new replicas of a block.
+        # 'data_nodes' maps id -> info for the active DataNodes, 'chosen' are nodes that
+        # already hold (or are about to hold) a replica, 'excluded' must not be picked.
+        raise NotImplementedError
+
+
+class LoadAwarePlacementPolicy(BlockPlacementPolicy):
+    # Spreads replicas over failure domains first, then picks lightly loaded nodes with
+    # room for the block. Each replica is the better of two randomly sampled candidates
+    # ("power of two choices"), which balances load about as well as always taking the
+    # least loaded node without sending every concurrent write to the same one.
+    def __init__(self, reserved_space=0):
+        self.reserved_space = reserved_space  # Free bytes a node keeps for non-DFS use
+
+    def has_room(self, info, block_size):
+        remaining = info.get('remaining')
+        return remaining is None or remaining - self.reserved_space >= block_size
+
+    def load(self, info):
+        return info.get('active_transfers', 0) + info.get('scheduled_transfers', 0)
+
+    def free_ratio(self, info):
+        capacity, remaining = info.get('capacity'), info.get('remaining')
+        return remaining / capacity if capacity and remaining is not None else 1.0
+
+    def better(self, first, second, data_nodes):
+        # Lower load wins, then the emptier disk
+        first_info, second_info = data_nodes[first], data_nodes[second]
+        first_key = (self.load(first_info), -self.free_ratio(first_info))
+        second_key = (self.load(second_info), -self.free_ratio(second_info))
+        return first if first_key <= second_key else second
+
+    def choose_targets(self, count, data_nodes, chosen=(), excluded=(), block_size=0):
+        candidates = [node_id for node_id, info in data_nodes.items()
+                      if node_id not in excluded and node_id not in chosen and self.has_room(info, block_size)]
+        used_racks = {data_nodes[node_id].get('rack', DEFAULT_RACK) for node_id in chosen if node_id in data_nodes}
+
+        targets = []
+        while candidates and len(targets) < count:
+            # Nodes in a failure domain without a replica yet are preferred
+            pool = [node_id for node_id in candidates if data_nodes[node_id].get('rack', DEFAULT_RACK) not in used_racks]
+            if not pool:
+                pool = candidates
+
+            if len(pool) == 1:
+                target = pool[0]
+            else:
+                target = self.better(*random.sample(pool, 2), data_nodes)
+            targets.append(target)
+            candidates.remove(target)
+            used_racks.add(data_nodes[target].get('rack', DEFAULT_RACK))
+        return targets
@@ -0,0 +1,275 @@
+# protocol.py
+
+# Length-prefixed wire protocol shared by the NameNode, DataNodes and DFSClient.
+#
+# Every message is a fixed-size header followed by a pickled metadata object and an
+# optional raw payload:
+#
+#   version (1 byte) | message type (1 byte) | request id (4 bytes) |
+#   metadata length (4 bytes) | payload length (8 bytes)
+#
+# Block data always travels as the raw payload so it is never pickled, and the receiver
+# reads it with recv_into a buffer preallocated from the header. Lengths above
+# MAX_MESSAGE_METADATA or MAX_MESSAGE_PAYLOAD are refused before that allocation, so a
+# malformed or hostile header cannot make the receiver reserve gigabytes.
+#
+# Connections are long-lived: a client may send several requests without waiting, and
+# each response echoes the request id it answers, so responses can arrive in any order.
+#
+# Blocks are streamed as a sequence of packets after the request that opens the
+# transfer. Every packet carries a checksum of its payload and the stream ends with an
+# empty packet flagged 'last', so neither side has to hold a whole block in memory.
+import itertools
+import pickle
+import socket
+import struct
+import threading
+import zlib
+from concurrent.futures import Future
+
+from common import MAX_MESSAGE_METADATA, MAX_MESSAGE_PAYLOAD
+
+PROTOCOL_VERSION = 2
+
+# Message types
+MSG_REQUEST = 1
+MSG_RESPONSE = 2
+MSG_PACKET = 3
+
+CHECKSUM_TYPE = 'crc32'
+
+HEADER = struct.Struct('!BBIIQ')
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class ChecksumError(ProtocolError):
+    pass
+
+
+def checksum(data):
+    return zlib.crc32(data)
+
+
+def verify_chunks(data, chunk_size, checksums):
+    # Check 'data' against one checksum per chunk_size piece
+    view = memoryview(data)
+    for index, expected in enumerate(checksums):
+        if checksum(view[index * chunk_size:(index + 1) * chunk_size]) != expected:
+            raise ChecksumError(f"Checksum mismatch in chunk {index}")
+
+
+def chunk_range(size, chunk_size, offset, length=None):
+    # The (start, end) byte range of whole checksum chunks covering 'length' bytes at
+    # 'offset' of a block of 'size' bytes; everything from 'offset' if 'length' is None
+    start = min(offset // chunk_size * chunk_size, size)
+    end = size if length is None else min(size, -(-(offset + length) // chunk_size) * chunk_size)
+    return start, max(start, end)
+
+
+def recv_exact_into(sock, view):
+    # Fill 'view' completely, returns False if the peer closed before sending anything
+    received = 0
+    while received < len(view):
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return False
+            raise ConnectionError("Connection closed in the middle of a message")
+        received += count
+    return True
+
+
+def send_message(sock, msg_type, metadata, payload=b'', request_id=0):
+    # Returns the number of bytes sent
+    encoded = pickle.dumps(metadata, protocol=pickle.HIGHEST_PROTOCOL)
+    header = HEADER.pack(PROTOCOL_VERSION, msg_type, request_id, len(encoded), len(payload))
+    sock.sendall(header + encoded)
+    if len(payload):
+        # Sent separately so large blocks are not copied into the header buffer
+        sock.sendall(payload)
+    return HEADER.size + len(encoded) + len(payload)
+
+
+def recv_message(sock, sized=False):
+    # Returns (msg_type, request_id, metadata, payload) or None if the peer closed the connection.
+    # With 'sized' the number of bytes received is appended to the tuple.
+    header = bytearray(HEADER.size)
+    if not recv_exact_into(sock, memoryview(header)):
+        return None
+
+    version, msg_type, request_id, metadata_length, payload_length = HEADER.unpack(header)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+    if metadata_length > MAX_MESSAGE_METADATA:
+        raise ProtocolError(f"Message metadata of {metadata_length} bytes exceeds {MAX_MESSAGE_METADATA}")
+    if payload_length > MAX_MESSAGE_PAYLOAD:
+        raise ProtocolError(f"Message payload of {payload_length} bytes exceeds {MAX_MESSAGE_PAYLOAD}")
+
+    encoded = bytearray(metadata_length)
+    if metadata_length and not recv_exact_into(sock, memoryview(encoded)):
+        raise ConnectionError("Connection closed before message metadata")
+
+    payload = bytearray(payload_length)
+    if payload_length and not recv_exact_into(sock, memoryview(payload)):
+        raise ConnectionError("Connection closed before message payload")
+
+    message = msg_type, request_id, pickle.loads(encoded), payload
+    return message + (HEADER.size + metadata_length + payload_length,) if sized else message
+
+
+def send_request(sock, request_data, payload=b'', request_id=0):
+    return send_message(sock, MSG_REQUEST, request_data, payload, request_id)
+
+
+def send_response(sock, response, payload=b'', request_id=0):
+    return send_message(sock, MSG_RESPONSE, response, payload, request_id)
+
+
+def send_file_response(sock, response, file, size, request_id=0, offset=0):
+    # Like send_response, but the payload is 'size' bytes of an open file from 'offset'.
+    # socket.sendfile hands them to os.sendfile, so they go from the page cache to the
+    # socket without being copied through Python.
+    encoded = pickle.dumps(response, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(HEADER.pack(PROTOCOL_VERSION, MSG_RESPONSE, request_id, len(encoded), size) + encoded)
+    if size:
+        sock.sendfile(file, offset, size)
+
+
+def send_packet(sock, seq, data, last=False):
+    send_message(sock, MSG_PACKET, {'seq': seq, 'checksum': checksum(data), 'last': last}, data)
+
+
+def recv_packet(sock, expected_seq):
+    # Returns (data, last) after checking the packet order and checksum
+    message = recv_message(sock)
+    if message is None:
+        raise ConnectionError("Connection closed in the middle of a block transfer")
+
+    msg_type, _, packet_info, data = message
+    if msg_type != MSG_PACKET:
+        raise ProtocolError(f"Expected a packet, got message type {msg_type}")
+    if packet_info['seq'] != expected_seq:
+        raise ProtocolError(f"Expected packet {expected_seq}, got {packet_info['seq']}")
+    if checksum(data) != packet_info['checksum']:
+        raise ChecksumError(f"Checksum mismatch in packet {expected_seq}")
+    return data, packet_info['last']
+
+
+def call(address, port, request_data, payload=b''):
+    # One-shot request over a fresh connection, returns (response, payload)
+    with socket.create_connection((address, port)) as sock:
+        send_request(sock, request_data, payload)
+        message = recv_message(sock)
+    if message is None:
+        raise ConnectionError(f"No response from {address}:{port}")
+    _, _, response, response_payload = message
+    return response, response_payload
+
+
+class Connection:
+    # A persistent connection that allows many requests in flight at once.
+    # Callers get a Future per request; a reader thread resolves them by request id.
+    def __init__(self, address, port):
+        self.address = address
+        self.port = port
+        self.sock = socket.create_connection((address, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.send_lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+        self.pending = {}
+        self.request_ids = itertools.count(1)
+        self.closed = False
+
+        self.reader = threading.Thread(target=self.read_responses, daemon=True)
+        self.reader.start()
+
+    def submit(self, request_data, payload=b''):
+        future = Future()
+        with self.pending_lock:
+            if self.closed:
+                raise ConnectionError(f"Connection to {self.address}:{self.port} is closed")
+            request_id = next(self.request_ids) & 0xFFFFFFFF
+            self.pending[request_id] = future
+
+        try:
+            with self.send_lock:
+                send_request(self.sock, request_data, payload, request_id)
+        except OSError as e:
+            self.fail(ConnectionError(f"Error sending to {self.address}:{self.port}: {e}"))
+            raise
+        return future
+
+    def request(self, request_data, payload=b'', timeout=None):
+        # Blocking round trip, returns (response, payload)
+        return self.submit(request_data, payload).result(timeout)
+
+    def read_responses(self):
+        error = ConnectionError(f"Connection to {self.address}:{self.port} closed")
+        try:
+            while True:
+                message = recv_message(self.sock)
+                if message is None:
+                    break
+                _, request_id, response, payload = message
+                with self.pending_lock:
+                    future = self.pending.pop(request_id, None)
+                if future is not None:
+                    future.set_result((response, payload))
+        except (OSError, ProtocolError) as e:
+            error = ConnectionError(f"Error reading from {self.address}:{self.port}: {e}")
+        self.fail(error)
+
+    def fail(self, error):
+        # Fail every outstanding request; the pool replaces closed connections
+        with self.pending_lock:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.close()
+
+    def close(self):
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class ConnectionPool:
+    # A fixed number of persistent connections to one server, used round-robin.
+    # Connections are opened lazily and reopened if the server dropped them.
+    def __init__(self, address, port, size=1):
+        self.address = address
+        self.port = port
+        self.connections = [None] * size
+        self.lock = threading.Lock()
+        self.next_index = itertools.count()
+
+    def get_connection(self):
+        index = next(self.next_index) % len(self.connections)
+        with self.lock:
+            connection = self.connections[index]
+            if connection is None or connection.closed:
+                connection = Connection(self.address, self.port)
+                self.connections[index] = connection
+            return connection
+
+    def submit(self, request_data, payload=b''):
+        return self.get_connection().submit(request_data, payload)
+
+    def request(self, request_data, payload=b'', timeout=None):
+        return self.submit(request_data, payload).result(timeout)
+
+    def close(self):
+        with self.lock:
+            for connection in self.connections:
+                if connection is not None:
+                    connection.close()
+            self.connections = [None] * len(self.connections)
@@ -0,0 +1,150 @@
+# replication.py
+
+# Re-replication of under-replicated blocks for the NameNode.
+#
+# Blocks that may have lost replicas go into a priority queue ordered by how many
+# live replicas they have left, so a block down to its last copy is repaired before
+# one that is only missing a second copy. A scheduler thread hands copy work to
+# DataNodes through heartbeat commands. No DataNode takes part in more than
+# MAX_REPLICATION_STREAMS copies at once, either as source or target, and each
+# DataNode caps the bandwidth it spends on them (see DataNode.replicate_block).
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from common import (REPLICATION_FACTOR, MAX_REPLICATION_STREAMS, REPLICATION_TIMEOUT,
+                    REPLICATION_CHECK_INTERVAL, REPLICATION_SCAN_INTERVAL)
+
+
+class ReplicationMonitor:
+    def __init__(self, name_node):
+        # Shares the NameNode's lock and reads its 'blocks' and 'data_nodes'
+        self.name_node = name_node
+        self.heap = []
+        self.queued = set()
+        self.counter = itertools.count()
+
+        # block id -> (source, targets, deadline) for copies handed to DataNodes
+        self.in_flight = {}
+        self.streams = {}  # data node id -> copies it is part of
+
+    def live_replicas(self, block_info):
+        data_nodes = self.name_node.data_nodes
+        return [node_id for node_id in block_info['data_node_ids']
+                if data_nodes.get(node_id, {}).get('status') == 'active']
+
+    def enqueue(self, block_ids):
+        # Called with the NameNode lock held whenever blocks may have lost replicas
+        for block_id in block_ids:
+            block_info = self.name_node.blocks.get(block_id)
+            if block_id in self.queued or block_info is None or not block_info['complete']:
+                continue
+            if self.wanted_replicas(block_info) <= 1:
+                # A single copy has nothing to be copied from once it is lost; lost
+                # erasure-coded cells are rebuilt from parity by readers instead
+                continue
+            heapq.heappush(self.heap, (len(self.live_replicas(block_info)), next(self.counter), block_id))
+            self.queued.add(block_id)
+
+    def scan(self):
+        # Queue every under-replicated block; catches nodes that never came back after a restart
+        with self.name_node.lock:
+            active_count = self.active_node_count()
+            self.enqueue([block_id for block_id, block_info in self.name_node.blocks.items()
+                          if block_info['complete']
+                          and len(self.live_replicas(block_info)) < min(self.wanted_replicas(block_info), active_count)])
+
+    def wanted_replicas(self, block_info):
+        # Erasure-coded cells want a single copy; their redundancy is the parity
+        return block_info.get('replicas', REPLICATION_FACTOR)
+
+    def active_node_count(self):
+        return sum(1 for info in self.name_node.data_nodes.values() if info['status'] == 'active')
+
+    def check_in_flight(self):
+        # Release throttle slots of copies that finished or timed out
+        now = time.monotonic()
+        for block_id, (source, targets, deadline) in list(self.in_flight.items()):
+            block_info = self.name_node.blocks.get(block_id)
+            done = block_info is None or all(target in block_info['data_node_ids'] for target in targets)
+            if done or now >= deadline:
+                del self.in_flight[block_id]
+                for node_id in [source] + targets:
+                    self.streams[node_id] -= 1
+                if not done:
+                    logging.warning(f"Replication of block {block_id} timed out, rescheduling")
+                    self.enqueue([block_id])
+
+    def schedule(self):
+        # Hand out as much copy work as the per-node throttles allow, most urgent first
+        with self.name_node.lock:
+            self.check_in_flight()
+            active_nodes = {node_id: info for node_id, info in self.name_node.data_nodes.items()
+                            if info['status'] == 'active'}
+            active = list(active_nodes)
+            deferred = []
+
+            while self.heap:
+                # Stop once every node is at its limit; the rest waits for the next round
+                if all(self.streams.get(node_id, 0) >= MAX_REPLICATION_STREAMS for node_id in active):
+                    break
+                _, _, block_id = heapq.heappop(self.heap)
+                self.queued.discard(block_id)
+                block_info = self.name_node.blocks.get(block_id)
+                if block_info is None or block_id in self.in_flight:
+                    continue
+
+                live = self.live_replicas(block_info)
+                missing = min(self.wanted_replicas(block_info), len(active)) - len(live)
+                if missing <= 0:
+                    continue
+                if not live:
+                    logging.error(f"Block {block_id} has no live replicas")
+                    continue
+
+                sources = [node_id for node_id in live if self.streams.get(node_id, 0) < MAX_REPLICATION_STREAMS]
+                busy = [node_id for node_id in active if self.streams.get(node_id, 0) >= MAX_REPLICATION_STREAMS]
+                # The placement policy keeps the new replicas off the failure domains
+                # the live ones are in and away from loaded or full nodes
+                targets = self.name_node.placement_policy.choose_targets(
+                    missing, active_nodes, chosen=live, excluded=set(block_info['data_node_ids']).union(busy),
+                    block_size=block_info['size'])
+                if not sources or not targets:
+                    deferred.append(block_id)
+                    continue
+
+                # Least busy source first
+                source = min(sources, key=lambda node_id: self.streams.get(node_id, 0))
+                self.start_copy(block_id, source, targets)
+
+            for block_id in deferred:
+                self.enqueue([block_id])
+
+    def start_copy(self, block_id, source, targets):
+        data_nodes = self.name_node.data_nodes
+        self.name_node.queue_command(source, {
+            'action': 'replicate_block',
+            'block_id': block_id,
+            'targets': [self.name_node.data_node_location(node_id, data_nodes[node_id]) for node_id in targets],
+        })
+        self.in_flight[block_id] = (source, targets, time.monotonic() + REPLICATION_TIMEOUT)
+        for node_id in [source] + targets:
+            self.streams[node_id] = self.streams.get(node_id, 0) + 1
+        logging.info(f"Replicating block {block_id} from DataNode {source} to {targets}")
+
+    def run(self):
+        last_scan = time.monotonic()
+        while True:
+            time.sleep(REPLICATION_CHECK_INTERVAL)
+            try:
+                if time.monotonic() - last_scan >= REPLICATION_SCAN_INTERVAL:
+                    self.scan()
+                    last_scan = time.monotonic()
+                self.schedule()
+            except Exception as e:
+                logging.error(f"Error in replication monitor: {e}")
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
@@ -0,0 +1,73 @@
+# test_block_cache.py
+
+# 2Q admission, LRU eviction and pinning in the DataNode block cache.
+from block_cache import BlockCache
+
+
+def read(cache, block_id, size=10):
+    # What a DataNode does for one read; returns True on a cache hit
+    cached, admit = cache.get(block_id)
+    if cached is None and admit:
+        cache.put(block_id, bytes(size), 512, [])
+    return cached is not None
+
+
+def test_blocks_are_admitted_on_the_second_read():
+    cache = BlockCache(100, ghost_entries=4)
+    assert [read(cache, 1) for _ in range(3)] == [False, False, True]
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_scan_does_not_evict_hot_blocks():
+    cache = BlockCache(30, ghost_entries=4)
+    read(cache, 1), read(cache, 1)
+    # Every block of the scan is read once and only remembered by id
+    for block_id in range(100, 200):
+        read(cache, block_id)
+    assert read(cache, 1)
+    assert cache.stats()['evictions'] == 0
+
+
+def test_ghost_entries_are_bounded():
+    cache = BlockCache(100, ghost_entries=2)
+    for block_id in (1, 2, 3):
+        read(cache, block_id)
+    # Block 1 was forgotten, so its second read does not admit it
+    assert cache.get(1) == (None, False)
+    assert cache.get(3)[1]
+
+
+def test_least_recently_used_block_is_evicted():
+    cache = BlockCache(30, ghost_entries=8)
+    for block_id in (1, 2, 3):
+        cache.put(block_id, bytes(10), 512, [])
+    read(cache, 1)
+    cache.put(4, bytes(10), 512, [])
+    assert sorted(cache.blocks) == [1, 3, 4]
+    assert cache.used == 30
+
+
+def test_pinned_blocks_are_never_evicted():
+    cache = BlockCache(30, ghost_entries=8)
+    assert cache.put(1, bytes(20), 512, [], pinned=True)
+    assert cache.put(2, bytes(10), 512, [])
+    assert cache.put(3, bytes(10), 512, [])
+    assert sorted(cache.blocks) == [1, 3]
+    # Pinned bytes count against the budget
+    assert not cache.put(4, bytes(20), 512, [], pinned=True)
+
+    cache.unpin(1)
+    assert cache.put(5, bytes(30), 512, [])
+    assert sorted(cache.blocks) == [5]
+
+
+def test_invalidate_forgets_data_and_ghost():
+    cache = BlockCache(100, ghost_entries=8)
+    cache.put(1, bytes(10), 512, [])
+    read(cache, 2)
+    cache.invalidate(1)
+    cache.invalidate(2)
+    assert cache.used == 0
+    assert cache.get(1) == (None, False)
+    assert cache.get(2) == (None, False)
@@ -0,0 +1,47 @@
+# test_dedup.py
+
+# Fixed-size and content-defined chunking.
+import io
+import random
+
+from dedup import CDC_WINDOW, block_hash, cdc_chunks, fixed_chunks
+
+BLOCK_SIZE = 64 * 1024
+
+
+def chunks(data):
+    return list(cdc_chunks(io.BytesIO(data), BLOCK_SIZE))
+
+
+def test_fixed_chunks():
+    data = bytes(range(256)) * 10
+    assert list(fixed_chunks(io.BytesIO(data), 1000)) == [data[:1000], data[1000:2000], data[2000:]]
+    assert list(fixed_chunks(io.BytesIO(b''), 1000)) == []
+
+
+def test_cdc_chunks_cover_the_data_within_bounds():
+    data = random.Random(1).randbytes(2 * 1024 * 1024)
+    blocks = chunks(data)
+    assert b''.join(blocks) == data
+    assert all(max(CDC_WINDOW, BLOCK_SIZE // 8) < len(block) <= BLOCK_SIZE for block in blocks[:-1])
+    # On random data blocks end well before the limit
+    assert BLOCK_SIZE // 8 < len(data) / len(blocks) < BLOCK_SIZE * 3 // 4
+
+
+def test_cdc_boundaries_survive_an_insertion():
+    data = random.Random(2).randbytes(2 * 1024 * 1024)
+    edited = data[:1000000] + b'inserted bytes' + data[1000000:]
+    before = [block_hash(block) for block in chunks(data)]
+    after = [block_hash(block) for block in chunks(edited)]
+    # Only a few adjacent blocks around the edit change: the one holding it, plus any
+    # cut at block_size before the next content-defined boundary
+    changed = [index for index, digest in enumerate(after) if digest not in before]
+    assert 1 <= len(changed) <= 4
+    assert changed == list(range(changed[0], changed[-1] + 1))
+    assert after[:changed[0]] == before[:changed[0]]
+    assert after[changed[-1] + 1:] == before[len(before) - len(after) + changed[-1] + 1:]
+
+
+def test_cdc_small_and_empty_inputs():
+    assert chunks(b'') == []
+    assert chunks(b'tiny') == [b'tiny']
@@ -0,0 +1,76 @@
+# test_edit_log.py
+
+# Edit log records, segments and recovery from a torn tail.
+import os
+
+from edit_log import EditLog, list_segments, read_edits
+
+
+def test_edits_read_back_in_order(tmp_path):
+    log = EditLog(str(tmp_path), 0)
+    edits = [('mkdirs', '/a'), ('rename', '/a', '/b'), ('delete', '/b')]
+    txids = [log.log_edit(edit) for edit in edits]
+    log.sync(txids[-1])
+    log.close()
+
+    assert txids == [1, 2, 3]
+    [(first_txid, path)] = list_segments(str(tmp_path))
+    assert first_txid == 1
+    assert list(read_edits(path)) == list(zip(txids, edits))
+
+
+def test_unsynced_edits_are_not_on_disk(tmp_path):
+    log = EditLog(str(tmp_path), 0)
+    log.sync(log.log_edit(('mkdirs', '/a')))
+    log.log_edit(('mkdirs', '/b'))
+    [(_, path)] = list_segments(str(tmp_path))
+    assert [txid for txid, _ in read_edits(path)] == [1]
+
+
+def test_torn_tail_is_ignored_and_repaired(tmp_path):
+    log = EditLog(str(tmp_path), 0)
+    for index in range(3):
+        log.sync(log.log_edit(('mkdirs', f'/d{index}')))
+    log.close()
+    [(_, path)] = list_segments(str(tmp_path))
+    intact_size = os.path.getsize(path)
+    with open(path, 'ab') as segment:
+        segment.write(b'\x00\x00\x00\x40torn')
+
+    assert [txid for txid, _ in read_edits(path)] == [1, 2, 3]
+    assert os.path.getsize(path) > intact_size
+    assert [txid for txid, _ in read_edits(path, repair=True)] == [1, 2, 3]
+    assert os.path.getsize(path) == intact_size
+
+
+def test_corrupt_record_ends_the_segment(tmp_path):
+    log = EditLog(str(tmp_path), 0)
+    for index in range(3):
+        log.sync(log.log_edit(('mkdirs', f'/d{index}')))
+    log.close()
+    [(_, path)] = list_segments(str(tmp_path))
+    with open(path, 'r+b') as segment:
+        data = bytearray(segment.read())
+        data[-1] ^= 0xFF
+        segment.seek(0)
+        segment.write(data)
+
+    assert [txid for txid, _ in read_edits(path)] == [1, 2]
+
+
+def test_roll_and_purge(tmp_path):
+    log = EditLog(str(tmp_path), 0)
+    log.log_edit(('mkdirs', '/a'))
+    log.log_edit(('mkdirs', '/b'))
+    assert log.roll() == 2
+    log.sync(log.log_edit(('mkdirs', '/c')))
+    assert [first_txid for first_txid, _ in list_segments(str(tmp_path))] == [1, 3]
+
+    # An image at txid 1 does not cover the whole first segment yet
+    log.purge(1)
+    assert [first_txid for first_txid, _ in list_segments(str(tmp_path))] == [1, 3]
+    log.purge(2)
+    [(first_txid, path)] = list_segments(str(tmp_path))
+    assert first_txid == 3
+    assert list(read_edits(path)) == [(3, ('mkdirs', '/c'))]
+    log.close()
@@ -0,0 +1,46 @@
+# test_erasure.py
+
+# Reed-Solomon encoding and decoding.
+import itertools
+
+import numpy as np
+import pytest
+
+from erasure import REPLICATED, ReedSolomon, gf_invert_matrix, parse_policy
+
+
+@pytest.mark.parametrize('data_cells, parity_cells', [(1, 1), (2, 1), (3, 2), (6, 3), (10, 4)])
+def test_any_k_cells_rebuild_the_data(data_cells, parity_cells):
+    coder = ReedSolomon(data_cells, parity_cells)
+    data = np.random.default_rng(data_cells * 31 + parity_cells).integers(
+        0, 256, size=(data_cells, 257), dtype=np.uint8)
+    cells = dict(enumerate(np.concatenate([data, coder.encode(data)])))
+
+    # Every way of losing m of the k + m cells
+    for lost in itertools.combinations(range(data_cells + parity_cells), parity_cells):
+        survivors = {index: cell for index, cell in cells.items() if index not in lost}
+        assert np.array_equal(coder.decode(survivors), data), lost
+
+
+def test_too_few_cells_cannot_be_decoded():
+    coder = ReedSolomon(3, 2)
+    data = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    cells = dict(enumerate(np.concatenate([data, coder.encode(data)])))
+    with pytest.raises(ValueError):
+        coder.decode({index: cells[index] for index in (0, 3)})
+
+
+def test_matrix_inverse():
+    matrix = [[1, 2, 3], [4, 5, 6], [7, 8, 10]]
+    inverse = gf_invert_matrix(matrix)
+    assert gf_invert_matrix(inverse) == matrix
+    with pytest.raises(ValueError):
+        gf_invert_matrix([[1, 1], [1, 1]])
+
+
+def test_parse_policy():
+    assert parse_policy('RS-6-3') == (6, 3)
+    assert parse_policy(REPLICATED) is None
+    for policy in ('RS-0-2', 'RS-3-0', 'RS-200-56', 'XOR-2-1', None):
+        with pytest.raises(ValueError):
+            parse_policy(policy)
@@ -0,0 +1,43 @@
+# test_fsimage.py
+
+# fsimage checkpoints written and read back.
+import os
+
+import pytest
+
+from fsimage import latest_image, load_image, purge_images, save_image
+
+
+def test_image_round_trip(tmp_path):
+    entries = [
+        ('D', '/ec', {'storage_policy': 'RS-3-2'}),
+        ('D', '/plain', {}),
+        ('F', '/plain/empty', 0, 1024, {}, []),
+        ('F', '/plain/file', 3000, 1024, {'compression': 'zlib'}, [
+            (1, 1024, ['dn0', 'dn1']),
+            (2, 1024, ['dn1', 'dn2'], 'ab' * 32),
+            (3, 952, []),
+        ]),
+        ('F', '/plain/packed', 10, 1024, {'container_offset': 20}, [(4, 30, ['dn2'])]),
+    ]
+    path = save_image(str(tmp_path), 42, 5, entries)
+
+    assert load_image(path) == (42, 5, entries)
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_latest_image_and_purge(tmp_path):
+    assert latest_image(str(tmp_path)) is None
+    save_image(str(tmp_path), 9, 1, [])
+    newest = save_image(str(tmp_path), 10, 1, [('D', '/a', {})])
+    assert latest_image(str(tmp_path)) == newest
+
+    purge_images(str(tmp_path), 10)
+    assert os.listdir(tmp_path) == [os.path.basename(newest)]
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'fsimage_00000000000000000001.img'
+    path.write_bytes(b'NOTANIMG' + bytes(28))
+    with pytest.raises(ValueError):
+        load_image(str(path))
@@ -0,0 +1,157 @@
+# test_name_node.py
+
+# Rebuilding the NameNode's namespace and block map from its edit log and fsimage.
+import importlib
+
+import pytest
+
+
+@pytest.fixture
+def start_name_node(tmp_path, monkeypatch):
+    # name_node logs to namenode_log.txt in the working directory from import on
+    monkeypatch.chdir(tmp_path)
+    name_node = importlib.import_module('name_node')
+    started = []
+
+    def start():
+        node = name_node.NameNode(port=0, metadata_directory=str(tmp_path / 'meta'))
+        started.append(node)
+        return node
+
+    yield start
+    for node in started:
+        node.server_socket.close()
+        node.edit_log.close()
+
+
+def log(node, *edits):
+    with node.lock:
+        for edit in edits:
+            txid = node.log_edit(edit)
+    node.edit_log.sync(txid)
+
+
+def drain_deletions(node):
+    while node.deletion_monitor.process_batch():
+        pass
+
+
+def state(node):
+    # Everything that must survive a restart. Incomplete allocations are left out:
+    # a checkpoint does not keep them.
+    files = {path: (record.size, record.block_size, record.blocks, record.attributes)
+             for path, record in node.namespace.iter_files('/')}
+    directories = sorted(path for path, entry in node.namespace.walk('/') if path not in files)
+    blocks = {block_id: (info['size'], info['refs'], info.get('live'), info.get('hash'))
+              for block_id, info in node.blocks.items() if info['complete']}
+    policies = {path: entry.storage_policy for path, entry in node.namespace.walk('/')
+                if path not in files and entry.storage_policy}
+    return files, directories, blocks, policies, node.namespace.file_count, node.namespace.directory_count
+
+
+def populate(node):
+    digest = 'ab' * 32
+    log(node,
+        ('mkdirs', '/data/empty'),
+        ('set_storage_policy', '/ec', 'RS-3-2'),
+        ('allocate_block', 1, '/data/a', [0]),
+        ('allocate_block', 2, '/data/a', [0]),
+        ('complete_file', '/data/a', 150, 100, [(1, 100, [0]), (2, 50, [0], digest)], {}),
+        # A second file sharing the deduplicated block
+        ('complete_file', '/shared', 50, 100, [(2, 50, [0], digest)], {}),
+        ('allocate_block', 3, '/data/b', [0]),
+        ('complete_file', '/data/b', 10, 100, [(3, 10, [0])], {}),
+        # Overwriting a file frees its old blocks
+        ('allocate_block', 4, '/data/b', [0]),
+        ('complete_file', '/data/b', 5, 100, [(4, 5, [0])], {}),
+        ('rename', '/data/b', '/moved'),
+        ('allocate_block', 5, '/gone/f', [0]),
+        ('complete_file', '/gone/f', 10, 100, [(5, 10, [0])], {}),
+        ('delete', '/gone'),
+        ('allocate_block', 6, '/small/p0', [0]),
+        ('complete_packed', (6, 30, [0]), [('/small/p0', 0, 10), ('/small/p1', 10, 20)]),
+        # Overwriting a packed file frees its bytes in the container
+        ('allocate_block', 7, '/small/p1', [0]),
+        ('complete_file', '/small/p1', 5, 100, [(7, 5, [0])], {}))
+    drain_deletions(node)
+
+
+def test_replay_from_the_edit_log(start_name_node):
+    node = start_name_node()
+    populate(node)
+    expected = state(node)
+    assert expected[2][2][1] == 2  # Both files refer to the shared block
+    assert 3 not in node.blocks
+    assert 5 not in node.blocks
+    assert expected[2][6][2] == 10  # Live bytes left in the container
+
+    restarted = start_name_node()
+    drain_deletions(restarted)
+    assert state(restarted) == expected
+
+
+def test_replay_from_a_checkpoint_and_later_edits(start_name_node):
+    node = start_name_node()
+    populate(node)
+    node.checkpoint()
+    log(node,
+        ('allocate_block', 8, '/after', [0]),
+        ('complete_file', '/after', 1, 100, [(8, 1, [0])], {}),
+        ('allocate_block', 9, '/data/a', [0]),
+        ('complete_file', '/data/a', 1, 100, [(9, 1, [0])], {}))
+    drain_deletions(node)
+    expected = state(node)
+    assert 1 not in node.blocks
+    assert expected[2][2][1] == 1
+
+    restarted = start_name_node()
+    drain_deletions(restarted)
+    assert state(restarted) == expected
+    assert restarted.next_block_id == node.next_block_id
+
+
+def test_packed_files_that_cannot_be_created_are_rejected(start_name_node):
+    node = start_name_node()
+    log(node, ('mkdirs', '/p/dir'),
+        ('allocate_block', 1, '/f', [0]),
+        ('complete_file', '/f', 1, 100, [(1, 1, [0])], {}),
+        ('allocate_block', 2, '/p/one', [0]))
+    files = [{'dfs_path': '/p/one', 'offset': 0, 'length': 3},
+             {'dfs_path': '/p/dir', 'offset': 3, 'length': 3},
+             {'dfs_path': '/f/x', 'offset': 6, 'length': 3},
+             {'dfs_path': '/p/two', 'offset': 9, 'length': 3}]
+    response = node.complete_packed_files({'block_id': 2, 'size': 12, 'data_node_ids': [0]}, files)
+    assert response['packed'] == 2
+    assert sorted(response['rejected']) == ['/f/x', '/p/dir']
+    assert node.blocks[2]['refs'] == 2
+    assert node.namespace.lookup('/p/dir').children == {}
+
+    # With nothing left to pack the container is dropped
+    log(node, ('allocate_block', 3, '/p/dir', [0]))
+    response = node.complete_packed_files({'block_id': 3, 'size': 3, 'data_node_ids': [0]}, files[1:2])
+    assert response['packed'] == 0
+    assert 3 not in node.blocks
+
+    restarted = start_name_node()
+    drain_deletions(restarted)
+    assert state(restarted) == state(node)
+
+
+def test_abandoned_blocks_stay_abandoned(start_name_node):
+    node = start_name_node()
+    log(node, ('allocate_block', 1, '/done', [0]),
+        ('complete_file', '/done', 1, 100, [(1, 1, [0])], {}),
+        ('allocate_block', 2, '/unfinished', [0, 1]))
+    assert node.lease_monitor.pending() == 1
+
+    node.lease_monitor.timeout = 0
+    assert node.lease_monitor.expire() == 1
+    assert 2 not in node.blocks
+    assert node.lease_monitor.pending() == 0
+    assert node.pending_commands == {0: [{'action': 'delete_blocks', 'block_ids': [2]}],
+                                     1: [{'action': 'delete_blocks', 'block_ids': [2]}]}
+
+    restarted = start_name_node()
+    assert 2 not in restarted.blocks
+    assert restarted.lease_monitor.pending() == 0
+    assert state(restarted) == state(node)
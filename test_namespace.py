@@ -0,0 +1,114 @@
+# test_namespace.py
+
+# The NameNode's namespace tree: files, renames and detached deletes.
+import pytest
+
+from namespace import DirectoryNode, FileRecord, Namespace, split_path
+
+
+def record(size=1):
+    return FileRecord(size, 1024, [size], ['dn0'])
+
+
+def test_split_path():
+    assert split_path('/a//b/../c/') == ['a', 'c']
+    assert split_path('/') == []
+    assert split_path('../..') == []
+
+
+def test_add_file_creates_parents_and_replaces():
+    namespace = Namespace()
+    first, second = record(1), record(2)
+    assert namespace.add_file('/a/b/f', first) is None
+    assert namespace.add_file('/a/b/f', second) is first
+    assert namespace.get_file('/a/b/f') is second
+    assert namespace.list_directory('/a') == ['b']
+    assert (namespace.file_count, namespace.directory_count) == (1, 3)
+
+    with pytest.raises(IsADirectoryError):
+        namespace.add_file('/a/b', record())
+    with pytest.raises(NotADirectoryError):
+        namespace.mkdirs('/a/b/f/g')
+
+
+def test_check_file_path_changes_nothing():
+    namespace = Namespace()
+    namespace.add_file('/a/f', record())
+    namespace.check_file_path('/a/g')
+    namespace.check_file_path('/new/dir/g')
+    for path, error in (('/', IsADirectoryError), ('/a', IsADirectoryError), ('/a/f/g', NotADirectoryError)):
+        with pytest.raises(error):
+            namespace.check_file_path(path)
+    assert (namespace.file_count, namespace.directory_count) == (1, 2)
+
+
+def test_rename_moves_the_whole_subtree():
+    namespace = Namespace()
+    namespace.add_file('/src/x/f', record(1))
+    namespace.add_file('/src/g', record(2))
+    namespace.mkdirs('/dst')
+
+    namespace.rename('/src', '/dst/moved')
+    assert namespace.lookup('/src') is None
+    assert namespace.get_file('/dst/moved/x/f').size == 1
+    assert namespace.get_file('/dst/moved/g').size == 2
+    assert (namespace.file_count, namespace.directory_count) == (2, 4)
+
+
+def test_rename_errors():
+    namespace = Namespace()
+    namespace.add_file('/a/f', record())
+    namespace.add_file('/b/f', record())
+    with pytest.raises(ValueError):
+        namespace.rename('/a', '/a/inside')
+    with pytest.raises(FileExistsError):
+        namespace.rename('/a/f', '/b/f')
+    with pytest.raises(FileNotFoundError):
+        namespace.rename('/a/missing', '/b/g')
+    with pytest.raises(FileNotFoundError):
+        namespace.rename('/a/f', '/nowhere/g')
+    with pytest.raises(PermissionError):
+        namespace.detach('/')
+    # A sibling whose name starts like the source is not inside it
+    namespace.rename('/a', '/ab')
+    assert namespace.get_file('/ab/f') is not None
+
+
+def test_detach_then_forget_updates_the_counts():
+    namespace = Namespace()
+    for index in range(3):
+        namespace.add_file(f'/tree/d{index}/f', record(index))
+    node = namespace.detach('/tree')
+    assert namespace.lookup('/tree') is None
+    # Counts only drop as the subtree is taken apart
+    assert (namespace.file_count, namespace.directory_count) == (3, 5)
+
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, DirectoryNode):
+            stack.extend(current.children.values())
+        namespace.forget(current)
+    assert (namespace.file_count, namespace.directory_count) == (0, 1)
+
+    with pytest.raises(FileNotFoundError):
+        namespace.detach('/tree')
+
+
+def test_storage_policy_is_inherited():
+    namespace = Namespace()
+    namespace.mkdirs('/ec').storage_policy = 'RS-3-2'
+    namespace.mkdirs('/ec/inner')
+    namespace.mkdirs('/ec/override').storage_policy = 'REPLICATED'
+    assert namespace.storage_policy('/ec/inner/new_file', 'REPLICATED') == 'RS-3-2'
+    assert namespace.storage_policy('/ec/override/f', 'REPLICATED') == 'REPLICATED'
+    assert namespace.storage_policy('/other', 'REPLICATED') == 'REPLICATED'
+
+
+def test_walk_and_traverse():
+    namespace = Namespace()
+    namespace.add_file('/a/f', record(5))
+    namespace.mkdirs('/a/empty')
+    assert sorted(path for path, _ in namespace.walk('/')) == ['/a', '/a/empty', '/a/f']
+    assert [path for path, _ in namespace.iter_files('/')] == ['/a/f']
+    assert namespace.traverse('/') == {'a': {'f': record(5).to_dict(), 'empty': {}}}